@@ -0,0 +1,28 @@
+"""regticket reg_ticket_txid made unique
+
+Revision ID: 3f9c2b7d1e40
+Revises: ae39edefe692
+Create Date: 2026-10-18 10:12:41.218304
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9c2b7d1e40'
+down_revision = 'ae39edefe692'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # remove duplicates left by concurrent runs of the tickets finder, keep the first row of every txid
+    op.execute("DELETE FROM regticket a USING regticket b "
+               "WHERE a.reg_ticket_txid = b.reg_ticket_txid AND a.id > b.id")
+    op.drop_index('ix_regticket_reg_ticket_txid', table_name='regticket')
+    op.create_index(op.f('ix_regticket_reg_ticket_txid'), 'regticket', ['reg_ticket_txid'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_regticket_reg_ticket_txid'), table_name='regticket')
+    op.create_index('ix_regticket_reg_ticket_txid', 'regticket', ['reg_ticket_txid'], unique=False)
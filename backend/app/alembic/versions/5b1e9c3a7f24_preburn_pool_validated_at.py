@@ -0,0 +1,26 @@
+"""validated_at and claim index for preburntx pool
+
+Revision ID: 5b1e9c3a7f24
+Revises: e2b8f4c6a917
+Create Date: 2026-10-18 19:10:42.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e9c3a7f24'
+down_revision = 'e2b8f4c6a917'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('preburntx', sa.Column('validated_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_preburntx_fee_status_height', 'preburntx', ['fee', 'status', 'height'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_preburntx_fee_status_height', table_name='preburntx')
+    op.drop_column('preburntx', 'validated_at')
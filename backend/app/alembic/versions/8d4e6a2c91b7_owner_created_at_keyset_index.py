@@ -0,0 +1,30 @@
+"""owner_id, created_at, id index for keyset pagination of results
+
+Revision ID: 8d4e6a2c91b7
+Revises: 3f9c2b7d1e40
+Create Date: 2026-10-18 14:03:27.551920
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8d4e6a2c91b7'
+down_revision = '3f9c2b7d1e40'
+branch_labels = None
+depends_on = None
+
+TABLES = ['cascade', 'sense', 'nft']
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        # rows without created_at would never appear in keyset pages
+        op.execute(f"UPDATE {table} SET created_at = COALESCE(updated_at, now() at time zone 'utc') "
+                   f"WHERE created_at IS NULL")
+        op.create_index(f'ix_{table}_owner_id_created_at_id', table, ['owner_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_owner_id_created_at_id', table_name=table)
@@ -0,0 +1,40 @@
+"""storedfile table for uploaded files metadata
+
+Revision ID: a6f3d2b8e514
+Revises: 5b1e9c3a7f24
+Create Date: 2026-10-18 20:04:11.720931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6f3d2b8e514'
+down_revision = '5b1e9c3a7f24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # filled from .meta.json sidecars by tools/migrate_file_storage.py
+    op.create_table('storedfile',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('file_id', sa.String(), nullable=True),
+    sa.Column('file_name', sa.String(), nullable=True),
+    sa.Column('content_type', sa.String(), nullable=True),
+    sa.Column('content_hash', sa.String(), nullable=True),
+    sa.Column('size', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_storedfile_id'), 'storedfile', ['id'], unique=False)
+    op.create_index(op.f('ix_storedfile_file_id'), 'storedfile', ['file_id'], unique=True)
+    op.create_index(op.f('ix_storedfile_content_hash'), 'storedfile', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_storedfile_content_hash'), table_name='storedfile')
+    op.drop_index(op.f('ix_storedfile_file_id'), table_name='storedfile')
+    op.drop_index(op.f('ix_storedfile_id'), table_name='storedfile')
+    op.drop_table('storedfile')
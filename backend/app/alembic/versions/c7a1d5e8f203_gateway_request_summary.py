@@ -0,0 +1,70 @@
+"""gatewayrequest summary table
+
+Revision ID: c7a1d5e8f203
+Revises: 8d4e6a2c91b7
+Create Date: 2026-10-18 16:41:09.318275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a1d5e8f203'
+down_revision = '8d4e6a2c91b7'
+branch_labels = None
+depends_on = None
+
+TABLES = ['cascade', 'sense', 'nft']
+
+
+def upgrade() -> None:
+    op.create_table('gatewayrequest',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('request_id', sa.String(), nullable=True),
+    sa.Column('service', sa.String(), nullable=True),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.Column('total_count', sa.Integer(), nullable=False),
+    sa.Column('pending_count', sa.Integer(), nullable=False),
+    sa.Column('success_count', sa.Integer(), nullable=False),
+    sa.Column('failed_count', sa.Integer(), nullable=False),
+    sa.Column('total_fee', sa.Integer(), nullable=False),
+    sa.Column('is_terminal', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_gatewayrequest_id'), 'gatewayrequest', ['id'], unique=False)
+    op.create_index(op.f('ix_gatewayrequest_request_id'), 'gatewayrequest', ['request_id'], unique=True)
+    op.create_index(op.f('ix_gatewayrequest_service'), 'gatewayrequest', ['service'], unique=False)
+    op.create_index(op.f('ix_gatewayrequest_owner_id'), 'gatewayrequest', ['owner_id'], unique=False)
+    op.create_index(op.f('ix_gatewayrequest_is_terminal'), 'gatewayrequest', ['is_terminal'], unique=False)
+
+    # summaries of the existing requests; ids are sequential - random ones would collide on large databases
+    for table in TABLES:
+        op.execute(f"""
+            INSERT INTO gatewayrequest (id, request_id, service, owner_id, total_count, pending_count, success_count,
+                                        failed_count, total_fee, is_terminal, created_at, updated_at)
+            SELECT (SELECT coalesce(max(id), 0) FROM gatewayrequest) + row_number() OVER (),
+                   request_id, '{table}', min(owner_id), count(*),
+                   count(*) FILTER (WHERE process_status IS NULL OR process_status NOT IN ('DONE', 'DEAD')),
+                   count(*) FILTER (WHERE process_status = 'DONE'),
+                   count(*) FILTER (WHERE process_status = 'DEAD'),
+                   coalesce(sum(wn_fee), 0),
+                   count(*) FILTER (WHERE process_status IN ('DONE', 'DEAD')) = count(*),
+                   min(created_at), max(updated_at)
+            FROM {table}
+            WHERE request_id IS NOT NULL
+            GROUP BY request_id
+            ON CONFLICT (request_id) DO NOTHING
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_gatewayrequest_is_terminal'), table_name='gatewayrequest')
+    op.drop_index(op.f('ix_gatewayrequest_owner_id'), table_name='gatewayrequest')
+    op.drop_index(op.f('ix_gatewayrequest_service'), table_name='gatewayrequest')
+    op.drop_index(op.f('ix_gatewayrequest_request_id'), table_name='gatewayrequest')
+    op.drop_index(op.f('ix_gatewayrequest_id'), table_name='gatewayrequest')
+    op.drop_table('gatewayrequest')
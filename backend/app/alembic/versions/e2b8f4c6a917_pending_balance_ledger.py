@@ -0,0 +1,55 @@
+"""pendingbalance ledger table
+
+Revision ID: e2b8f4c6a917
+Revises: c7a1d5e8f203
+Create Date: 2026-10-18 18:22:54.604113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8f4c6a917'
+down_revision = 'c7a1d5e8f203'
+branch_labels = None
+depends_on = None
+
+PENDING = "owner_id = u.id AND process_status != 'DONE' AND process_status != 'DEAD'"
+
+
+def upgrade() -> None:
+    op.create_table('pendingbalance',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=True),
+    sa.Column('cascade_pending', sa.Float(), nullable=False),
+    sa.Column('sense_pending', sa.Float(), nullable=False),
+    sa.Column('nft_pending', sa.Float(), nullable=False),
+    sa.Column('collection_pending_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['owner_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pendingbalance_id'), 'pendingbalance', ['id'], unique=False)
+    op.create_index(op.f('ix_pendingbalance_owner_id'), 'pendingbalance', ['owner_id'], unique=True)
+
+    # the same sums as utils.accounts.get_total_balance used to calculate on every call;
+    # one row per user, so user id is a unique id without the collisions of random ones
+    op.execute(f"""
+        INSERT INTO pendingbalance (id, owner_id, cascade_pending, sense_pending, nft_pending,
+                                    collection_pending_count, updated_at, reconciled_at)
+        SELECT u.id, u.id,
+               coalesce((SELECT sum(wn_fee) FROM cascade WHERE {PENDING}), 0),
+               coalesce((SELECT sum(wn_fee) FROM sense WHERE {PENDING}), 0),
+               coalesce((SELECT sum(wn_fee) FROM nft WHERE {PENDING}), 0),
+               (SELECT count(*) FROM collection WHERE {PENDING}),
+               now() at time zone 'utc', now() at time zone 'utc'
+        FROM "user" u
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_pendingbalance_owner_id'), table_name='pendingbalance')
+    op.drop_index(op.f('ix_pendingbalance_id'), table_name='pendingbalance')
+    op.drop_table('pendingbalance')
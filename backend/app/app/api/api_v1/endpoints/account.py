@@ -1,4 +1,3 @@
-import asyncio
 import time
 import random
 import binascii
@@ -12,7 +11,7 @@ import app.db.session as session
 from app import crud, models
 from app.api import deps
 import app.utils.pasteld as psl
-from app.utils.accounts import get_total_balance
+from app.utils.accounts import get_total_balance, make_total_balance
 
 router = APIRouter()
 cache = TTLCache(maxsize=100, ttl=600)
@@ -59,7 +58,7 @@ def pastelid_claiming_step_2(
             status_code=400,
             detail="The signature is invalid",
         )
-    ok = asyncio.run(psl.verify_message(stored_message, signature, pastel_id))
+    ok = psl.run_with_pasteld_client(psl.verify_message(stored_message, signature, pastel_id))
     if not ok:
         raise HTTPException(
             status_code=400,
@@ -105,11 +104,14 @@ def total_balances(
     super_user: models.User = Depends(deps.OAuth2Auth.get_current_active_superuser),
 ) -> List[Dict]:
     total_balances_list = []
-    for user in crud.user.get_multi(db):
+    users = crud.user.get_multi(db)
+    pending_balances = {pending_balance.owner_id: pending_balance
+                        for pending_balance in crud.pending_balance.get_by_owners(db, owner_ids=[u.id for u in users])}
+    for user in users:
         total_balances_list.append({
             "user_id": user.id,
             "user_email": user.email,
-            "balances": get_total_balance(db, user=user),
+            "balances": make_total_balance(user, pending_balances.get(user.id)),
         })
 
     return total_balances_list
@@ -1,6 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, WebSocket, Query
-import zipfile
-import io
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, WebSocket, Query, Request, Response
+from datetime import datetime
 from typing import List, Optional
 from sqlalchemy.orm import Session
 
@@ -43,8 +42,12 @@ async def process_request(
 @router.get("/gateway_requests", response_model=List[schemas.RequestResult], response_model_exclude_none=True, operation_id="cascade_get_all_requests")
 async def get_all_requests(
         *,
+        response: Response,
         status_requested: Optional[ReqStatus] = Query(None),
-        offset: int = 0, limit: int = 10000,
+        cursor: Optional[str] = Query(None),
+        created_from: Optional[datetime] = Query(None),
+        created_to: Optional[datetime] = Query(None),
+        offset: int = 0, limit: int = Query(10000, ge=1, le=10000),
         db: Session = Depends(session.get_db_session),
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
         current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
@@ -54,7 +57,11 @@ async def get_all_requests(
     """
     tasks_from_db = crud.cascade.get_multi_by_owner_and_status(db=db, owner_id=current_user.id,
                                                                req_status=status_requested.value if status_requested else None,
-                                                               skip=offset, limit=limit)
+                                                               skip=offset, limit=limit,
+                                                               **common.page_filters(cursor=cursor,
+                                                                                     created_from=created_from,
+                                                                                     created_to=created_to))
+    common.set_next_cursor(response, tasks_from_db, limit)
     if not tasks_from_db:
         raise HTTPException(status_code=200, detail="No gateway_requests found")
     return await common.parse_users_requests(tasks_from_db, wn.WalletNodeService.CASCADE)
@@ -79,27 +86,74 @@ async def get_request(
     return await common.parse_user_request(tasks_from_db, gateway_request_id, wn.WalletNodeService.CASCADE)
 
 
+# Get summaries of all Cascade gateway_requests for the current user
+# Note: Only authenticated user with API key
+@router.get("/gateway_requests_summary", response_model=List[schemas.GatewayRequestSummary], operation_id="cascade_get_all_requests_summary")
+async def get_all_requests_summary(
+        *,
+        status_requested: Optional[ReqStatus] = Query(None),
+        offset: int = 0, limit: int = Query(10000, ge=1, le=10000),
+        db: Session = Depends(session.get_db_session),
+        api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
+        current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
+) -> List[schemas.GatewayRequestSummary]:
+    """
+    Return status and counts of results of every gateway_request, without checking the results themselves
+    """
+    summaries = crud.gateway_request.get_multi_by_owner_and_status(db=db, owner_id=current_user.id,
+                                                                   service=wn.WalletNodeService.CASCADE.ticket_name(),
+                                                                   req_status=status_requested.value if status_requested else None,
+                                                                   skip=offset, limit=limit)
+    return [common.make_request_summary(summary) for summary in summaries]
+
+
+# Get summary of an individual Cascade gateway_request by its gateway_request_id
+# Note: Only authenticated user with API key
+@router.get("/gateway_requests_summary/{gateway_request_id}", response_model=schemas.GatewayRequestSummary, operation_id="cascade_get_request_summary")
+async def get_request_summary(
+        *,
+        gateway_request_id: str,
+        db: Session = Depends(session.get_db_session),
+        api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
+        current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
+) -> schemas.GatewayRequestSummary:
+    """
+    Return status and counts of results of the gateway_request
+    """
+    summary = crud.gateway_request.get_by_request_id_and_owner(db=db, request_id=gateway_request_id,
+                                                               owner_id=current_user.id)
+    if not summary or summary.service != wn.WalletNodeService.CASCADE.ticket_name():
+        raise HTTPException(status_code=404, detail="No gateway_request found")
+    return common.make_request_summary(summary)
+
+
 # Get all Cascade gateway_results for the current user
 # Note: Only authenticated user with API key
 @router.get("/gateway_results", response_model=List[schemas.ResultRegistrationResult], response_model_exclude_none=True, operation_id="cascade_get_all_results")
 async def get_all_results(
         *,
+        response: Response,
         status_requested: Optional[ReqStatus] = Query(None),
-        offset: int = 0, limit: int = 10000,
+        cursor: Optional[str] = Query(None),
+        created_from: Optional[datetime] = Query(None),
+        created_to: Optional[datetime] = Query(None),
+        gateway_request_id: Optional[str] = Query(None),
+        offset: int = 0, limit: int = Query(10000, ge=1, le=10000),
         db: Session = Depends(session.get_db_session),
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
         current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
 ) -> List[schemas.ResultRegistrationResult]:
-    tasks_results = []
     tasks_from_db = crud.cascade.get_multi_by_owner_and_status(db=db, owner_id=current_user.id,
                                                                req_status=status_requested.value if status_requested else None,
-                                                               skip=offset, limit=limit)
+                                                               skip=offset, limit=limit,
+                                                               request_id=gateway_request_id,
+                                                               **common.page_filters(cursor=cursor,
+                                                                                     created_from=created_from,
+                                                                                     created_to=created_to))
+    common.set_next_cursor(response, tasks_from_db, limit)
     # if not tasks_from_db:
     #     raise HTTPException(status_code=200, detail="No gateway_results found")
-    for task_from_db in tasks_from_db:
-        task_result = await common.check_result_registration_status(task_from_db, wn.WalletNodeService.CASCADE)
-        tasks_results.append(task_result)
-    return tasks_results
+    return await common.check_results_registration_status(tasks_from_db, wn.WalletNodeService.CASCADE)
 
 
 # Get an individual Cascade gateway_result by its result_id
@@ -132,18 +186,10 @@ async def get_all_files_from_request(
     if not tasks_from_db:
         raise HTTPException(status_code=404, detail="No gateway_results or gateway_requests found")
 
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for task_from_db in tasks_from_db:
-            file_bytes = await common.search_gateway_file(db=db,
-                                                          task_from_db=task_from_db,
-                                                          service=wn.WalletNodeService.CASCADE,
-                                                          update_task_in_db_func=crud.cascade.update)
-            zip_file.writestr(task_from_db.original_file_name, file_bytes)
-
-    return await common.stream_file(file_bytes=zip_buffer.getvalue(),
-                                    original_file_name=f"{gateway_request_id}.zip",
-                                    content_type="application/zip")
+    return await common.get_all_files_from_request(tasks_from_db=tasks_from_db,
+                                                   gateway_request_id=gateway_request_id,
+                                                   service=wn.WalletNodeService.CASCADE,
+                                                   update_task_in_db_func=crud.cascade.update)
 
 
 # Get the underlying Cascade stored_file from the corresponding gateway_result_id
@@ -151,6 +197,7 @@ async def get_all_files_from_request(
 @router.get("/stored_file/{gateway_result_id}", operation_id="cascade_get_stored_file_from_result")
 async def get_stored_file_from_result(
         *,
+        request: Request,
         gateway_result_id: str,
         db: Session = Depends(session.get_db_session),
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
@@ -159,12 +206,11 @@ async def get_stored_file_from_result(
     task_from_db = crud.cascade.get_by_result_id_and_owner(db=db, result_id=gateway_result_id, owner_id=current_user.id)
     if not task_from_db:
         raise HTTPException(status_code=404, detail="gateway_result not found")
-    file_bytes = await common.search_gateway_file(db=db,
-                                                  task_from_db=task_from_db,
-                                                  service=wn.WalletNodeService.CASCADE,
-                                                  update_task_in_db_func=crud.cascade.update)
-    return await common.stream_file(file_bytes=file_bytes,
-                                    original_file_name=f"{task_from_db.original_file_name}")
+    return await common.stream_gateway_file(request=request,
+                                            db=db,
+                                            task_from_db=task_from_db,
+                                            service=wn.WalletNodeService.CASCADE,
+                                            update_task_in_db_func=crud.cascade.update)
 
 
 # Get the underlying Cascade stored_file from the corresponding Cascade Registration Ticket Transaction ID
@@ -173,6 +219,7 @@ async def get_stored_file_from_result(
 @router.get("/stored_file_from_registration_ticket/{registration_ticket_txid}", operation_id="cascade_get_stored_file_from_registration_ticket")
 async def get_stored_file_from_registration_ticket(
         *,
+        request: Request,
         registration_ticket_txid: str,
         db: Session = Depends(session.get_db_session),
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
@@ -182,12 +229,11 @@ async def get_stored_file_from_registration_ticket(
                                                           reg_txid=registration_ticket_txid)
     if not task_from_db:
         raise HTTPException(status_code=404, detail="gateway_result not found")
-    file_bytes = await common.search_gateway_file(db=db,
-                                                  task_from_db=task_from_db,
-                                                  service=wn.WalletNodeService.CASCADE,
-                                                  update_task_in_db_func=crud.cascade.update)
-    return await common.stream_file(file_bytes=file_bytes,
-                                    original_file_name=f"{task_from_db.original_file_name}")
+    return await common.stream_gateway_file(request=request,
+                                            db=db,
+                                            task_from_db=task_from_db,
+                                            service=wn.WalletNodeService.CASCADE,
+                                            update_task_in_db_func=crud.cascade.update)
 
 
 # Get the underlying Cascade stored_file from the corresponding Cascade Activation Ticket Transaction ID
@@ -196,6 +242,7 @@ async def get_stored_file_from_registration_ticket(
 @router.get("/stored_file_from_activation_ticket/{activation_ticket_txid}", operation_id="cascade_get_stored_file_from_activation_ticket")
 async def get_stored_file_from_activation_ticket(
         *,
+        request: Request,
         activation_ticket_txid: str,
         db: Session = Depends(session.get_db_session),
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
@@ -205,12 +252,11 @@ async def get_stored_file_from_activation_ticket(
                                                           act_txid=activation_ticket_txid)
     if not task_from_db:
         raise HTTPException(status_code=404, detail="gateway_result not found")
-    file_bytes = await common.search_gateway_file(db=db,
-                                                  task_from_db=task_from_db,
-                                                  service=wn.WalletNodeService.CASCADE,
-                                                  update_task_in_db_func=crud.cascade.update)
-    return await common.stream_file(file_bytes=file_bytes,
-                                    original_file_name=f"{task_from_db.original_file_name}")
+    return await common.stream_gateway_file(request=request,
+                                            db=db,
+                                            task_from_db=task_from_db,
+                                            service=wn.WalletNodeService.CASCADE,
+                                            update_task_in_db_func=crud.cascade.update)
 
 
 # Get the Public Cascade stored_file from the corresponding Cascade Registration Ticket Transaction ID
@@ -219,13 +265,15 @@ async def get_stored_file_from_activation_ticket(
 @router.get("/public_stored_file_from_registration_ticket/{registration_ticket_txid}", operation_id="cascade_get_public_stored_file_from_registration_ticket")
 async def get_public_stored_file_from_registration_ticket(
         *,
+        request: Request,
         registration_ticket_txid: str,
         db: Session = Depends(session.get_db_session),
 ):
     return await common.get_public_file(db=db,
                                   ticket_type="cascade",
                                   registration_ticket_txid=registration_ticket_txid,
-                                  wn_service=wn.WalletNodeService.CASCADE)
+                                  wn_service=wn.WalletNodeService.CASCADE,
+                                  request=request)
 
 
 # Get the ORIGINAL uploaded from the corresponding gateway_result_id
@@ -385,6 +433,24 @@ async def status_of_result(
     await common.process_websocket_for_result(websocket, results, wn.WalletNodeService.CASCADE)
 
 
+# Stream status changes of all Cascade gateway_results of the current user as Server-Sent Events
+# Note: Only authenticated user with API key
+@router.get("/status/stream", operation_id="cascade_status_stream")
+async def status_stream(
+        *,
+        request: Request,
+        api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_cascade),
+        current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
+):
+    """
+    Stream status of Cascade gateway_results as Server-Sent Events, every time it changes.
+    Reconnecting client continues from the Last-Event-ID header.
+    'resync' event means some changes were lost - read gateway_requests again
+    """
+    return await common.stream_status_events(request=request, owner_id=current_user.id,
+                                             service=wn.WalletNodeService.CASCADE, crud_klass=crud.cascade)
+
+
 @router.get("/result/transfer_pastel_ticket", operation_id="cascade_transfer_pastel_ticket_to_another_pastelid")
 async def transfer_pastel_ticket_to_another_pastelid(
         *,
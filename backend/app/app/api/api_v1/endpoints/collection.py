@@ -129,14 +129,11 @@ async def get_all_sense_collections(
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_sense),
         current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
 ) -> List[schemas.CollectionRegistrationResult]:
-    task_results = []
     tasks_from_db = crud.collection.get_multi_by_owner_by_type(db=db, owner_id=current_user.id, item_type="sense")
     if not tasks_from_db:
         raise HTTPException(status_code=200, detail="No gateway_requests found")
-    for task_from_db in tasks_from_db:
-        task_result = await common.check_result_registration_status(task_from_db, wn.WalletNodeService.COLLECTION)
-        task_results.append(await result_to_collection(task_result))
-    return task_results
+    task_results = await common.check_results_registration_status(tasks_from_db, wn.WalletNodeService.COLLECTION)
+    return [await result_to_collection(task_result) for task_result in task_results]
 
 
 # Get an individual NFT gateway_result by its result_id.
@@ -166,14 +163,11 @@ async def get_all_nft_collections(
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_nft),
         current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
 ) -> List[schemas.CollectionRegistrationResult]:
-    task_results = []
     tasks_from_db = crud.collection.get_multi_by_owner_by_type(db=db, owner_id=current_user.id, item_type="nft")
     if not tasks_from_db:
         raise HTTPException(status_code=200, detail="No gateway_requests found")
-    for task_from_db in tasks_from_db:
-        task_result = await common.check_result_registration_status(task_from_db, wn.WalletNodeService.COLLECTION)
-        task_results.append(await result_to_collection(task_result))
-    return task_results
+    task_results = await common.check_results_registration_status(tasks_from_db, wn.WalletNodeService.COLLECTION)
+    return [await result_to_collection(task_result) for task_result in task_results]
 
 
 # Get an individual NFT gateway_result by its result_id.
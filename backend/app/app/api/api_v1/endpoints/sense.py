@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, WebSocket, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, WebSocket, Query, Request
+from datetime import datetime
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from starlette.responses import Response
@@ -43,15 +44,23 @@ async def process_request(
 @router.get("/gateway_requests", response_model=List[schemas.RequestResult], response_model_exclude_none=True, operation_id="sense_get_all_requests")
 async def get_all_requests(
         *,
+        response: Response,
         status_requested: Optional[ReqStatus] = Query(None),
-        offset: int = 0, limit: int = 10000,
+        cursor: Optional[str] = Query(None),
+        created_from: Optional[datetime] = Query(None),
+        created_to: Optional[datetime] = Query(None),
+        offset: int = 0, limit: int = Query(10000, ge=1, le=10000),
         db: Session = Depends(session.get_db_session),
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_sense),
         current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
 ) -> List[schemas.RequestResult]:
     tasks_from_db = crud.sense.get_multi_by_owner_and_status(db=db, owner_id=current_user.id,
                                                              req_status=status_requested.value if status_requested else None,
-                                                             skip=offset, limit=limit)
+                                                             skip=offset, limit=limit,
+                                                             **common.page_filters(cursor=cursor,
+                                                                                   created_from=created_from,
+                                                                                   created_to=created_to))
+    common.set_next_cursor(response, tasks_from_db, limit)
     if not tasks_from_db:
         raise HTTPException(status_code=200, detail="No gateway_requests found")
     return await common.parse_users_requests(tasks_from_db, wn.WalletNodeService.SENSE)
@@ -73,27 +82,74 @@ async def get_request(
     return await common.parse_user_request(tasks_from_db, gateway_request_id, wn.WalletNodeService.SENSE)
 
 
+# Get summaries of all Sense gateway_requests for the current user
+# Note: Only authenticated user with API key
+@router.get("/gateway_requests_summary", response_model=List[schemas.GatewayRequestSummary], operation_id="sense_get_all_requests_summary")
+async def get_all_requests_summary(
+        *,
+        status_requested: Optional[ReqStatus] = Query(None),
+        offset: int = 0, limit: int = Query(10000, ge=1, le=10000),
+        db: Session = Depends(session.get_db_session),
+        api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_sense),
+        current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
+) -> List[schemas.GatewayRequestSummary]:
+    """
+    Return status and counts of results of every gateway_request, without checking the results themselves
+    """
+    summaries = crud.gateway_request.get_multi_by_owner_and_status(db=db, owner_id=current_user.id,
+                                                                   service=wn.WalletNodeService.SENSE.ticket_name(),
+                                                                   req_status=status_requested.value if status_requested else None,
+                                                                   skip=offset, limit=limit)
+    return [common.make_request_summary(summary) for summary in summaries]
+
+
+# Get summary of an individual Sense gateway_request by its gateway_request_id
+# Note: Only authenticated user with API key
+@router.get("/gateway_requests_summary/{gateway_request_id}", response_model=schemas.GatewayRequestSummary, operation_id="sense_get_request_summary")
+async def get_request_summary(
+        *,
+        gateway_request_id: str,
+        db: Session = Depends(session.get_db_session),
+        api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_sense),
+        current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
+) -> schemas.GatewayRequestSummary:
+    """
+    Return status and counts of results of the gateway_request
+    """
+    summary = crud.gateway_request.get_by_request_id_and_owner(db=db, request_id=gateway_request_id,
+                                                               owner_id=current_user.id)
+    if not summary or summary.service != wn.WalletNodeService.SENSE.ticket_name():
+        raise HTTPException(status_code=404, detail="No gateway_request found")
+    return common.make_request_summary(summary)
+
+
 # Get all Sense gateway_results for the current user.
 # Note: Only authenticated user with API key
 @router.get("/gateway_results", response_model=List[schemas.ResultRegistrationResult], response_model_exclude_none=True, operation_id="sense_get_all_results")
 async def get_all_results(
         *,
+        response: Response,
         status_requested: Optional[ReqStatus] = Query(None),
-        offset: int = 0, limit: int = 10000,
+        cursor: Optional[str] = Query(None),
+        created_from: Optional[datetime] = Query(None),
+        created_to: Optional[datetime] = Query(None),
+        gateway_request_id: Optional[str] = Query(None),
+        offset: int = 0, limit: int = Query(10000, ge=1, le=10000),
         db: Session = Depends(session.get_db_session),
         api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_sense),
         current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
 ) -> List[schemas.ResultRegistrationResult]:
-    task_results = []
     tasks_from_db = crud.sense.get_multi_by_owner_and_status(db=db, owner_id=current_user.id,
                                                              req_status=status_requested.value if status_requested else None,
-                                                             skip=offset, limit=limit)
+                                                             skip=offset, limit=limit,
+                                                             request_id=gateway_request_id,
+                                                             **common.page_filters(cursor=cursor,
+                                                                                   created_from=created_from,
+                                                                                   created_to=created_to))
+    common.set_next_cursor(response, tasks_from_db, limit)
     # if not tasks_from_db:
     #     raise HTTPException(status_code=200, detail="No gateway_requests found")
-    for task_from_db in tasks_from_db:
-        task_result = await common.check_result_registration_status(task_from_db, wn.WalletNodeService.SENSE)
-        task_results.append(task_result)
-    return task_results
+    return await common.check_results_registration_status(tasks_from_db, wn.WalletNodeService.SENSE)
 
 
 # Get an individual Sense gateway_result by its result_id.
@@ -477,6 +533,24 @@ async def result_status(
     await common.process_websocket_for_result(websocket, tasks_in_db, wn.WalletNodeService.SENSE)
 
 
+# Stream status changes of all Sense gateway_results of the current user as Server-Sent Events
+# Note: Only authenticated user with API key
+@router.get("/status/stream", operation_id="sense_status_stream")
+async def status_stream(
+        *,
+        request: Request,
+        api_key: models.ApiKey = Depends(deps.APIKeyAuth.get_api_key_for_sense),
+        current_user: models.User = Depends(deps.APIKeyAuth.get_user_by_apikey)
+):
+    """
+    Stream status of Sense gateway_results as Server-Sent Events, every time it changes.
+    Reconnecting client continues from the Last-Event-ID header.
+    'resync' event means some changes were lost - read gateway_requests again
+    """
+    return await common.stream_status_events(request=request, owner_id=current_user.id,
+                                             service=wn.WalletNodeService.SENSE, crud_klass=crud.sense)
+
+
 @router.get("/result/transfer_pastel_ticket", operation_id="sense_transfer_pastel_ticket_to_another_pastelid")
 async def transfer_pastel_ticket_to_another_pastelid(
         *,
@@ -1,34 +1,39 @@
 import asyncio
 import hashlib
 import json
-import zipfile
-import io
 import uuid
 import base64
 import logging
+import os
+from collections import deque
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
+import aiofiles
 import zstd as zstd
 
-from fastapi import UploadFile, HTTPException, status
-from fastapi.responses import StreamingResponse
-from requests import HTTPError
+from fastapi import UploadFile, HTTPException, Request, status
+from fastapi.responses import FileResponse, Response, StreamingResponse
 
 from app.models import ApiKey
-from app.utils.filestorage import LocalFile, store_file_into_local_cache, search_file_in_local_cache, \
-    search_nft_dd_result, search_processed_file
+from app.utils.filestorage import LocalFile, search_nft_dd_result, search_processed_file, get_cached_result_path, \
+    download_into_local_cache
 from app import schemas, crud
 from app.core.config import settings
-from app.core.status import DbStatus, get_status_from_history_log
+from app.core.status import DbStatus, get_statuses_from_history_log
 from app.utils import walletnode as wn
 import app.utils.pasteld as psl
+from app.utils import ticket_cache, status_bus
 from app.utils.ipfs_tools import store_file_to_ipfs, search_file_locally_or_in_ipfs
+from app.utils.zip_stream import zip_stream
 import app.celery_tasks.nft as nft
+import app.celery_tasks.ipfs as ipfs
 from app.utils.secret_manager import get_pastelid_pwd
 from app.db.session import db_context
 
 logger = logging.getLogger(__name__)
 
+FILE_STREAM_CHUNK_SIZE = 1024 * 1024
+
 
 async def process_nft_request(
         *,
@@ -50,13 +55,15 @@ async def process_nft_request(
         if result != psl.TicketTransactionStatus.CONFIRMED:
             raise HTTPException(status_code=400, detail=f'Collection activation ticket {collection_act_txid} not found')
 
-    ipfs_hash = await store_file_to_ipfs(lf.path)
+    ipfs_hash = None if settings.IPFS_ADD_IN_BACKGROUND else await store_file_to_ipfs(lf.path)
     _ = (
             nft.register_file.s(result_id, lf, request_id, user_id, api_key, ipfs_hash, make_publicly_accessible,
                                 collection_act_txid, open_api_group_id, nft_details_payload,
                                 after_activation_transfer_to_pastelid) |
             nft.process.s()
     ).apply_async()
+    if not ipfs_hash:
+        ipfs.add_original_file.apply_async((result_id, wn.WalletNodeService.NFT))
 
     reg_result = await make_pending_result(lf.name, lf.type, ipfs_hash, result_id)
     reg_result.make_publicly_accessible = make_publicly_accessible
@@ -89,7 +96,7 @@ async def process_action_request(
     )
     await check_pastelid_for_transfer(db=db, pastel_id=after_activation_transfer_to_pastelid, user_id=user_id)
     if service == wn.WalletNodeService.SENSE and collection_act_txid:
-        result = psl.check_ticket_transaction(collection_act_txid, 'action-act', 0, 0)
+        result = await psl.check_ticket_transaction(collection_act_txid, 'action-act', 0, 0)
         if result != psl.TicketTransactionStatus.CONFIRMED:
             raise HTTPException(status_code=400, detail=f'Collection activation ticket {collection_act_txid} not found')
 
@@ -99,16 +106,23 @@ async def process_action_request(
             request_result.results.append(reg_result)
             continue
 
+        result_id = str(uuid.uuid4())
+        lf = LocalFile(file.filename, file.content_type, result_id)
         if service == wn.WalletNodeService.SENSE:
-            reg_result = await check_image(file, db, service)
+            reg_result = check_image_type(file)
             if reg_result is not None:
                 request_result.results.append(reg_result)
                 continue
-
-        result_id = str(uuid.uuid4())
-        lf = LocalFile(file.filename, file.content_type, result_id)
-        await lf.save(file)
-        ipfs_hash = await store_file_to_ipfs(lf.path)
+            # image is checked by the hash computed while saving, and added to IPFS only if it is accepted
+            await lf.save(file)
+            reg_result = await check_image(file, db, service, data_hash=lf.content_hash)
+            if reg_result is not None:
+                lf.discard()
+                request_result.results.append(reg_result)
+                continue
+            ipfs_hash = None if settings.IPFS_ADD_IN_BACKGROUND else await store_file_to_ipfs(lf.path)
+        else:
+            ipfs_hash = await lf.save(file, add_to_ipfs=not settings.IPFS_ADD_IN_BACKGROUND)
         _ = (
                 worker.register_file.s(result_id, lf, request_id, user_id, api_key, ipfs_hash,
                                        make_publicly_accessible, collection_act_txid, open_api_group_id,
@@ -116,6 +130,8 @@ async def process_action_request(
                 worker.preburn_fee.s() |
                 worker.process.s()
         ).apply_async()
+        if not ipfs_hash:
+            ipfs.add_original_file.apply_async((result_id, service))
 
         reg_result = await make_pending_result(file.filename, file.content_type, ipfs_hash, result_id)
         if service == wn.WalletNodeService.CASCADE:
@@ -191,9 +207,10 @@ async def process_existing_result(task_from_db, service: wn.WalletNodeService) -
     return reg_result
 
 
-async def check_result_registration_status(task_from_db, service: wn.WalletNodeService) \
-        -> schemas.ResultRegistrationResult:
-
+def _registration_status_from_db(task_from_db) -> schemas.Status | None:
+    """
+    Status by process_status only; None means the file was already registered (DbStatus.EXISTING)
+    """
     result_registration_status = schemas.Status.UNKNOWN
     if task_from_db.process_status:
         if task_from_db.process_status in [DbStatus.NEW.value, DbStatus.UPLOADED.value,
@@ -208,40 +225,79 @@ async def check_result_registration_status(task_from_db, service: wn.WalletNodeS
         elif task_from_db.process_status == DbStatus.DEAD.value:
             result_registration_status = schemas.Status.FAILED
         elif task_from_db.process_status == DbStatus.EXISTING.value:
-            return await process_existing_result(task_from_db, service)
+            return None
+    return result_registration_status
+
+
+def _registration_status_from_wn(result_registration_status, wn_task_status) -> schemas.Status:
+    for step in wn_task_status or []:
+        if step['status'] == 'Task Rejected' or step['status'] == 'Task Failed':
+            return schemas.Status.ERROR if settings.RETURN_DETAILED_WN_ERROR else schemas.Status.PENDING
+        if step['status'] == 'Task Completed':
+            return schemas.Status.SUCCESS
+        if step['status'] == 'Request Accepted':
+            result_registration_status = schemas.Status.PENDING_REG
+        if step['status'] == 'Request Registered':
+            result_registration_status = schemas.Status.PENDING_ACT
+    return result_registration_status
+
 
-    wn_task_status = ''
-    if (result_registration_status == schemas.Status.UNKNOWN or
-        result_registration_status == schemas.Status.PENDING) \
-            and task_from_db.wn_task_id:
+async def check_result_registration_status(task_from_db, service: wn.WalletNodeService) \
+        -> schemas.ResultRegistrationResult:
+    return (await check_results_registration_status([task_from_db], service))[0]
+
+
+async def check_results_registration_status(tasks_from_db, service: wn.WalletNodeService) \
+        -> List[schemas.ResultRegistrationResult]:
+    """
+    Statuses of many results at once: history logs of all of them are read with one query,
+    and WalletNode history of those without log is requested concurrently, WN_HISTORY_CONCURRENCY at a time
+    """
+    statuses = [_registration_status_from_db(task_from_db) for task_from_db in tasks_from_db]
+    wn_task_statuses = [''] * len(tasks_from_db)
+
+    pending = [i for i, task_from_db in enumerate(tasks_from_db)
+               if statuses[i] in [schemas.Status.UNKNOWN, schemas.Status.PENDING] and task_from_db.wn_task_id]
+    if pending:
         try:
-            history_log = get_status_from_history_log(task_from_db, service)
-            if history_log and history_log.status_messages:
-                wn_task_status = history_log.status_messages
-            else:
-                wn_task_status = wn.call(False,
-                                         service,
-                                         f'{task_from_db.wn_task_id}/history',
-                                         {}, [], {},
-                                         "", "")
-            if wn_task_status:
-                for step in wn_task_status:
-                    if step['status'] == 'Task Rejected' or step['status'] == 'Task Failed':
-                        result_registration_status = schemas.Status.ERROR \
-                            if settings.RETURN_DETAILED_WN_ERROR else schemas.Status.PENDING
-                        break
-                    if step['status'] == 'Task Completed':
-                        result_registration_status = schemas.Status.SUCCESS
-                        break
-                    if step['status'] == 'Request Accepted':
-                        result_registration_status = schemas.Status.PENDING_REG
-                    if step['status'] == 'Request Registered':
-                        result_registration_status = schemas.Status.PENDING_ACT
+            history_logs = get_statuses_from_history_log([tasks_from_db[i] for i in pending], service)
         except Exception as e:
-            logger.error(e)
-            result_registration_status = schemas.Status.ERROR \
-                if settings.RETURN_DETAILED_WN_ERROR else schemas.Status.PENDING
+            # won't throw exception - WalletNode will be asked instead
+            logger.error(f"Failed to read history logs: {e}")
+            history_logs = {}
+        semaphore = asyncio.Semaphore(settings.WN_HISTORY_CONCURRENCY)
 
+        async def resolve(i):
+            task_from_db = tasks_from_db[i]
+            try:
+                history_log = history_logs.get(task_from_db.id)
+                if history_log and history_log.status_messages:
+                    wn_task_statuses[i] = history_log.status_messages
+                else:
+                    async with semaphore:
+                        wn_task_statuses[i] = await wn.acall(False,
+                                                             service,
+                                                             f'{task_from_db.wn_task_id}/history',
+                                                             {}, [], {},
+                                                             "", "")
+                statuses[i] = _registration_status_from_wn(statuses[i], wn_task_statuses[i])
+            except Exception as e:
+                logger.error(e)
+                statuses[i] = schemas.Status.ERROR if settings.RETURN_DETAILED_WN_ERROR else schemas.Status.PENDING
+
+        await asyncio.gather(*(resolve(i) for i in pending))
+
+    results = []
+    for task_from_db, result_registration_status, wn_task_status in zip(tasks_from_db, statuses, wn_task_statuses):
+        if result_registration_status is None:
+            results.append(await process_existing_result(task_from_db, service))
+        else:
+            results.append(_make_registration_result(task_from_db, service, result_registration_status, wn_task_status))
+    return results
+
+
+def _make_registration_result(task_from_db, service: wn.WalletNodeService, result_registration_status,
+                             wn_task_status) -> schemas.ResultRegistrationResult:
     reg_result = schemas.ResultRegistrationResult(
         result_id=task_from_db.result_id,
         created_at=task_from_db.created_at,
@@ -293,7 +349,8 @@ async def parse_users_requests(tasks_from_db, service: wn.WalletNodeService) ->
     gw_requests = {}
     all_failed_map = {}
     all_success_map = {}
-    for task_from_db in tasks_from_db:
+    results = await check_results_registration_status(tasks_from_db, service)
+    for task_from_db, result_registration_result in zip(tasks_from_db, results):
         if task_from_db.request_id in gw_requests:
             request = gw_requests[task_from_db.request_id]
         else:
@@ -303,7 +360,6 @@ async def parse_users_requests(tasks_from_db, service: wn.WalletNodeService) ->
             all_failed_map[task_from_db.request_id] = True
             all_success_map[task_from_db.request_id] = True
 
-        result_registration_result = await check_result_registration_status(task_from_db, service)
         request.results.append(result_registration_result)
         all_failed_map[task_from_db.request_id] &= result_registration_result.result_status == schemas.Status.FAILED
         all_success_map[task_from_db.request_id] &= result_registration_result.result_status == schemas.Status.SUCCESS
@@ -318,8 +374,7 @@ async def parse_user_request(results_in_request, request_id, service: wn.WalletN
     request = schemas.RequestResult(request_id=request_id, request_status=schemas.Status.UNKNOWN, results=[])
     all_failed = True
     all_success = True
-    for result in results_in_request:
-        result_registration_result = await check_result_registration_status(result, service)
+    for result_registration_result in await check_results_registration_status(results_in_request, service):
         request.results.append(result_registration_result)
         all_failed &= result_registration_result.result_status == schemas.Status.FAILED
         all_success &= result_registration_result.result_status == schemas.Status.SUCCESS
@@ -328,48 +383,194 @@ async def parse_user_request(results_in_request, request_id, service: wn.WalletN
     return request
 
 
+def request_status_from_summary(summary) -> schemas.Status:
+    if summary.total_count and summary.failed_count == summary.total_count:
+        return schemas.Status.FAILED
+    if summary.total_count and summary.success_count == summary.total_count:
+        return schemas.Status.SUCCESS
+    return schemas.Status.PENDING
+
+
+def make_request_summary(summary) -> schemas.GatewayRequestSummary:
+    return schemas.GatewayRequestSummary(
+        request_id=summary.request_id,
+        request_status=request_status_from_summary(summary),
+        total_count=summary.total_count,
+        pending_count=summary.pending_count,
+        success_count=summary.success_count,
+        failed_count=summary.failed_count,
+        total_fee=summary.total_fee,
+        is_terminal=bool(summary.is_terminal),
+        created_at=summary.created_at,
+        last_updated_at=summary.updated_at,
+    )
+
+
+# Cursor is opaque for the clients: base64 of (created_at, id) of the last result in the page
+def encode_cursor(task_from_db) -> str:
+    raw = json.dumps([task_from_db.created_at.isoformat(), task_from_db.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('utf-8').rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, task_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(task_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _as_naive_utc(value: datetime | None) -> datetime | None:
+    # created_at is stored as naive UTC
+    if value and value.tzinfo:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def page_filters(*, cursor: str | None, created_from: datetime | None, created_to: datetime | None) -> dict:
+    return {
+        "after": decode_cursor(cursor) if cursor else None,
+        "created_from": _as_naive_utc(created_from),
+        "created_to": _as_naive_utc(created_to),
+    }
+
+
+def set_next_cursor(response: Response, tasks_from_db, limit: int):
+    """
+    Full page means there can be more - the next page starts after the cursor in X-Next-Cursor header
+    """
+    if tasks_from_db and len(tasks_from_db) >= limit and tasks_from_db[-1].created_at:
+        response.headers["X-Next-Cursor"] = encode_cursor(tasks_from_db[-1])
+
+
 async def process_websocket_for_result(websocket, tasks_from_db, service: wn.WalletNodeService, request_id: str = None):
     if not tasks_from_db or not tasks_from_db[0]:
         await websocket.send_text(f"No gateway_result or gateway_request found")
         raise HTTPException(status_code=404, detail="No gateway_result or gateway_request found")
 
-    while True:
-        all_failed = True
-        all_success = True
-        request_results_json = []
-        for task_from_db in tasks_from_db:
-            result_registration_result = await check_result_registration_status(task_from_db, service)
-            if result_registration_result is not None:
-                request_results_json.append(
-                    {
-                        'result_id': result_registration_result.result_id,
-                        'file_name': result_registration_result.file_name,
-                        'status': result_registration_result.result_status,
-                    }
-                )
-            all_failed &= result_registration_result.result_status == schemas.Status.FAILED
-            all_success &= result_registration_result.result_status == schemas.Status.SUCCESS
-
-        if request_id:
-            result_json = {
-                'request_id': request_id,
-                'request_status': 'FAILED' if all_failed else 'SUCCESS' if all_success else 'PENDING',
-                'results': request_results_json,
-            }
-        else:
-            result_json = request_results_json[0]
-
-        await websocket.send_json(result_json)
-        if all_failed or all_success:
-            break
+    tasks = {task_from_db.result_id: task_from_db for task_from_db in tasks_from_db}
+    results = {}
+    changed = set(tasks)
+    # subscribe before the first check, so no change is lost between the check and the subscription
+    async with status_bus.StatusSubscription(tasks_from_db[0].owner_id) as subscription:
+        while True:
+            changed = list(changed)
+            changed_results = await check_results_registration_status([tasks[result_id] for result_id in changed],
+                                                                      service)
+            results.update(zip(changed, changed_results))
+
+            all_failed = True
+            all_success = True
+            request_results_json = []
+            for result_id in tasks:
+                result_registration_result = results[result_id]
+                if result_registration_result is not None:
+                    request_results_json.append(
+                        {
+                            'result_id': result_registration_result.result_id,
+                            'file_name': result_registration_result.file_name,
+                            'status': result_registration_result.result_status,
+                        }
+                    )
+                all_failed &= result_registration_result.result_status == schemas.Status.FAILED
+                all_success &= result_registration_result.result_status == schemas.Status.SUCCESS
+
+            finished = all_failed or all_success
+            if request_id:
+                request_status = 'FAILED' if all_failed else 'SUCCESS' if all_success else 'PENDING'
+                # request status is kept in the summary, if it is there
+                with db_context() as session:
+                    summary = crud.gateway_request.get_by_request_id_and_owner(session, request_id=request_id,
+                                                                               owner_id=tasks_from_db[0].owner_id)
+                if summary:
+                    request_status = request_status_from_summary(summary).value
+                    finished = summary.is_terminal
+                result_json = {
+                    'request_id': request_id,
+                    'request_status': request_status,
+                    'results': request_results_json,
+                }
+            else:
+                result_json = request_results_json[0]
+
+            await websocket.send_json(result_json)
+            if finished:
+                break
+
+            # wait for status change published by Celery tasks; re-check everything if nothing came for too long
+            changed = await subscription.wait(set(tasks), settings.STATUS_BUS_FALLBACK_INTERVAL)
+            if not changed:
+                changed = set(tasks)
+            with db_context() as session:
+                for result_id in changed:
+                    task_from_db = session.get(type(tasks[result_id]), tasks[result_id].id)
+                    if task_from_db:
+                        tasks[result_id] = task_from_db
+
+
+def _sse_message(data, event_id: str = None, event: str = None) -> str:
+    message = f"id: {event_id}\n" if event_id else ""
+    if event:
+        message += f"event: {event}\n"
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+async def stream_status_events(*, request: Request, owner_id, service: wn.WalletNodeService, crud_klass):
+    """
+    Server-Sent Events with the current status of every result of the owner, sent each time it changes.
+    Event id is the id in the owner's status stream, so reconnecting client continues from Last-Event-ID.
+    If events after Last-Event-ID are already gone, 'resync' event is sent first - client should re-read
+    gateway_requests once
+    """
+    events = status_bus.StatusEventStream(owner_id, request.headers.get("last-event-id"))
+    try:
+        await events.open()
+    except Exception as e:
+        await events.close()
+        logger.error(f"Can't open status stream for owner {owner_id}: {e}")
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Status stream is not available")
 
-        await asyncio.sleep(150)  # 2.5 minutes
+    async def sse():
+        try:
+            yield "retry: 5000\n\n"
+            if events.missed:
+                yield _sse_message({}, event="resync")
+            while not await request.is_disconnected():
+                try:
+                    batch = await events.read(settings.STATUS_STREAM_KEEPALIVE_INTERVAL)
+                except Exception as e:
+                    # client will reconnect with Last-Event-ID
+                    logger.error(f"Status stream for owner {owner_id} failed: {e}")
+                    break
+                if not batch:
+                    yield ": keepalive\n\n"
+                    continue
+                # only the latest event of each result in the batch matters, as current status is sent anyway
+                latest = {}
+                for event_id, event in batch:
+                    if event.get("service") == service.ticket_name():
+                        latest.pop(event["result_id"], None)
+                        latest[event["result_id"]] = (event_id, event)
+                for result_id, (event_id, event) in latest.items():
+                    with db_context() as session:
+                        task_from_db = crud_klass.get_by_result_id_and_owner(session, result_id=result_id,
+                                                                             owner_id=owner_id)
+                    if not task_from_db:
+                        continue
+                    result = await check_result_registration_status(task_from_db, service)
+                    data = {"request_id": event.get("request_id"),
+                            **result.model_dump(mode="json", exclude_none=True)}
+                    yield _sse_message(data, event_id=event_id)
+        finally:
+            await events.close()
+
+    return StreamingResponse(sse(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 # search_gateway_file searches for file in 1) local cache; 2) Pastel network; 3) IPFS
 # Is used to search for files processed by Gateway: Cascade file, Sense dd data and NFT file
-async def search_gateway_file(*, db, task_from_db, service: wn.WalletNodeService, update_task_in_db_func) -> bytes:
-
+def check_gateway_file_access(task_from_db, service: wn.WalletNodeService):
     if service == wn.WalletNodeService.SENSE and task_from_db.process_status not in [DbStatus.DONE.value]:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"File not found")
 
@@ -379,6 +580,11 @@ async def search_gateway_file(*, db, task_from_db, service: wn.WalletNodeService
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail=f"Only owner can download cascade file")
 
+
+async def search_gateway_file(*, db, task_from_db, service: wn.WalletNodeService, update_task_in_db_func) -> bytes:
+
+    check_gateway_file_access(task_from_db, service)
+
     try:
         return await search_processed_file(db=db, task_from_db=task_from_db,
                                            update_task_in_db_func=update_task_in_db_func,
@@ -388,6 +594,27 @@ async def search_gateway_file(*, db, task_from_db, service: wn.WalletNodeService
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"File not found")
 
 
+# stream_gateway_file sends file processed by Gateway from the local cache, supports Range and ETag
+async def stream_gateway_file(*, request: Request, db, task_from_db, service: wn.WalletNodeService,
+                              update_task_in_db_func):
+    check_gateway_file_access(task_from_db, service)
+    etag = f'"{task_from_db.reg_ticket_txid}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    file_path = await get_cached_result_path(reg_ticket_txid=task_from_db.reg_ticket_txid)
+    if not file_path:
+        # will put the file into the local cache
+        file_bytes = await search_gateway_file(db=db, task_from_db=task_from_db, service=service,
+                                               update_task_in_db_func=update_task_in_db_func)
+        file_path = await get_cached_result_path(reg_ticket_txid=task_from_db.reg_ticket_txid)
+        if not file_path:
+            return await stream_file(file_bytes=file_bytes, original_file_name=f"{task_from_db.original_file_name}")
+
+    return await stream_cached_file(request=request, file_path=file_path, etag=etag,
+                                    original_file_name=f"{task_from_db.original_file_name}")
+
+
 # search_pastel_file searches for file in 1) local cache; 2) Pastel network
 # Is used to search for files that were not processed by Gateway: for Sense dd data and NFT dd data
 async def search_pastel_file(*, db=None, reg_ticket_txid: str, service: wn.WalletNodeService, throw=True) -> bytes:
@@ -401,22 +628,15 @@ async def search_pastel_file(*, db=None, reg_ticket_txid: str, service: wn.Walle
                     service == wn.WalletNodeService.COLLECTION and ticket.ticket_type != 'collection'):
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"TXID of wrong ticket type")
 
-    file_bytes = await search_file_in_local_cache(reg_ticket_txid=reg_ticket_txid)
-    not_locally_cached = not file_bytes
-
-    if not file_bytes:
-        # this supposed to be public file, so any PASTEL_ID will do
-        file_bytes = await wn.get_file_from_pastel(reg_ticket_txid=reg_ticket_txid,
-                                                   pastel_id=settings.PASTEL_ID,
-                                                   wn_service=service)
+    # this supposed to be public file, so any PASTEL_ID will do
+    file_bytes = await download_into_local_cache(
+        f"wn_file:{service.name}:{settings.PASTEL_ID}", reg_ticket_txid=reg_ticket_txid,
+        download=lambda: wn.get_file_from_pastel(reg_ticket_txid=reg_ticket_txid, pastel_id=settings.PASTEL_ID,
+                                                 wn_service=service))
 
     if not file_bytes and throw:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"File not found")
 
-    # cache file in local storage and IPFS
-    if file_bytes and not_locally_cached:
-        await store_file_into_local_cache(reg_ticket_txid=reg_ticket_txid, file_bytes=file_bytes)
-
     return file_bytes
 
 
@@ -438,81 +658,236 @@ async def search_nft_dd_result_gateway(*, db, task_from_db, update_task_in_db_fu
 # Is used to search for dd data - they are available for anyone
 async def search_nft_dd_result_pastel(*, reg_ticket_txid: str, throw=True) -> bytes:
 
-    dd_data = await search_file_in_local_cache(reg_ticket_txid=reg_ticket_txid, extra_suffix=".dd")
-    not_locally_cached = not dd_data
-
-    if not dd_data:
+    async def download() -> bytes | None:
         # this is public data, any PASTEL_ID should do
         dd_data = await wn.get_nft_dd_result_from_pastel(reg_ticket_txid=reg_ticket_txid,
                                                          pastel_id=settings.PASTEL_ID)
+        if not dd_data:
+            return None
+        if isinstance(dd_data, dict):
+            return json.dumps(dd_data).encode('utf-8')
+        elif isinstance(dd_data, bytes):
+            return dd_data
+        elif isinstance(dd_data, str):
+            return dd_data.encode('utf-8')
+        return None
 
-    if not dd_data:
+    # cache file in local storage only
+    dd_bytes = await download_into_local_cache(f"wn_dd:{settings.PASTEL_ID}", reg_ticket_txid=reg_ticket_txid,
+                                               extra_suffix=".dd", download=download)
+    if not dd_bytes:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Dupe detection data is not found")
+    return dd_bytes
 
-    if isinstance(dd_data, dict):
-        dd_bytes = json.dumps(dd_data).encode('utf-8')
-    elif isinstance(dd_data, bytes):
-        dd_bytes = dd_data
-    elif isinstance(dd_data, str):
-        dd_bytes = dd_data.encode('utf-8')
-    else:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Dupe detection data is not found")
 
-    # cache file in local storage only
-    if not_locally_cached:
-        await store_file_into_local_cache(reg_ticket_txid=reg_ticket_txid,
-                                          file_bytes=dd_bytes,
-                                          extra_suffix=".dd")
-    return dd_bytes
+def _held_bytes(window) -> int:
+    # memory taken by fetched results that are not yielded yet; files on disk don't count
+    held = 0
+    for _, task in window:
+        if task.done() and not task.cancelled() and not task.exception():
+            result = task.result()
+            if isinstance(result, (bytes, str)):
+                held += len(result)
+    return held
+
+
+async def fetch_in_order(items, fetch_func):
+    """
+    Runs fetch_func for items, no more than ZIP_FETCH_CONCURRENCY at once and while fetched results waiting
+    for their turn take less than ZIP_FETCH_WINDOW_BYTES, and yields (item, result) in the order of items.
+    Exception from fetch_func is raised when its item's turn comes
+    """
+    window = deque()
+    try:
+        for item in items:
+            while window and (len(window) >= max(settings.ZIP_FETCH_CONCURRENCY, 1) or
+                              _held_bytes(window) >= settings.ZIP_FETCH_WINDOW_BYTES):
+                ready_item, task = window.popleft()
+                yield ready_item, await task
+            window.append((item, asyncio.create_task(fetch_func(item))))
+        while window:
+            item, task = window.popleft()
+            yield item, await task
+    finally:
+        for _, task in window:
+            task.cancel()
+
+
+async def get_all_files_from_request(*, tasks_from_db, gateway_request_id, service: wn.WalletNodeService,
+                                     update_task_in_db_func):
+    async def entries():
+        # request's DB session is closed before the response is streamed, so use own one
+        with db_context() as session:
+            async def fetch(task_from_db):
+                file_path = await get_cached_result_path(reg_ticket_txid=task_from_db.reg_ticket_txid)
+                if not file_path:
+                    # will put the file into the local cache
+                    file_bytes = await search_gateway_file(db=session,
+                                                           task_from_db=task_from_db,
+                                                           service=service,
+                                                           update_task_in_db_func=update_task_in_db_func)
+                    file_path = await get_cached_result_path(reg_ticket_txid=task_from_db.reg_ticket_txid)
+                    if not file_path:
+                        return file_bytes
+                # opened right away - file that is already open stays readable even if it is evicted meanwhile
+                return open(file_path, 'rb')
+
+            async for task_from_db, file_content in fetch_in_order(tasks_from_db, fetch):
+                yield task_from_db.original_file_name, file_content
+
+    return await stream_zip(entries=entries(), original_file_name=f"{gateway_request_id}.zip")
 
 
 async def get_all_reg_ticket_from_request(*, gateway_request_id, tasks_from_db,
                                           service_type: str,
                                           get_registration_ticket_lambda):
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for task_from_db in tasks_from_db:
-            ticket = await get_registration_ticket_lambda(task_from_db.reg_ticket_txid)
-            # convert to bytes
-            file_bytes = json.dumps(ticket, indent=2).encode('utf-8')
-            zip_file.writestr(f"{task_from_db.original_file_name}-{service_type}-reg-ticket.json", file_bytes)
-    return await stream_file(file_bytes=zip_buffer.getvalue(),
-                             original_file_name=f"{gateway_request_id}-{service_type}-registration-tickets.zip",
-                             content_type="application/zip")
+    async def fetch(task_from_db):
+        ticket = await get_registration_ticket_lambda(task_from_db.reg_ticket_txid)
+        # convert to bytes
+        return json.dumps(ticket, indent=2).encode('utf-8')
 
+    async def entries():
+        async for task_from_db, file_bytes in fetch_in_order(tasks_from_db, fetch):
+            yield f"{task_from_db.original_file_name}-{service_type}-reg-ticket.json", file_bytes
 
-async def stream_file(*, file_bytes, original_file_name: str, content_type: str = "application/x-binary"):
+    return await stream_zip(entries=entries(),
+                            original_file_name=f"{gateway_request_id}-{service_type}-registration-tickets.zip")
 
-    response = StreamingResponse(iter([file_bytes]),
-                                 media_type=content_type
-                                 )
 
+def content_disposition(original_file_name: str) -> str:
     try:
         original_file_name.encode('latin-1')
     except UnicodeEncodeError:
         original_file_name = original_file_name.encode('latin-1', 'replace')
-    response.headers["Content-Disposition"] = f"attachment; filename={original_file_name}"
+    return f"attachment; filename={original_file_name}"
+
+
+async def stream_file(*, file_bytes, original_file_name: str, content_type: str = "application/x-binary"):
+    # file_bytes is either the whole file or an (async) iterator over its pieces
+    content = iter([file_bytes]) if isinstance(file_bytes, (bytes, str)) else file_bytes
+    response = StreamingResponse(content,
+                                 media_type=content_type
+                                 )
+    response.headers["Content-Disposition"] = content_disposition(original_file_name)
     return response
 
 
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+def parse_range(range_header: str, file_size: int) -> tuple[int, int] | None:
+    # only single byte range is supported, for anything else the whole file is sent
+    unit, _, byte_range = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in byte_range:
+        return None
+    start, sep, end = byte_range.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if not start:
+            # suffix range - last N bytes
+            start, end = max(file_size - int(end), 0), file_size - 1
+        else:
+            start, end = int(start), min(int(end), file_size - 1) if end else file_size - 1
+    except ValueError:
+        return None
+    if start < 0 or start > end:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                            headers={"Content-Range": f"bytes */{file_size}"})
+    return start, end
+
+
+async def stream_cached_file(*, request: Request, file_path: str, etag: str, original_file_name: str,
+                             content_type: str = "application/x-binary"):
+    """
+    Sends file from the local storage without reading it into memory.
+    Content of the file never changes for the same etag, so If-None-Match is answered without looking at the file.
+    Whole file goes via FileResponse, which uses sendfile (pathsend) if server supports it
+    """
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Content-Disposition": content_disposition(original_file_name)}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    stat_result = os.stat(file_path)
+    file_size = stat_result.st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        byte_range = parse_range(range_header, file_size)
+
+    if not byte_range or byte_range == (0, file_size - 1):
+        return FileResponse(file_path, media_type=content_type, headers=headers, stat_result=stat_result)
+
+    start, end = byte_range
+
+    async def content():
+        async with aiofiles.open(file_path, 'rb') as f:
+            await f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await f.read(min(FILE_STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(content(), status_code=status.HTTP_206_PARTIAL_CONTENT,
+                             media_type=content_type, headers=headers)
+
+
+async def stream_zip(*, entries, original_file_name: str):
+    # the first entry is fetched before the response is started,
+    # so if nothing can be found, the client still gets proper error status instead of broken zip
+    try:
+        first_entry = await anext(entries)
+    except StopAsyncIteration:
+        first_entry = None
+    except BaseException:
+        # release entries' DB session and fetches that are still running
+        await entries.aclose()
+        raise
+
+    async def all_entries():
+        if first_entry:
+            yield first_entry
+        async for entry in entries:
+            yield entry
+
+    async def content():
+        try:
+            async for chunk in zip_stream(all_entries()):
+                yield chunk
+        except Exception as e:
+            # response is already started, the only option is to abort it
+            logger.error(f"Error while streaming {original_file_name}: {e}")
+            raise
+
+    return await stream_file(file_bytes=content(), original_file_name=original_file_name,
+                             content_type="application/zip")
+
+
 async def get_all_sense_or_nft_dd_data_from_request(*, tasks_from_db, gateway_request_id, search_data_lambda,
                                                     file_suffix, parse=False):
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for task_from_db in tasks_from_db:
-            raw_file_bytes = await search_data_lambda(task_from_db)
-            if parse:
-                file_bytes = await parse_dd_data(raw_file_bytes, False)
-                if not file_bytes:
-                    file_bytes = raw_file_bytes
-            else:
-                file_bytes = raw_file_bytes
-            # convert to bytes
-            # file_bytes = json.dumps(ticket, indent=2).encode('utf-8')
-            zip_file.writestr(f"{task_from_db.original_file_name}-{file_suffix}.json", file_bytes)
-    return await stream_file(file_bytes=zip_buffer.getvalue(),
-                             original_file_name=f"{gateway_request_id}-{file_suffix}.zip",
-                             content_type="application/zip")
+    async def fetch(task_from_db):
+        raw_file_bytes = await search_data_lambda(task_from_db)
+        if parse:
+            file_bytes = await parse_dd_data(raw_file_bytes, False)
+            if file_bytes:
+                return file_bytes
+        return raw_file_bytes
+
+    async def entries():
+        async for task_from_db, file_bytes in fetch_in_order(tasks_from_db, fetch):
+            yield f"{task_from_db.original_file_name}-{file_suffix}.json", file_bytes
+
+    return await stream_zip(entries=entries(), original_file_name=f"{gateway_request_id}-{file_suffix}.zip")
 
 
 async def get_all_sense_or_nft_dd_data_for_pastelid(*, pastel_id: str, ticket_type: str, action_type: str,
@@ -522,28 +897,25 @@ async def get_all_sense_or_nft_dd_data_for_pastelid(*, pastel_id: str, ticket_ty
     if len(registration_ticket_txids) == 0:
         raise HTTPException(status_code=404, detail=f"No {ticket_type}:{action_type} tickets"
                                                     f" found for pastelID={pastel_id}")
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-        for txid in registration_ticket_txids:
-            try:
-                raw_file_bytes = await search_data_lambda(txid)
-            except Exception as e:
-                logger.error(f"Error getting sense data for txid={txid}: {e}")
-                continue
-            if not raw_file_bytes:
-                continue
-            if parse:
-                file_bytes = await parse_dd_data(raw_file_bytes, False)
-                if not file_bytes:
-                    file_bytes = raw_file_bytes
-            else:
-                file_bytes = raw_file_bytes
-            # convert to bytes
-            # file_bytes = json.dumps(ticket, indent=2).encode('utf-8')
-            zip_file.writestr(f"{txid}-sense-data.json", file_bytes)
-    return await stream_file(file_bytes=zip_buffer.getvalue(),
-                             original_file_name=f"{pastel_id}-sense-data.zip",
-                             content_type="application/zip")
+
+    async def fetch(txid):
+        try:
+            raw_file_bytes = await search_data_lambda(txid)
+        except Exception as e:
+            logger.error(f"Error getting sense data for txid={txid}: {e}")
+            return None
+        if raw_file_bytes and parse:
+            file_bytes = await parse_dd_data(raw_file_bytes, False)
+            if file_bytes:
+                return file_bytes
+        return raw_file_bytes
+
+    async def entries():
+        async for txid, file_bytes in fetch_in_order(registration_ticket_txids, fetch):
+            if file_bytes:
+                yield f"{txid}-sense-data.json", file_bytes
+
+    return await stream_zip(entries=entries(), original_file_name=f"{pastel_id}-sense-data.zip")
 
 
 async def get_registration_action_ticket(ticket_txid, service: wn.WalletNodeService):
@@ -556,17 +928,22 @@ async def get_registration_action_ticket(ticket_txid, service: wn.WalletNodeServ
     else:
         raise HTTPException(status_code=501, detail=f"Invalid service type - {service}")
 
+    cache_kind = f"{expected_ticket_type}:{expected_action_type}"
+    parsed_ticket = await ticket_cache.aget_cached_ticket(ticket_txid, cache_kind)
+    if parsed_ticket is not None:
+        return parsed_ticket
+
     try:
-        reg_ticket = psl.call("tickets", ['get', ticket_txid])   # can throw exception here
+        reg_ticket = await psl.acall("tickets", ['get', ticket_txid])   # can throw exception here
     except psl.PasteldException as e:
         raise HTTPException(status_code=404, detail=f"{expected_action_type} registration ticket not found - {e}")
-    except HTTPError as e:
-        raise HTTPException(status_code=400, detail=f"Failed to get {expected_action_type} "
-                                                    f"activation ticket - {e.response.text}")
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to get {expected_action_type} registration ticket - {e}")
 
-    return await psl.parse_registration_action_ticket(reg_ticket, expected_ticket_type, [expected_action_type])
+    parsed_ticket = await psl.parse_registration_action_ticket(reg_ticket, expected_ticket_type,
+                                                               [expected_action_type])
+    await ticket_cache.acache_ticket(ticket_txid, cache_kind, parsed_ticket)
+    return parsed_ticket
 
 
 async def get_activation_ticket(ticket_txid, service: wn.WalletNodeService):
@@ -583,12 +960,9 @@ async def get_activation_ticket(ticket_txid, service: wn.WalletNodeService):
         raise HTTPException(status_code=501, detail=f"Invalid service type - {service}")
 
     try:
-        act_ticket = psl.call("tickets", ['get', ticket_txid])   # can throw exception here
+        act_ticket = await ticket_cache.aget_ticket(ticket_txid)   # can throw exception here
     except psl.PasteldException as e:
         raise HTTPException(status_code=501, detail=f"{expected_action_type} activation ticket not found - {e}")
-    except HTTPError as e:
-        raise HTTPException(status_code=400, detail=f"Failed to get {expected_action_type} "
-                                                    f"activation ticket - {e.response.text}")
     except Exception as e:
         raise HTTPException(status_code=501, detail=f"Failed to get {expected_action_type} activation ticket - {e}")
 
@@ -606,16 +980,20 @@ async def get_activation_ticket(ticket_txid, service: wn.WalletNodeService):
 
 
 async def get_registration_nft_ticket(ticket_txid):
+    parsed_ticket = await ticket_cache.aget_cached_ticket(ticket_txid, "nft-reg")
+    if parsed_ticket is not None:
+        return parsed_ticket
+
     try:
-        reg_ticket = psl.call("tickets", ['get', ticket_txid])   # can throw exception here
+        reg_ticket = await psl.acall("tickets", ['get', ticket_txid])   # can throw exception here
     except psl.PasteldException as e:
         raise HTTPException(status_code=404, detail=f"NFT registration ticket not found - {e}")
-    except HTTPError as e:
-        raise HTTPException(status_code=400, detail=f"Failed to get NFT registration ticket - {e.response.text}")
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Failed to get NFT registration ticket - {e}")
 
-    return await psl.parse_registration_nft_ticket(reg_ticket)
+    parsed_ticket = await psl.parse_registration_nft_ticket(reg_ticket)
+    await ticket_cache.acache_ticket(ticket_txid, "nft-reg", parsed_ticket)
+    return parsed_ticket
 
 
 async def parse_dd_data(raw_bytes: bytes, throw=True) -> str | None:
@@ -671,7 +1049,7 @@ def decode_decompress_item(json_object: dict, key: str):
 
 async def get_reg_txid_by_act_txid(act_txid: str) -> str:
     try:
-        act_ticket = psl.call("tickets", ['get', act_txid])   # can throw exception here
+        act_ticket = await ticket_cache.aget_ticket(act_txid)   # can throw exception here
     except psl.PasteldException as e:
         raise HTTPException(status_code=501, detail=f"Action Activation ticket not found - {e}")
     except Exception as e:
@@ -687,7 +1065,7 @@ async def get_reg_txid_by_act_txid(act_txid: str) -> str:
 async def get_reg_txids_by_pastel_id(pastel_id: str, ticket_type: str, action_type: str) -> List[str]:
     txids = []
     try:
-        reg_tickets = psl.call("tickets", ['find', ticket_type, pastel_id])   # can throw exception here
+        reg_tickets = await psl.acall("tickets", ['find', ticket_type, pastel_id])   # can throw exception here
     except psl.PasteldException as e:
         raise HTTPException(status_code=501, detail=f"Action registration ticket not found - {e}")
     except Exception as e:
@@ -704,7 +1082,8 @@ async def get_reg_txids_by_pastel_id(pastel_id: str, ticket_type: str, action_ty
     return txids
 
 
-async def get_public_file(db, ticket_type: str, registration_ticket_txid: str, wn_service: wn.WalletNodeService):
+async def get_public_file(db, ticket_type: str, registration_ticket_txid: str, wn_service: wn.WalletNodeService,
+                          request: Request):
     shadow_ticket = crud.reg_ticket.get_by_reg_ticket_txid_and_type(
         db=db,
         txid=registration_ticket_txid,
@@ -715,8 +1094,20 @@ async def get_public_file(db, ticket_type: str, registration_ticket_txid: str, w
     if not shadow_ticket.is_public:
         raise HTTPException(status_code=403, detail="Non authorized access to file")
 
-    file_bytes = await search_pastel_file(reg_ticket_txid=registration_ticket_txid, service=wn_service)
-    return await stream_file(file_bytes=file_bytes, original_file_name=f"{shadow_ticket.file_name}")
+    etag = f'"{registration_ticket_txid}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    file_path = await get_cached_result_path(reg_ticket_txid=registration_ticket_txid)
+    if not file_path:
+        # will put the file into the local cache
+        file_bytes = await search_pastel_file(reg_ticket_txid=registration_ticket_txid, service=wn_service)
+        file_path = await get_cached_result_path(reg_ticket_txid=registration_ticket_txid)
+        if not file_path:
+            return await stream_file(file_bytes=file_bytes, original_file_name=f"{shadow_ticket.file_name}")
+
+    return await stream_cached_file(request=request, file_path=file_path, etag=etag,
+                                    original_file_name=f"{shadow_ticket.file_name}")
 
 
 async def compute_hash(upload_file: UploadFile, chunk_size: int = 8192):
@@ -762,8 +1153,7 @@ async def check_file_is_not_empty(file: UploadFile) -> schemas.ResultRegistratio
     return None
 
 
-async def check_image(file: UploadFile, db,
-                      wn_service: wn.WalletNodeService) -> schemas.ResultRegistrationResult | None:
+def check_image_type(file: UploadFile) -> schemas.ResultRegistrationResult | None:
     if (
             ("image/jpeg" not in file.content_type) and
             ("image/png" not in file.content_type) and
@@ -775,9 +1165,21 @@ async def check_image(file: UploadFile, db,
             file_type=file.content_type,
             status_messages=["File type not supported"],
         )
+    return None
+
+
+async def check_image(file: UploadFile, db, wn_service: wn.WalletNodeService,
+                      data_hash: str = None) -> schemas.ResultRegistrationResult | None:
+    """
+    data_hash is SHA3-256 of the file, if it is already known (LocalFile.content_hash) - the file is not read then
+    """
+    reg_result = check_image_type(file)
+    if reg_result is not None:
+        return reg_result
 
     if wn_service == wn.WalletNodeService.NFT or wn_service == wn.WalletNodeService.SENSE:
-        data_hash = await compute_hash(file)
+        if not data_hash:
+            data_hash = await compute_hash(file)
         tickets = crud.reg_ticket.get_by_hash(db=db, data_hash_as_hex=data_hash, ticket_type="nft")
         if not tickets:
             tickets = crud.reg_ticket.get_by_hash(db=db, data_hash_as_hex=data_hash, ticket_type="sense")
@@ -89,7 +89,7 @@ def register(self, result_id, user_id, api_key: ApiKey,
     logger.info(f'Collection-{item_type} New file - adding record to DB... [Result ID: {result_id}]')
 
     # can throw exception here - this called from celery task, it will retry it on specific exceptions
-    height = psl.call("getblockcount", [])
+    height = psl.get_block_height()
     logger.info(f'Collection-{item_type}: Ticket will be created at height {height} [Result ID: {result_id}]')
 
     new_task = schemas.CollectionCreate(
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from celery import shared_task
+from celery.utils.log import get_task_logger
+
+from app import crud
+from app.core.config import settings
+from app.db.session import db_context
+from app.utils.ipfs_tools import store_file_to_ipfs, run_with_ipfs_client, IPFSException
+from app.utils.walletnode import WalletNodeService
+
+logger = get_task_logger(__name__)
+
+_crud_by_service = {
+    WalletNodeService.CASCADE: crud.cascade,
+    WalletNodeService.SENSE: crud.sense,
+    WalletNodeService.NFT: crud.nft,
+}
+
+
+# Original files are published to IPFS here, out of the request path. The result's record is created
+# by register_file running at the same time, so missing record is retried too.
+# process_task still adds the file itself if the link is missing when it runs
+@shared_task(bind=True,
+             autoretry_for=(IPFSException,),
+             retry_backoff=settings.IPFS_ADD_RETRY_BACKOFF,
+             retry_backoff_max=settings.IPFS_ADD_RETRY_BACKOFF_MAX,
+             max_retries=settings.IPFS_ADD_MAX_RETRIES,
+             soft_time_limit=settings.IPFS_ADD_SOFT_TIME_LIMIT,
+             time_limit=settings.IPFS_ADD_TIME_LIMIT,
+             name='ipfs:add_original_file')
+def add_original_file(self, result_id: str, service: WalletNodeService) -> str | None:
+    crud_klass = _crud_by_service[service]
+    with db_context() as session:
+        task_from_db = crud_klass.get_by_result_id(session, result_id=result_id)
+        if not task_from_db:
+            raise IPFSException(f'{service}: No task found for result_id {result_id} yet')
+        if task_from_db.original_file_ipfs_link:
+            return task_from_db.original_file_ipfs_link
+        original_file_local_path = task_from_db.original_file_local_path
+
+    # IPFS add can take long, don't hold DB session while it runs
+    logger.info(f'{service}: Storing file into IPFS... [Result ID: {result_id}]')
+    original_file_ipfs_link = run_with_ipfs_client(store_file_to_ipfs(original_file_local_path))
+    if not original_file_ipfs_link:
+        raise IPFSException(f'{service}: Failed to store file into IPFS [Result ID: {result_id}]')
+
+    with db_context() as session:
+        task_from_db = crud_klass.get_by_result_id(session, result_id=result_id)
+        if not task_from_db:
+            raise IPFSException(f'{service}: No task found for result_id {result_id}')
+        if task_from_db.original_file_ipfs_link:
+            return task_from_db.original_file_ipfs_link
+        logger.info(f'{service}: Updating DB with IPFS link... '
+                    f'[Result ID: {result_id}; IPFS Link: https://ipfs.io/ipfs/{original_file_ipfs_link}]')
+        upd = {"original_file_ipfs_link": original_file_ipfs_link, "updated_at": datetime.utcnow()}
+        crud_klass.update(session, db_obj=task_from_db, obj_in=upd)
+    return original_file_ipfs_link
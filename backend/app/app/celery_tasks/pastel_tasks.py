@@ -1,5 +1,4 @@
 import abc
-import asyncio
 from datetime import datetime
 
 from celery.result import AsyncResult
@@ -13,7 +12,7 @@ from app.utils import walletnode as wn, pasteld as psl
 from app.core.config import settings
 from app.core.status import DbStatus
 from app.utils.accounts import get_total_balance_by_userid
-from app.utils.ipfs_tools import search_file_locally_or_in_ipfs, store_file_to_ipfs
+from app.utils.ipfs_tools import search_file_locally_or_in_ipfs, store_file_to_ipfs, run_with_ipfs_client
 from app.utils.secret_manager import get_pastelid_pwd
 
 logger = get_task_logger(__name__)
@@ -103,7 +102,7 @@ class PastelAPITask(celery.Task):
         returned_fee = 0
         if not task_in_db:
             # can throw exception here - this is celery task, it will retry it on specific exceptions
-            height = psl.call("getblockcount", [])
+            height = psl.get_block_height()
             logger.info(f'{service}: New file - adding record to DB... [Result ID: {result_id}]')
             logger.info(f'{service}: Ticket will be created at height {height} [Result ID: {result_id}]')
             with db_context() as session:
@@ -196,7 +195,7 @@ class PastelAPITask(celery.Task):
 
         preburn_fee = task_from_db.wn_fee/5
         # can throw exception here - this is celery task, it will retry it on specific exceptions
-        height = psl.call("getblockcount", [])
+        height = psl.get_block_height()
 
         if task_from_db.burn_txid:
             logger.warn(f'{service}: Pre-burn tx [{task_from_db.burn_txid}] already associated with result...'
@@ -210,25 +209,12 @@ class PastelAPITask(celery.Task):
                             f'bound to the task [Result ID: {result_id}]')
             else:
                 logger.info(f'{service}: Searching burn tx in preburn table... [Result ID: {result_id}]')
-                have_pending = 0
-                while True:
-                    burn_tx = crud.preburn_tx.get_non_used_by_fee(session, fee=preburn_fee)
-                    if not burn_tx:
-                        break
-                    if burn_tx.height + 5 > height:
-                        logger.info(f'{service}: Found burn tx [{burn_tx.txid}] in preburn table, but it is '
-                                    f'not confirmed yet. Skipping... [Result ID: {result_id}]')
-                        have_pending += 1
-                        continue
-                    if check_preburn_tx(session, burn_tx.txid):
-                        logger.info(f'{service}: Found burn tx in [{burn_tx.txid}] preburn table... '
-                                    f'[Result ID: {result_id}]')
-                        break
-
+                burn_tx = crud.preburn_tx.claim_validated(session, fee=preburn_fee, result_id=result_id)
                 if not burn_tx:
+                    have_pending = crud.preburn_tx.get_number_not_validated_by_fee(session, fee=preburn_fee)
                     if have_pending > 0:
                         logger.info(f'{service}: Found {have_pending} pre-burn txs in preburn table, but they are '
-                                    f'not confirmed yet. Retrying... [Result ID: {result_id}]')
+                                    f'not validated yet. Retrying... [Result ID: {result_id}]')
                         upd = {
                             "process_status_message": f'Found {have_pending} pre-burn txs in preburn table, '
                                                       f'but they are not confirmed yet. Retrying',
@@ -255,10 +241,8 @@ class PastelAPITask(celery.Task):
                                                                txid=burn_txid,
                                                                result_id=result_id)
                 else:
-                    logger.info(f'{service}: Found pre-burn tx [{burn_tx.txid}], '
-                                f'bounding it to the task [Result ID: {result_id}]')
-                    burn_tx = crud.preburn_tx.bind_pending_to_result(session, burn_tx,
-                                                                     result_id=result_id)
+                    logger.info(f'{service}: Found pre-burn tx [{burn_tx.txid}] in preburn table, '
+                                f'bound it to the task [Result ID: {result_id}]')
             if burn_tx.height + settings.PRE_BURN_TX_CONFIRMATIONS > height:
                 logger.info(f'{service}: Pre-burn tx [{burn_tx.txid}] not confirmed yet, '
                             f'retrying... [Result ID: {result_id}]')
@@ -386,7 +370,7 @@ class PastelAPITask(celery.Task):
 
                 logger.info(f'{service}: Storing file into IPFS... [Result ID: {result_id}]')
 
-                original_file_ipfs_link = asyncio.run(store_file_to_ipfs(task_from_db.original_file_local_path))
+                original_file_ipfs_link = run_with_ipfs_client(store_file_to_ipfs(task_from_db.original_file_local_path))
 
                 if original_file_ipfs_link:
                     logger.info(f'{service}: Updating DB with IPFS link... '
@@ -421,7 +405,7 @@ class PastelAPITask(celery.Task):
         logger.info(f'{service}: Searching for file locally at {task_from_db.original_file_local_path}; or'
                     f' in IPFS at {task_from_db.original_file_ipfs_link}... [Result ID: {result_id}]')
 
-        data = asyncio.run(search_file_locally_or_in_ipfs(task_from_db.original_file_local_path,
+        data = run_with_ipfs_client(search_file_locally_or_in_ipfs(task_from_db.original_file_local_path,
                                                           task_from_db.original_file_ipfs_link, True))
         if not data:
             logger.error(f'{service}: File not found locally or in IPFS... [Result ID: {result_id}]')
@@ -517,7 +501,7 @@ def check_preburn_tx(session, txid: str):
             if not tx or (not isinstance(tx, dict) and not isinstance(tx, list)):
                 tx = psl.call("getrawtransaction", [txid], True)   # WON'T throw exception here
                 if not tx \
-                        or ("status_code" in tx and tx.status_code != 200) \
+                        or (hasattr(tx, "status_code") and tx.status_code != 200) \
                         or (isinstance(tx, dict) and (tx.get('error') or tx.get('result') is None)):
                     logger.info(f"Transaction {txid} is in the table but is not in the blockchain, marking as BAD")
                     crud.preburn_tx.mark_bad(session, txid)
@@ -531,6 +515,19 @@ def check_preburn_tx(session, txid: str):
     return False    # tx is used by some reg ticket
 
 
+def validate_preburn_txs(session, height: int) -> int:
+    """
+    Checks confirmed NEW pre-burn txs that are not validated yet, so preburn_fee_task can claim them without RPCs.
+    Used and missing ones are marked USED/BAD by check_preburn_tx. Returns number of validated txs
+    """
+    validated = 0
+    for new in crud.preburn_tx.get_all_not_validated(session, max_height=height-settings.PRE_BURN_TX_CONFIRMATIONS):
+        if check_preburn_tx(session, new.txid):
+            crud.preburn_tx.mark_validated(session, new.txid)
+            validated += 1
+    return validated
+
+
 def set_status_message(update_task_in_db_func, task_in_db, message: str):
     upd = {
         "process_status_message": message,
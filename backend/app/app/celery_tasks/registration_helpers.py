@@ -13,7 +13,7 @@ from app.core.status import DbStatus, add_status_to_history_log
 from app.db.session import db_context
 from app.utils import walletnode as wn, pasteld as psl
 from app.utils.filestorage import store_file_into_local_cache
-from app.utils.ipfs_tools import store_file_to_ipfs
+from app.utils.ipfs_tools import store_file_to_ipfs, run_with_ipfs_client
 from app.celery_tasks.pastel_tasks import check_preburn_tx
 from app.utils.secret_manager import get_pastelid_pwd
 
@@ -116,7 +116,7 @@ def _registration_finisher(
                 logger.error(f"No result from WalletNode: wn_task_id - {task_from_db.wn_task_id}, "
                              f"ResultId - {task_from_db.result_id}")
                 try:
-                    height = psl.call("getblockcount", [])   # can throw exception here
+                    height = psl.get_block_height()   # can throw exception here
                 except Exception as e:
                     logger.error(f"Call to PastelD failed: {e}")
                     height = 0
@@ -242,9 +242,9 @@ def finalize_registration(task_from_db, act_txid, update_task_in_db_func, wn_ser
         nft_dd_file_ipfs_link = task_from_db.nft_dd_file_ipfs_link
     try:
         logger.info(f"{wn_service}: Downloading registered file from Pastel: {task_from_db.reg_ticket_txid}")
-        file_bytes = asyncio.run(wn.get_file_from_pastel(reg_ticket_txid=task_from_db.reg_ticket_txid,
-                                                         pastel_id=task_from_db.pastel_id,
-                                                         wn_service=wn_service))
+        file_bytes = wn.run_with_wn_client(wn.get_file_from_pastel(reg_ticket_txid=task_from_db.reg_ticket_txid,
+                                                                   pastel_id=task_from_db.pastel_id,
+                                                                   wn_service=wn_service))
         if file_bytes:
             logger.info(f"{wn_service}: Storing downloaded file into local cache: {task_from_db.reg_ticket_txid}")
             cached_result_file = asyncio.run(store_file_into_local_cache(
@@ -253,12 +253,13 @@ def finalize_registration(task_from_db, act_txid, update_task_in_db_func, wn_ser
             if not task_from_db.stored_file_ipfs_link:
                 logger.info(f"{wn_service}: Storing downloaded file into IPFS cache: {task_from_db.reg_ticket_txid}")
                 # store_file_into_local_cache throws exception, so if we are here, file is in local cache
-                stored_file_ipfs_link = asyncio.run(store_file_to_ipfs(cached_result_file))
+                stored_file_ipfs_link = run_with_ipfs_client(store_file_to_ipfs(cached_result_file))
 
         if wn_service == wn.WalletNodeService.NFT:
             logger.info(f"{wn_service}: Requesting NFT sense data from WN: {task_from_db.reg_ticket_txid}")
-            dd_data = asyncio.run(wn.get_nft_dd_result_from_pastel(reg_ticket_txid=task_from_db.reg_ticket_txid,
-                                                                   pastel_id=task_from_db.pastel_id))
+            dd_data = wn.run_with_wn_client(
+                wn.get_nft_dd_result_from_pastel(reg_ticket_txid=task_from_db.reg_ticket_txid,
+                                                 pastel_id=task_from_db.pastel_id))
             if dd_data:
                 if isinstance(dd_data, dict):
                     dd_bytes = json.dumps(dd_data).encode('utf-8')
@@ -272,7 +273,7 @@ def finalize_registration(task_from_db, act_txid, update_task_in_db_func, wn_ser
                 if not task_from_db.nft_dd_file_ipfs_link:
                     # store_file_into_local_cache throws exception, so if we are here, file is in local cache
                     logger.info(f"{wn_service}: Storing NFT sense data to IPFS: {task_from_db.reg_ticket_txid}")
-                    nft_dd_file_ipfs_link = asyncio.run(store_file_to_ipfs(cached_dd_file))
+                    nft_dd_file_ipfs_link = run_with_ipfs_client(store_file_to_ipfs(cached_dd_file))
 
     except Exception as e:
         logger.error(f"{wn_service}: Failed to get file from Pastel: {e}")
@@ -312,9 +313,10 @@ def finalize_registration(task_from_db, act_txid, update_task_in_db_func, wn_ser
                     logger.error(f"Pastel ID {task_from_db.pastel_id} not found in secret manager")
                     return None
 
-                offer_ticket = asyncio.run(psl.create_offer_ticket(task_from_db.act_ticket_txid, 1,
-                                                                   task_from_db.pastel_id, pastel_id_pwd,
-                                                                   pastel_id_for_transfer))
+                offer_ticket = psl.run_with_pasteld_client(psl.create_offer_ticket(task_from_db.act_ticket_txid, 1,
+                                                                                   task_from_db.pastel_id,
+                                                                                   pastel_id_pwd,
+                                                                                   pastel_id_for_transfer))
                 if offer_ticket and 'txid' in offer_ticket and offer_ticket['txid']:
                     logger.info(f"{wn_service}: Updating task in DB as offered to transfer: "
                                 f"{task_from_db.reg_ticket_txid}")
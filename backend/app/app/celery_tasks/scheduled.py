@@ -1,7 +1,7 @@
-import asyncio
 from datetime import datetime
 import re
 
+import billiard
 from celery import shared_task
 from celery.utils.log import get_task_logger
 
@@ -10,9 +10,10 @@ from app.core.config import settings
 from app.core.status import DbStatus
 from app.db.session import db_context
 from app.celery_tasks.task_lock import task_lock
-from app.celery_tasks.pastel_tasks import check_preburn_tx
+from app.celery_tasks.pastel_tasks import validate_preburn_txs
 import app.utils.pasteld as psl
 import app.utils.walletnode as wn
+from app.utils import fee_schedule, ticket_cache
 from app.celery_tasks.registration_helpers import finalize_registration
 from app.models.preburn_tx import PBTXStatus
 from app.utils.secret_manager import get_pastelid_pwd
@@ -55,61 +56,110 @@ def fee_pre_burner():
 
     if settings.FEE_PRE_BURNER_CHECK_NEW:
         logger.info(f"check new")
-        height = psl.call("getblockcount", [], True)   # won't throw exception
+        height = psl.get_block_height(nothrow=True)   # won't throw exception
         if not height or not isinstance(height, int):
             logger.error(f"Error while getting height from cNode")
             return
 
         with db_context() as session:
-            all_new = crud.preburn_tx.get_all_new(session)
-            for new in all_new:
-                if new.height + 5 < height:
-                    check_preburn_tx(session, new.txid)
+            validate_preburn_txs(session, height)
 
     if settings.FEE_PRE_BURNER_ENABLED:
         logger.info(f"pre burn fees")
-        fees = []
-        with db_context() as session:
-            logger.info(f"first: calculate missing fees")
-            for size in range(1, settings.MAX_SIZE_FOR_PREBURN+1):
-                fee = psl.call("storagefee", ["getactionfees", size], True)   # won't throw exception
-                if not fee or not isinstance(fee, dict):
-                    logger.error(f"Error while getting fee for size {size}")
-                    continue
-                if 'cascadefee' not in fee or 'sensefee' not in fee:
-                    logger.error(f"Error while getting fee for size {size}")
-                    continue
-                c_fee = float(fee['cascadefee'] / 5)
-                s_fee = float(fee['sensefee'] / 5)
-                c_num = crud.preburn_tx.get_number_non_used_by_fee(session, fee=c_fee)
-                s_num = crud.preburn_tx.get_number_non_used_by_fee(session, fee=s_fee)
-                logger.info(f"For size {size} c_fee = {c_fee} s_fee = {s_fee}")
-                for _ in reversed(range(size, settings.MAX_SIZE_FOR_PREBURN+1)):
-                    if c_num < settings.MAX_SIZE_FOR_PREBURN-size+1:
-                        fees.append(c_fee)
-                    if s_num < settings.MAX_SIZE_FOR_PREBURN-size+1:
-                        fees.append(s_fee)
-
-        height = psl.call("getblockcount", [], True)   # won't throw exception
+        height = psl.get_block_height(nothrow=True)   # won't throw exception
         if not height or not isinstance(height, int):
             logger.error(f"Error while getting height from cNode")
             return
 
+        logger.info(f"first: calculate missing fees")
+        # every size needs MAX_SIZE_FOR_PREBURN-size+1 preburnt transactions of its fee;
+        # sizes with the same fee share them
+        needed = {}
+        for size, (cascade_fee, sense_fee) in sorted(fee_schedule.get_fee_schedule(height).items()):
+            c_fee = float(cascade_fee / 5)
+            s_fee = float(sense_fee / 5)
+            logger.info(f"For size {size} c_fee = {c_fee} s_fee = {s_fee}")
+            for fee in (c_fee, s_fee):
+                needed[fee] = needed.get(fee, 0) + settings.MAX_SIZE_FOR_PREBURN-size+1
+        with db_context() as session:
+            counts = crud.preburn_tx.get_counts_by_fee_and_status(session)
+        fees = []
+        for fee, num in needed.items():
+            fees.extend([fee] * max(num - counts.get((fee, PBTXStatus.NEW), 0), 0))
+
         if len(fees) > 0:
             logger.info(f"second: burn missing fees")
+            try:
+                if not psl.check_balance(sum(fees)):  # can throw exception here
+                    # burn as many as the balance allows, the rest will be burnt on the next runs
+                    fees = _affordable_fees(fees, psl.call('getbalance', []))  # can throw exception here
+            except Exception as e:
+                logger.error(f"Error while checking balance {e}")
+                return
+            if not fees:
+                return
+            # one burn output per transaction - burn txid is the key of the ticket that uses it,
+            # so the sends are only batched into one JSON-RPC call
+            burn_txids = psl.call_batch([("sendtoaddress", [settings.BURN_ADDRESS, burn_amount])
+                                         for burn_amount in fees], True)  # won't throw exception
+            burns = []
+            for burn_amount, burn_txid in zip(fees, burn_txids):
+                if not burn_txid or not isinstance(burn_txid, str):
+                    logger.error(f"Error while burning fee {burn_amount}: {burn_txid}")
+                    continue
+                burns.append((burn_amount, burn_txid))
             with db_context() as session:
-                for burn_amount in fees:
-                    try:
-                        if not psl.check_balance(burn_amount):  # can throw exception here
-                            return
-                        burn_txid = psl.call("sendtoaddress", [settings.BURN_ADDRESS, burn_amount])  # can throw exception
-                        if not burn_txid or not isinstance(burn_txid, str):
-                            logger.error(f"Error while burning fee")
-                            continue
-                    except Exception as e:
-                        logger.error(f"Error while burning fee {e}")
-                        continue
-                    crud.preburn_tx.create_new(session, fee=burn_amount, height=height, txid=burn_txid)
+                crud.preburn_tx.create_new_many(session, height=height, burns=burns)
+            logger.info(f"{len(burns)} of {len(fees)} fees burnt")
+
+
+def _affordable_fees(fees: list[float], balance) -> list[float]:
+    affordable = []
+    for fee in fees:
+        if not isinstance(balance, (int, float)) or balance < fee:
+            break
+        balance -= fee
+        affordable.append(fee)
+    return affordable
+
+
+@shared_task(name="scheduled_tools:preburn_pool_validator", task_id="preburn_pool_validator")
+@task_lock(main_key="preburn_pool_validator", timeout=10*60)
+def preburn_pool_validator():
+    height = psl.get_block_height(nothrow=True)   # won't throw exception
+    if not height or not isinstance(height, int):
+        logger.error(f"Error while getting height from cNode")
+        return
+    with db_context() as session:
+        validated = validate_preburn_txs(session, height)
+    if validated:
+        logger.info(f"preburn_pool_validator: {validated} pre-burn txs validated")
+
+
+@shared_task(name="scheduled_tools:block_height_poller")
+def block_height_poller():
+    height = psl.refresh_block_height(nothrow=True)   # won't throw exception
+    if not height:
+        logger.error(f"Error while getting height from cNode")
+
+
+@shared_task(name="scheduled_tools:pending_balance_reconciler", task_id="pending_balance_reconciler")
+@task_lock(main_key="pending_balance_reconciler", timeout=10*60)
+def pending_balance_reconciler():
+    logger.info(f"pending_balance_reconciler task started")
+    with db_context() as session:
+        crud.pending_balance.lock(session)
+        actual = {
+            crud.cascade.pending_balance_column: crud.cascade.get_pending_sums_by_owner(session),
+            crud.sense.pending_balance_column: crud.sense.get_pending_sums_by_owner(session),
+            crud.nft.pending_balance_column: crud.nft.get_pending_sums_by_owner(session),
+            crud.collection.pending_balance_column: crud.collection.get_pending_sums_by_owner(session),
+        }
+        fixed = crud.pending_balance.reconcile(session, actual=actual)
+    for owner_id, column, ledger_value, actual_value in fixed:
+        logger.warning(f"Pending balance of user {owner_id} was out of sync: "
+                       f"{column} is {actual_value}, ledger had {ledger_value}")
+    logger.info(f"pending_balance_reconciler task ended, {len(fixed)} values fixed")
 
 
 @shared_task(name="scheduled_tools:reg_tickets_finder", task_id="reg_tickets_finder")
@@ -120,16 +170,18 @@ def registration_tickets_finder():
 
     logger.info(f"cascade_tickets_finder started")
     try:
+        # every ticket family has its own checkpoint - the highest block already stored for it
         with db_context() as session:
-            last_processed_block = crud.reg_ticket.get_last_blocknum(session)
+            last_nft_block = crud.reg_ticket.get_last_blocknum(session, ticket_types=['nft'])
+            last_action_block = crud.reg_ticket.get_last_blocknum(session, ticket_types=['cascade', 'sense'])
 
-        nft_tickets = psl.call("tickets", ['list', 'nft', 'active', last_processed_block+1],
+        nft_tickets = psl.call("tickets", ['list', 'nft', 'active', last_nft_block+1],
                                nothrow=True)   # won't throw exception
-        process_nft_tickets(nft_tickets, last_processed_block)
+        process_reg_tickets(nft_tickets, last_nft_block, nft_ticket_to_row)
 
-        action_ticket = psl.call("tickets", ['list', 'action', 'active', last_processed_block+1],
-                                 nothrow=True)   # won't throw exception
-        process_action_tickets(action_ticket, last_processed_block)
+        action_tickets = psl.call("tickets", ['list', 'action', 'active', last_action_block+1],
+                                  nothrow=True)   # won't throw exception
+        process_reg_tickets(action_tickets, last_action_block, action_ticket_to_row)
 
     except Exception as e:
         logger.error(f"Error while processing cascade tickets {e}")
@@ -163,75 +215,103 @@ def get_value_from_action_ticket(ticket, key, def_value) -> (str, bool):
         return def_value, False
 
 
-def process_nft_tickets(tickets, last_processed_block):
-    if not tickets:
-        logger.info(f"No new tickets found after block {last_processed_block}")
-        return
-    logger.info(f"Fount {len(tickets)} new tickets after block {last_processed_block}")
-    for ticket in tickets:
-        parsed_ticket = asyncio.run(psl.parse_registration_nft_ticket(ticket))
-        if parsed_ticket:
-            with db_context() as session:
-                if 'txid' not in parsed_ticket:
-                    continue
-                reg_ticket_txid = parsed_ticket['txid']
-
-                data_hash, found = get_value_from_nft_app_ticket(parsed_ticket, 'data_hash', '')
-                if not found:
-                    continue
-
-                height = parsed_ticket['height'] if 'height' in parsed_ticket else 0
-
-                file_name, _ = get_value_from_nft_app_ticket(parsed_ticket, 'file_name', '')
-                is_public, _ = get_value_from_nft_app_ticket(parsed_ticket, 'make_publicly_accessible', False)
-                author_pastel_id, _ = get_value_from_nft_ticket(parsed_ticket, 'author', '')
-
-                crud.reg_ticket.create_new(session,
-                                           reg_ticket_txid=reg_ticket_txid,
-                                           data_hash=data_hash,
-                                           blocknum=height,
-                                           file_name=file_name,
-                                           ticket_type='nft',
-                                           caller_pastel_id=author_pastel_id,
-                                           is_public=is_public)
-    logger.info(f"process_nft_tickets done, processed {len(tickets)} tickets")
+def nft_ticket_to_row(ticket) -> dict | None:
+    # runs in the decoder pool, must not touch DB or shared state
+    try:
+        parsed_ticket = psl.decode_registration_nft_ticket(ticket)
+        if not parsed_ticket or 'txid' not in parsed_ticket:
+            return None
+        data_hash, found = get_value_from_nft_app_ticket(parsed_ticket, 'data_hash', '')
+        if not found:
+            return None
+        file_name, _ = get_value_from_nft_app_ticket(parsed_ticket, 'file_name', '')
+        is_public, _ = get_value_from_nft_app_ticket(parsed_ticket, 'make_publicly_accessible', False)
+        author_pastel_id, _ = get_value_from_nft_ticket(parsed_ticket, 'author', '')
+    except Exception as e:
+        logger.warning(f"Can't decode NFT registration ticket {ticket.get('txid') if ticket else None}: {e}")
+        return None
+    return dict(reg_ticket_txid=parsed_ticket['txid'],
+                data_hash=data_hash,
+                blocknum=parsed_ticket['height'] if 'height' in parsed_ticket else 0,
+                file_name=file_name,
+                ticket_type='nft',
+                caller_pastel_id=author_pastel_id,
+                is_public=is_public)
 
 
-def process_action_tickets(tickets, last_processed_block):
+def action_ticket_to_row(ticket) -> dict | None:
+    # runs in the decoder pool, must not touch DB or shared state
+    try:
+        parsed_ticket = psl.decode_registration_action_ticket(ticket, "action-reg", ["cascade", "sense"])
+        if not parsed_ticket or 'txid' not in parsed_ticket:
+            return None
+        data_hash, found = get_value_from_action_api_ticket(parsed_ticket, 'data_hash', '')
+        if not found:
+            return None
+        file_name, _ = get_value_from_action_api_ticket(parsed_ticket, 'file_name', '')
+        is_public, _ = get_value_from_action_api_ticket(parsed_ticket, 'make_publicly_accessible', False)
+        caller_pastel_id, _ = get_value_from_action_ticket(parsed_ticket, 'caller', '')
+        ticket_type, _ = get_value_from_action_ticket(parsed_ticket, 'action_type', '')
+    except Exception as e:
+        logger.warning(f"Can't decode action registration ticket {ticket.get('txid') if ticket else None}: {e}")
+        return None
+    return dict(reg_ticket_txid=parsed_ticket['txid'],
+                data_hash=data_hash,
+                blocknum=parsed_ticket['height'] if 'height' in parsed_ticket else 0,
+                file_name=file_name,
+                ticket_type=ticket_type,
+                caller_pastel_id=caller_pastel_id,
+                is_public=is_public)
+
+
+def process_reg_tickets(tickets, last_processed_block, to_row):
+    """
+    Tickets are processed in block ranges of REG_TICKETS_FINDER_CHUNK_BLOCKS: decoded in the process pool
+    (for large backlogs), while the previous range is being written with one bulk insert.
+    Every range is committed at once, so the highest stored block is a valid checkpoint to resume from
+    """
     if not tickets:
         logger.info(f"No new tickets found after block {last_processed_block}")
         return
     logger.info(f"Fount {len(tickets)} new tickets after block {last_processed_block}")
-    for ticket in tickets:
-        parsed_ticket = asyncio.run(psl.parse_registration_action_ticket(ticket,
-                                                                         "action-reg",
-                                                                         ["cascade", "sense"]))
-        if parsed_ticket:
-            with db_context() as session:
-                if 'txid' not in parsed_ticket:
-                    continue
-                reg_ticket_txid = parsed_ticket['txid']
+    tickets = sorted(tickets, key=lambda t: t.get('height', 0) if t else 0)
 
-                data_hash, found = get_value_from_action_api_ticket(parsed_ticket, 'data_hash', '')
-                if not found:
-                    continue
-
-                height = parsed_ticket['height'] if 'height' in parsed_ticket else 0
-
-                file_name, _ = get_value_from_action_api_ticket(parsed_ticket, 'file_name', '')
-                is_public, _ = get_value_from_action_api_ticket(parsed_ticket, 'make_publicly_accessible', False)
-                caller_pastel_id, _ = get_value_from_action_ticket(parsed_ticket, 'caller', '')
-                ticket_type, _ = get_value_from_action_ticket(parsed_ticket, 'action_type', '')
+    pool = None
+    if settings.REG_TICKETS_FINDER_WORKERS > 1 and len(tickets) >= settings.REG_TICKETS_FINDER_POOL_THRESHOLD:
+        # billiard (not multiprocessing) - Celery worker processes are daemonic and can't have children otherwise
+        pool = billiard.Pool(processes=settings.REG_TICKETS_FINDER_WORKERS)
+        rows = pool.imap(to_row, tickets, chunksize=100)
+    else:
+        rows = map(to_row, tickets)
 
-                crud.reg_ticket.create_new(session,
-                                           reg_ticket_txid=reg_ticket_txid,
-                                           data_hash=data_hash,
-                                           blocknum=height,
-                                           file_name=file_name,
-                                           ticket_type=ticket_type,
-                                           caller_pastel_id=caller_pastel_id,
-                                           is_public=is_public)
-    logger.info(f"process_action_tickets done, processed {len(tickets)} tickets")
+    stored = 0
+    try:
+        chunk_end = last_processed_block + settings.REG_TICKETS_FINDER_CHUNK_BLOCKS
+        chunk = []
+        for ticket, row in zip(tickets, rows):
+            height = ticket.get('height', 0) if ticket else 0
+            if height > chunk_end:
+                stored += store_reg_tickets_chunk(chunk, chunk_end)
+                chunk = []
+                while height > chunk_end:
+                    chunk_end += settings.REG_TICKETS_FINDER_CHUNK_BLOCKS
+            if row:
+                chunk.append(row)
+        stored += store_reg_tickets_chunk(chunk, chunk_end)
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+    logger.info(f"process_reg_tickets done, processed {len(tickets)} tickets, stored {stored} new")
+
+
+def store_reg_tickets_chunk(rows, chunk_end) -> int:
+    if not rows:
+        return 0
+    with db_context() as session:
+        stored = crud.reg_ticket.create_bulk(session, rows)
+    logger.info(f"Registration tickets stored up to block {chunk_end}: {stored} new of {len(rows)}")
+    return stored
 
 
 @shared_task(name="scheduled_tools:ticket_activator")
@@ -281,6 +361,7 @@ def _ticket_activator(all_in_registered_state_func,
     with db_context() as session:
         tasks_from_db = all_in_registered_state_func(session, limit=settings.REGISTRATION_RE_PROCESSOR_LIMIT)
     logger.info(f"{service}: Found {len(tasks_from_db)} registered, but not activated tasks")
+    tasks_to_check = []
     for task_from_db in tasks_from_db:
         if task_from_db.pastel_id is None:
             logger.error(f"{service}: Don't know pastel_id, marking task as DEAD. ResultID = {task_from_db.result_id}")
@@ -293,13 +374,25 @@ def _ticket_activator(all_in_registered_state_func,
             logger.info(f"{service}: Skipping ticket {task_from_db.reg_ticket_txid}, "
                         f"caller pastel_id {task_from_db.pastel_id} is not ours")
             continue
-        try:
-            network_height = psl.call("getblockcount", [])   # can throw exception here
+        tasks_to_check.append(task_from_db)
 
-            msg = f"{service}: Check if registration ticket {task_from_db.reg_ticket_txid} is valid..."
-            logger.info(msg)
-            at_status = asyncio.run(psl.check_ticket_transaction(task_from_db.reg_ticket_txid, msg, 
-                                                                 network_height, task_from_db.height))
+    if not tasks_to_check:
+        return
+
+    logger.info(f"{service}: Check if {len(tasks_to_check)} registration tickets are valid...")
+    try:
+        network_height = psl.get_block_height()   # can throw exception here
+        reg_statuses = psl.run_with_pasteld_client(psl.check_ticket_transactions(
+            [(task_from_db.reg_ticket_txid,
+              f"{service}: Registration ticket transaction {task_from_db.reg_ticket_txid}",
+              task_from_db.height) for task_from_db in tasks_to_check],
+            network_height))
+    except Exception as e:
+        logger.error(f"{service}: Can't check registration tickets transactions: {e}")
+        return
+
+    for task_from_db, at_status in zip(tasks_to_check, reg_statuses):
+        try:
             if at_status == psl.TicketTransactionStatus.NOT_FOUND:
                 upd = {"process_status": DbStatus.ERROR.value, "retry_num": 0,
                        "updated_at": datetime.utcnow(),
@@ -334,7 +427,8 @@ def _ticket_activator(all_in_registered_state_func,
                       f"{task_from_db.reg_ticket_txid}"
 
                 logger.info(f"{msg} already created. Check if it's valid...")
-                at_status = asyncio.run(psl.check_ticket_transaction(act_txid, msg, network_height, reg_ticket_height))
+                at_status = psl.run_with_pasteld_client(
+                    psl.check_ticket_transaction(act_txid, msg, network_height, reg_ticket_height))
                 if at_status == psl.TicketTransactionStatus.CONFIRMED:
                     finalize_registration(task_from_db, act_txid, update_task_in_db_func, service)
                     continue
@@ -420,7 +514,7 @@ def find_activation_ticket(txid: str, ticket_type: str) -> str | None:
 
 def parse_registration_ticket(reg_txid, service: wn.WalletNodeService) -> (int | None, int | None, str | None):
     try:
-        reg_ticket = psl.call("tickets", ['get', reg_txid])   # can throw exception here
+        reg_ticket = ticket_cache.get_ticket(reg_txid)   # can throw exception here
     except psl.PasteldException as pe:
         if pe.message == 'No information available about transaction':
             err_msg = f"Registration ticket {reg_txid} not found"
@@ -504,16 +598,25 @@ def _ticket_verificator(all_done_func,
                         service: wn.WalletNodeService):
     logger.info(f"ticket_activator task started")
     with db_context() as session:
-        tasks_from_db = all_done_func(session)  # get latest 100(!) tasks in DONE state
-    for task_from_db in tasks_from_db:
-        try:
-            network_height = psl.call("getblockcount", [])   # can throw exception here
+        # get latest WATCHDOG_VERIFICATOR_LIMIT tasks in DONE state
+        tasks_from_db = all_done_func(session, limit=settings.WATCHDOG_VERIFICATOR_LIMIT)
+    if not tasks_from_db:
+        return
 
-            msg = f"{service}: Activation ticket transaction {task_from_db.act_ticket_txid} " \
-                  f"for registration ticket {task_from_db.reg_ticket_txid}"
+    try:
+        network_height = psl.get_block_height()   # can throw exception here
+        act_statuses = psl.run_with_pasteld_client(psl.check_ticket_transactions(
+            [(task_from_db.act_ticket_txid,
+              f"{service}: Activation ticket transaction {task_from_db.act_ticket_txid} "
+              f"for registration ticket {task_from_db.reg_ticket_txid}",
+              task_from_db.height) for task_from_db in tasks_from_db],
+            network_height))
+    except Exception as e:
+        logger.error(f"{service}: Can't verify activation tickets transactions: {e}")
+        return
 
-            at_status = asyncio.run(psl.check_ticket_transaction(task_from_db.act_ticket_txid, msg,
-                                                                 network_height, task_from_db.height))
+    for task_from_db, at_status in zip(tasks_from_db, act_statuses):
+        try:
             if at_status == psl.TicketTransactionStatus.NOT_FOUND:
                 # clear activation ticket txid if it is not found in the network
                 upd = {"act_ticket_txid": "", "process_status": DbStatus.REGISTERED.value,
@@ -1,17 +1,38 @@
 # This code is from https://gist.github.com/aaronpolhamus/cb305a3350f943215d00b66c85f576ea
 # Also see https://stackoverflow.com/questions/53950548/flask-celery-task-locking
 
+import asyncio
 import base64
 from contextlib import contextmanager
 import json
 import logging
 import uuid
+import weakref
 from redis import StrictRedis
+import redis.asyncio as aioredis
 
 from app.core.config import settings
 
 rds = StrictRedis(settings.REDIS_HOST, decode_responses=True, charset="utf-8")
 
+# the same for async code (API endpoints); connection pool is bound to the event loop, so every loop gets its own
+_async_rds: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aioredis.StrictRedis]" = weakref.WeakKeyDictionary()
+
+
+def get_async_rds() -> aioredis.StrictRedis:
+    loop = asyncio.get_running_loop()
+    client = _async_rds.get(loop)
+    if client is None:
+        client = aioredis.StrictRedis(host=settings.REDIS_HOST, decode_responses=True)
+        _async_rds[loop] = client
+    return client
+
+
+async def close_async_rds():
+    client = _async_rds.pop(asyncio.get_running_loop(), None)
+    if client:
+        await client.aclose()
+
 TASK_LOCK_MSG = "Task execution skipped -- another task already has the lock"
 REMOVE_ONLY_IF_OWNER_SCRIPT = """
 if redis.call("get",KEYS[1]) == ARGV[1] then
@@ -23,6 +23,7 @@ class BaseConfig:
         Queue("sense"),
         Queue("nft"),
         Queue("collection"),
+        Queue("ipfs"),
     )
 
     task_routes = (route_task,)
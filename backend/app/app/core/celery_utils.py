@@ -55,6 +55,15 @@ def create_celery():
                 }
             }
         )
+    if app_settings.PREBURN_POOL_VALIDATOR_ENABLED and not app_settings.ACCOUNT_MANAGER_ENABLED:
+        celery_app.conf.beat_schedule.update(
+            {
+                'scheduled_tools_preburn_pool_validator': {
+                    'task': 'scheduled_tools:preburn_pool_validator',
+                    'schedule': app_settings.PREBURN_POOL_VALIDATOR_INTERVAL,
+                }
+            }
+        )
     if app_settings.TICKET_ACTIVATOR_ENABLED and not app_settings.ACCOUNT_MANAGER_ENABLED:
         celery_app.conf.beat_schedule.update(
             {
@@ -85,6 +94,26 @@ def create_celery():
             }
         )
 
+    if app_settings.BLOCK_HEIGHT_POLLER_ENABLED and not app_settings.ACCOUNT_MANAGER_ENABLED:
+        celery_app.conf.beat_schedule.update(
+            {
+                'scheduled_tools_block_height_poller': {
+                    'task': 'scheduled_tools:block_height_poller',
+                    'schedule': app_settings.BLOCK_HEIGHT_POLLER_INTERVAL,
+                }
+            }
+        )
+
+    if app_settings.PENDING_BALANCE_RECONCILER_ENABLED and not app_settings.ACCOUNT_MANAGER_ENABLED:
+        celery_app.conf.beat_schedule.update(
+            {
+                'scheduled_tools_pending_balance_reconciler': {
+                    'task': 'scheduled_tools:pending_balance_reconciler',
+                    'schedule': app_settings.PENDING_BALANCE_RECONCILER_INTERVAL,
+                }
+            }
+        )
+
     if app_settings.ACCOUNT_MANAGER_ENABLED:
         if (app_settings.REGISTRATION_FINISHER_ENABLED or
                 app_settings.REGISTRATION_RE_PROCESSOR_ENABLED or
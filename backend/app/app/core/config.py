@@ -61,6 +61,18 @@ class Settings(BaseSettings):
 
     PASTEL_RPC_USER: str
     PASTEL_RPC_PWD: str
+    PASTEL_RPC_TIMEOUT: float = 600.0
+    PASTEL_RPC_CONNECT_TIMEOUT: float = 10.0
+    PASTEL_RPC_MAX_CONNECTIONS: int = 20
+    PASTEL_RPC_MAX_CONCURRENCY: int = 20
+    PASTEL_RPC_KEEPALIVE_EXPIRY: float = 60.0
+    PASTEL_RPC_BATCH_SIZE: int = 100
+    BLOCK_HEIGHT_CACHE_TTL: int = 30
+    TICKET_CACHE_LOCAL_SIZE: int = 10000
+    TICKET_CACHE_REDIS_TTL: int = 60 * 60 * 24 * 7
+    TICKET_CACHE_MIN_CONFIRMATIONS: int = 10
+    TICKET_DECODER_CACHE_SIZE: int = 10000
+    FEE_SCHEDULE_CACHE_TTL: int = 60 * 60
 
     PASTEL_ID: Optional[str] = None
     PASTEL_ID_PWD: Optional[str] = None
@@ -81,6 +93,13 @@ class Settings(BaseSettings):
             port = info.data['WN_BASE_PORT'] if check_parameter('WN_BASE_PORT', info) else '8080'
             return f"http://{host}:{port}"
 
+    WN_TIMEOUT: float = 300.0
+    WN_CONNECT_TIMEOUT: float = 10.0
+    WN_MAX_CONNECTIONS: int = 20
+    WN_MAX_CONCURRENCY: int = 20
+    WN_KEEPALIVE_EXPIRY: float = 60.0
+    WN_HISTORY_CONCURRENCY: int = 10
+
     SCW_ENABLED: bool = False
     SCW_PIN_URL_PREFIX: Optional[str] = f"https://api.scaleway.com/ipfs/v1alpha1/regions"
     SCW_PIN_URL_SUFFIX: Optional[str] = f"pins/create-by-cid"
@@ -99,6 +118,13 @@ class Settings(BaseSettings):
             host = info.data['IPFS_HOST'] if check_parameter('IPFS_HOST', info) else 'localhost'
             return f"/dns/{host}/tcp/5001/http"
 
+    IPFS_TIMEOUT: float = 1800.0
+    IPFS_CONNECT_TIMEOUT: float = 10.0
+    IPFS_MAX_CONNECTIONS: int = 20
+    IPFS_KEEPALIVE_EXPIRY: float = 60.0
+    IPFS_CHUNK_SIZE: int = 1024 * 1024
+    IPFS_ADD_MANY_CONCURRENCY: int = 4
+
     REDIS_HOST: Optional[str] = 'localhost'
     REDIS_PORT: Optional[str] = '6379'
     REDIS_URL: Optional[str] = None
@@ -112,9 +138,24 @@ class Settings(BaseSettings):
             port = info.data['REDIS_PORT'] if check_parameter('REDIS_PORT', info) else '6379'
             return f"redis://{host}:{port}/0"
 
+    STATUS_BUS_FALLBACK_INTERVAL: float = 600.0
+    STATUS_STREAM_MAXLEN: int = 10000
+    STATUS_STREAM_TTL: int = 60 * 60 * 24
+    STATUS_STREAM_KEEPALIVE_INTERVAL: float = 15.0
+
     FILE_STORAGE: str
     FILE_STORAGE_FOR_RESULTS_SUFFIX: str = "results"
     FILE_STORAGE_FOR_PARSED_RESULTS_SUFFIX: str = "parsed_results"
+    RESULT_CACHE_MAX_BYTES: int = 100 * 1024 * 1024 * 1024  # 0 - no limit
+    RESULT_CACHE_EVICTION_POLICY: str = "lru"  # lru or lfu
+    RESULT_CACHE_EVICT_TO_RATIO: float = 0.9
+    RESULT_CACHE_EVICT_MIN_AGE: int = 60
+    RESULT_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024
+    RESULT_CACHE_MEMORY_MAX_FILE_SIZE: int = 1024 * 1024
+    ZIP_FETCH_CONCURRENCY: int = 8
+    ZIP_FETCH_WINDOW_BYTES: int = 256 * 1024 * 1024
+    SINGLE_FLIGHT_LOCK_TIMEOUT: float = 300.0
+    SINGLE_FLIGHT_WAIT_TIMEOUT: float = 120.0
 
     NFT_DEFAULT_MAX_FILE_SIZE_FOR_FEE_IN_MB: int = 100
     NFT_THUMBNAIL_SIZE_IN_PIXELS: int = 256
@@ -209,13 +250,23 @@ class Settings(BaseSettings):
     FEE_PRE_BURNER_INTERVAL: float = 500.0
     FEE_PRE_BURNER_RELEASE_NON_USED: bool = True
     FEE_PRE_BURNER_CHECK_NEW: bool = True
+    PREBURN_POOL_VALIDATOR_ENABLED: bool = True
+    PREBURN_POOL_VALIDATOR_INTERVAL: float = 60.0
 
     REG_TICKETS_FINDER_ENABLED: bool = True
     REG_TICKETS_FINDER_INTERVAL: float = 150.0
+    REG_TICKETS_FINDER_CHUNK_BLOCKS: int = 5000
+    REG_TICKETS_FINDER_WORKERS: int = 4
+    REG_TICKETS_FINDER_POOL_THRESHOLD: int = 500
     TICKET_ACTIVATOR_INTERVAL: float = 500.0
     TICKET_ACTIVATOR_ENABLED: bool = True
     WATCHDOG_INTERVAL: float = 1200.0
     WATCHDOG_ENABLED: bool = True
+    WATCHDOG_VERIFICATOR_LIMIT: int = 100
+    BLOCK_HEIGHT_POLLER_ENABLED: bool = True
+    BLOCK_HEIGHT_POLLER_INTERVAL: float = 20.0
+    PENDING_BALANCE_RECONCILER_ENABLED: bool = True
+    PENDING_BALANCE_RECONCILER_INTERVAL: float = 3600.0
 
     ACCOUNT_MANAGER_ENABLED: bool = False
     ACCOUNT_MANAGER_ADDRESS_MAKER_INTERVAL: float = 120.0
@@ -254,6 +305,13 @@ class Settings(BaseSettings):
     COLLECTION_REGISTER_SOFT_TIME_LIMIT: int = 300
     COLLECTION_REGISTER_TIME_LIMIT: int = 360
 
+    IPFS_ADD_IN_BACKGROUND: bool = True
+    IPFS_ADD_RETRY_BACKOFF: int = 30
+    IPFS_ADD_RETRY_BACKOFF_MAX: int = 3600
+    IPFS_ADD_MAX_RETRIES: int = 15
+    IPFS_ADD_SOFT_TIME_LIMIT: int = 1800
+    IPFS_ADD_TIME_LIMIT: int = 1860
+
     REGISTRATION_RE_PROCESSOR_LIMIT: int = 10
 
     # ticket prices
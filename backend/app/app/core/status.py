@@ -4,6 +4,7 @@ from enum import Enum
 from app import crud, schemas
 from app.db.session import db_context
 from app.utils import walletnode as wn
+from app.utils.status_bus import publish_status_change
 
 # Internal Life cycle of a request (DbStatus):
 #
@@ -71,30 +72,60 @@ def add_status_to_history_log(task_from_db, wn_service, wn_task_status):
                 "updated_at": datetime.utcnow(),
             }
             log_klass.update(session, db_obj=log, obj_in=upd)
+    publish_status_change(task_from_db, wn_service.ticket_name())
 
 
-def get_status_from_history_log(task_from_db, wn_service):
-
+def _history_log_klass(wn_service):
     if wn_service == wn.WalletNodeService.CASCADE:
-        file_id = task_from_db.wn_file_id
-        log_klass = crud.cascade_log
+        return crud.cascade_log
     elif wn_service == wn.WalletNodeService.SENSE:
-        file_id = task_from_db.wn_file_id
-        log_klass = crud.sense_log
+        return crud.sense_log
     elif wn_service == wn.WalletNodeService.NFT:
-        file_id = task_from_db.wn_file_id
-        log_klass = crud.nft_log
+        return crud.nft_log
     elif wn_service == wn.WalletNodeService.COLLECTION:
-        file_id = None
-        log_klass = crud.collection_log
-    else:
+        return crud.collection_log
+    return None
+
+
+def _history_log_file_id(task_from_db, wn_service):
+    # collections don't have WN file
+    return None if wn_service == wn.WalletNodeService.COLLECTION else task_from_db.wn_file_id
+
+
+def get_status_from_history_log(task_from_db, wn_service):
+    log_klass = _history_log_klass(wn_service)
+    if not log_klass:
         return
 
     with db_context() as session:
-        return log_klass.get_by_ids(session, task_from_db.id, file_id,
+        return log_klass.get_by_ids(session, task_from_db.id, _history_log_file_id(task_from_db, wn_service),
                                     task_from_db.wn_task_id, task_from_db.pastel_id)
 
 
+def get_statuses_from_history_log(tasks_from_db, wn_service) -> dict:
+    """
+    Same as get_status_from_history_log for many tasks, with one query. Returns task id -> history log
+    """
+    log_klass = _history_log_klass(wn_service)
+    if not log_klass or not tasks_from_db:
+        return {}
+
+    with db_context() as session:
+        logs = log_klass.get_by_task_ids(session, [task_from_db.id for task_from_db in tasks_from_db])
+
+    logs_by_key = {}
+    for log in logs:
+        logs_by_key.setdefault((log.task_id, log.wn_task_id, log.pastel_id), []).append(log)
+    result = {}
+    for task_from_db in tasks_from_db:
+        file_id = _history_log_file_id(task_from_db, wn_service)
+        for log in logs_by_key.get((task_from_db.id, task_from_db.wn_task_id, task_from_db.pastel_id), []):
+            if not file_id or log.wn_file_id == file_id:
+                result[task_from_db.id] = log
+                break
+    return result
+
+
 class ReqStatus(str, Enum):
     SUCCESS = "SUCCESS"
     PENDING = "PENDING"
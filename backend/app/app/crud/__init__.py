@@ -6,5 +6,8 @@ from .crud_cascade import cascade
 from .crud_sense import sense
 from .crud_nft import nft
 from .crud_collection import collection
+from .crud_gateway_request import gateway_request
+from .crud_pending_balance import pending_balance
+from .crud_stored_file import stored_file
 from .crud_reg_ticket import reg_ticket
 from .crud_history_log import cascade_log, sense_log, nft_log, collection_log
@@ -1,13 +1,17 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, Tuple, Type, TypeVar, Union
 from datetime import datetime, timedelta
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 import sqlalchemy as sa
 
 from app.core.status import DbStatus
-from app.db.base_class import Base
+from app.db.base_class import Base, gen_rand_id
+from app.models.gateway_request import GatewayRequest
+from app.models.pending_balance import PendingBalance
+from app.utils.status_bus import STATUS_FIELDS, publish_status_change
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
@@ -26,6 +30,11 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         """
         self.model = model
 
+    # results of this model are counted in GatewayRequest summaries
+    tracks_requests = False
+    # PendingBalance column where pending amounts of results of this model are kept, if any
+    pending_balance_column: Optional[str] = None
+
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         return db.query(self.model).filter(self.model.id == id).first()
 
@@ -54,24 +63,49 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
+        old_status = obj_data.get("process_status")
+        old_fee = fee_amount(obj_data.get("wn_fee"))
         for field in obj_data:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
+        if self.tracks_requests or self.pending_balance_column:
+            self.track_change(db, db_obj, old_status=old_status, old_fee=old_fee,
+                              new_status=getattr(db_obj, "process_status", None),
+                              new_fee=fee_amount(getattr(db_obj, "wn_fee", None)))
         db.commit()
         db.refresh(db_obj)
+        if STATUS_FIELDS.intersection(update_data):
+            publish_status_change(db_obj)
         return db_obj
 
     def remove(self, db: Session, *, id: int) -> ModelType:
         obj = db.query(self.model).get(id)
         db.delete(obj)
+        if self.tracks_requests or self.pending_balance_column:
+            self.track_change(db, obj, total=-1,
+                              old_status=obj.process_status, old_fee=getattr(obj, "wn_fee", None) or 0)
         db.commit()
         return obj
 
     def get_multi_by_owner_and_status(
-            self, db: Session, *, owner_id: int, req_status: str, skip: int = 0, limit: int = 10000
+            self, db: Session, *, owner_id: int, req_status: str, skip: int = 0, limit: int = 10000,
+            after: Optional[Tuple[datetime, int]] = None,
+            created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+            request_id: Optional[str] = None,
     ) -> List[ModelType]:
+        """
+        Owner's results ordered by (created_at, id). after is (created_at, id) of the last row of the previous page
+        """
         query = db.query(self.model).filter(self.model.owner_id == owner_id)
+        if after:
+            query = query.filter(sa.tuple_(self.model.created_at, self.model.id) > sa.tuple_(*after))
+        if created_from:
+            query = query.filter(self.model.created_at >= created_from)
+        if created_to:
+            query = query.filter(self.model.created_at < created_to)
+        if request_id:
+            query = query.filter(self.model.request_id == request_id)
         if req_status == 'SUCCESS':
             query = query.filter(self.model.process_status == DbStatus.DONE.value)
         if req_status == 'FAILED':
@@ -80,7 +114,7 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             query = ((query
                      .filter(self.model.process_status != DbStatus.DONE.value))
                      .filter(self.model.process_status != DbStatus.DEAD.value))
-        return query.offset(skip).limit(limit).all()
+        return query.order_by(self.model.created_at, self.model.id).offset(skip).limit(limit).all()
 
     def get_all_not_finished(
             self, db: Session, *, hours_ago=12, skip: int = 0, limit: int = 100
@@ -115,3 +149,119 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                )
         return res if res else 0.0
 
+    def get_pending_sums_by_owner(self, db: Session) -> Dict[int, float]:
+        """
+        get_pending_fee_sum of all owners at once: owner_id -> sum
+        """
+        rows = (db.query(self.model.owner_id, sa.func.sum(self.model.wn_fee))
+                .filter(sa.and_(self.model.process_status != 'DONE',
+                                self.model.process_status != 'DEAD')
+                        )
+                .group_by(self.model.owner_id)
+                .all()
+                )
+        return {owner_id: res or 0.0 for owner_id, res in rows}
+
+    def pending_amount(self, process_status: Optional[str], fee) -> float:
+        # the same condition as in get_pending_fee_sum: in SQL NULL status is neither DONE nor not DONE
+        if process_status is None or process_status in [DbStatus.DONE.value, DbStatus.DEAD.value]:
+            return 0
+        return fee_amount(fee)
+
+    def track_change(self, db: Session, task: ModelType, *, total: int = 0,
+                     old_status: Optional[str] = None, old_fee: int = 0,
+                     new_status: Optional[str] = None, new_fee: int = 0):
+        """
+        Updates GatewayRequest summary and PendingBalance ledger in the current transaction, together with the
+        result change. total=1 - the result is added, total=-1 - removed
+        """
+        if self.tracks_requests:
+            self.count_in_request(db, task, total=total,
+                                  old_status=old_status, old_fee=old_fee, new_status=new_status, new_fee=new_fee)
+        if self.pending_balance_column:
+            delta = ((self.pending_amount(new_status, new_fee) if total >= 0 else 0) -
+                     (self.pending_amount(old_status, old_fee) if total <= 0 else 0))
+            self.count_in_pending_balance(db, task.owner_id, self.pending_balance_column, delta)
+
+    @staticmethod
+    def count_in_pending_balance(db: Session, owner_id: Optional[int], column: str, delta: float):
+        """
+        Adds delta to the owner's PendingBalance column. Doesn't commit - caller does, together with the result change
+        """
+        if not owner_id or not delta:
+            return
+        now = datetime.utcnow()
+        row = {"cascade_pending": 0.0, "sense_pending": 0.0, "nft_pending": 0.0, "collection_pending_count": 0}
+        row[column] = delta
+        stmt = pg_insert(PendingBalance).values(
+            id=gen_rand_id(), owner_id=owner_id, updated_at=now, **row
+        ).on_conflict_do_update(
+            index_elements=[PendingBalance.owner_id],
+            set_={column: getattr(PendingBalance, column) + delta, "updated_at": now},
+        )
+        db.execute(stmt)
+
+    @staticmethod
+    def count_in_request(db: Session, task: ModelType, *, total: int = 0,
+                         old_status: Optional[str] = None, old_fee: int = 0,
+                         new_status: Optional[str] = None, new_fee: int = 0):
+        """
+        Moves the result between status counters of its GatewayRequest summary. Doesn't commit - caller does,
+        together with the result change. total=1 adds the result (creating the summary), total=-1 removes it
+        """
+        if not task.request_id:
+            return
+        deltas = {"pending_count": 0, "success_count": 0, "failed_count": 0}
+        if total >= 0:
+            deltas[_request_counter(new_status)] += 1
+        if total <= 0:
+            deltas[_request_counter(old_status)] -= 1
+        fee_delta = (fee_amount(new_fee) if total >= 0 else 0) - (fee_amount(old_fee) if total <= 0 else 0)
+        if total == 0 and not any(deltas.values()) and not fee_delta:
+            return
+
+        now = datetime.utcnow()
+        values = {
+            "total_count": GatewayRequest.total_count + total,
+            "total_fee": GatewayRequest.total_fee + fee_delta,
+            "is_terminal": (GatewayRequest.success_count + deltas["success_count"] +
+                            GatewayRequest.failed_count + deltas["failed_count"] ==
+                            GatewayRequest.total_count + total),
+            "updated_at": now,
+        }
+        for counter, delta in deltas.items():
+            values[counter] = getattr(GatewayRequest, counter) + delta
+
+        if total > 0:
+            counters = {counter: max(delta, 0) for counter, delta in deltas.items()}
+            stmt = pg_insert(GatewayRequest).values(
+                id=gen_rand_id(), request_id=task.request_id, service=task.__tablename__, owner_id=task.owner_id,
+                total_count=1, total_fee=new_fee, is_terminal=counters["pending_count"] == 0,
+                created_at=now, updated_at=now, **counters,
+            ).on_conflict_do_update(index_elements=[GatewayRequest.request_id], set_=values)
+        else:
+            stmt = sa.update(GatewayRequest).where(GatewayRequest.request_id == task.request_id).values(values)
+        db.execute(stmt)
+
+
+def fee_amount(fee) -> float:
+    """
+    wn_fee as number. WRONG_FEE corrections set it to the value parsed from pasteld error message, i.e. string
+    """
+    if isinstance(fee, str):
+        fee = fee.strip()
+        if not fee:
+            return 0
+        try:
+            return int(fee)
+        except ValueError:
+            return float(fee)   # can throw exception here
+    return fee or 0
+
+
+def _request_counter(process_status: Optional[str]) -> str:
+    if process_status == DbStatus.DONE.value:
+        return "success_count"
+    if process_status == DbStatus.DEAD.value:
+        return "failed_count"
+    return "pending_count"
@@ -10,9 +10,11 @@ from app.core.status import DbStatus
 
 
 class CRUDCascade(CRUDBase[Cascade, CascadeCreate, CascadeUpdate]):
-    @staticmethod
+    tracks_requests = True
+    pending_balance_column = "cascade_pending"
+
     def create_with_owner(
-            db: Session, *, obj_in: CascadeCreate, owner_id: int
+            self, db: Session, *, obj_in: CascadeCreate, owner_id: int
     ) -> Cascade:
         # noinspection PyArgumentList
         db_obj = Cascade(
@@ -31,6 +33,7 @@ class CRUDCascade(CRUDBase[Cascade, CascadeCreate, CascadeUpdate]):
             owner_id=owner_id
         )
         db.add(db_obj)
+        self.track_change(db, db_obj, total=1, new_status=db_obj.process_status, new_fee=db_obj.wn_fee or 0)
         db.commit()
         db.refresh(db_obj)
         return db_obj
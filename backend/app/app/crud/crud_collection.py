@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from sqlalchemy.orm import Session
 import sqlalchemy as sa
@@ -10,9 +10,10 @@ from app.core.status import DbStatus
 
 
 class CRUDCollection(CRUDBase[Collection, CollectionCreate, CollectionUpdate]):
-    @staticmethod
+    pending_balance_column = "collection_pending_count"
+
     def create_with_owner(
-            db: Session, *, obj_in: CollectionCreate, owner_id: int
+            self, db: Session, *, obj_in: CollectionCreate, owner_id: int
     ) -> Collection:
         # noinspection PyArgumentList
         db_obj = Collection(
@@ -34,6 +35,7 @@ class CRUDCollection(CRUDBase[Collection, CollectionCreate, CollectionUpdate]):
             owner_id=owner_id
         )
         db.add(db_obj)
+        self.track_change(db, db_obj, total=1, new_status=db_obj.process_status)
         db.commit()
         db.refresh(db_obj)
         return db_obj
@@ -148,6 +150,20 @@ class CRUDCollection(CRUDBase[Collection, CollectionCreate, CollectionUpdate]):
             .filter(Collection.act_ticket_txid == act_txid)
             .first())
 
+    def pending_amount(self, process_status, fee) -> float:
+        # collections are counted, the fee is fixed
+        return 1 if super().pending_amount(process_status, 1) else 0
+
+    def get_pending_sums_by_owner(self, db: Session) -> Dict[int, float]:
+        rows = (db.query(self.model.owner_id, sa.func.count(self.model.id))
+                .filter(sa.and_(self.model.process_status != 'DONE',
+                                self.model.process_status != 'DEAD')
+                        )
+                .group_by(self.model.owner_id)
+                .all()
+                )
+        return {owner_id: res for owner_id, res in rows}
+
     def get_number_of_pending(self, db, *, owner_id: int) -> float:
         res = (db.query(self.model)
                .filter(self.model.owner_id == owner_id)
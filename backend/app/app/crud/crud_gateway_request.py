@@ -0,0 +1,42 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.gateway_request import GatewayRequest
+
+
+# Summaries are written only by CRUDBase.count_in_request, together with the results
+class CRUDGatewayRequest(CRUDBase[GatewayRequest, BaseModel, BaseModel]):
+    def get_by_request_id_and_owner(self, db: Session, *, request_id: str, owner_id: int) -> Optional[GatewayRequest]:
+        return (
+            db.query(self.model)
+            .filter(GatewayRequest.owner_id == owner_id)
+            .filter(GatewayRequest.request_id == request_id)
+            .first())
+
+    def get_by_request_ids(self, db: Session, *, request_ids: List[str]) -> List[GatewayRequest]:
+        if not request_ids:
+            return []
+        return db.query(self.model).filter(GatewayRequest.request_id.in_(request_ids)).all()
+
+    def get_multi_by_owner_and_status(
+            self, db: Session, *, owner_id: int, service: str, req_status: Optional[str],
+            skip: int = 0, limit: int = 10000
+    ) -> List[GatewayRequest]:
+        query = (db.query(self.model)
+                 .filter(GatewayRequest.owner_id == owner_id)
+                 .filter(GatewayRequest.service == service))
+        if req_status == 'SUCCESS':
+            query = query.filter(GatewayRequest.success_count == GatewayRequest.total_count)
+        if req_status == 'FAILED':
+            query = query.filter(GatewayRequest.failed_count == GatewayRequest.total_count)
+        if req_status == 'PENDING':
+            query = (query
+                     .filter(GatewayRequest.success_count != GatewayRequest.total_count)
+                     .filter(GatewayRequest.failed_count != GatewayRequest.total_count))
+        return query.order_by(GatewayRequest.created_at, GatewayRequest.id).offset(skip).limit(limit).all()
+
+
+gateway_request = CRUDGatewayRequest(GatewayRequest)
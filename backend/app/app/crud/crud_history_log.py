@@ -4,7 +4,7 @@ from app.schemas.history_log import HistoryLogCreate, HistoryLogUpdate
 
 from app.db.base_class import Base
 from sqlalchemy.orm import Session
-from typing import Optional, TypeVar
+from typing import List, Optional, TypeVar
 from pydantic import BaseModel
 
 ModelType = TypeVar("ModelType", bound=Base)
@@ -25,6 +25,11 @@ class CRUDHistoryLog(CRUDBase[ModelType, CreateSchemaType, UpdateSchemaType]):
             query = query.filter(self.model.wn_file_id == wn_file_id)
         return query.first()
 
+    def get_by_task_ids(self, db: Session, task_ids: List[int]) -> List[ModelType]:
+        if not task_ids:
+            return []
+        return db.query(self.model).filter(self.model.task_id.in_(task_ids)).all()
+
 class CRUDCascadeLog(CRUDHistoryLog[CascadeHistory, HistoryLogCreate, HistoryLogUpdate]):
     pass
 
@@ -10,9 +10,11 @@ from app.core.status import DbStatus
 
 
 class CRUDNft(CRUDBase[Nft, NftCreate, NftUpdate]):
-    @staticmethod
+    tracks_requests = True
+    pending_balance_column = "nft_pending"
+
     def create_with_owner(
-            db: Session, *, obj_in: NftCreate, owner_id: int
+            self, db: Session, *, obj_in: NftCreate, owner_id: int
     ) -> Nft:
         # noinspection PyArgumentList
         db_obj = Nft(
@@ -34,6 +36,7 @@ class CRUDNft(CRUDBase[Nft, NftCreate, NftUpdate]):
             owner_id=owner_id
         )
         db.add(db_obj)
+        self.track_change(db, db_obj, total=1, new_status=db_obj.process_status, new_fee=db_obj.wn_fee or 0)
         db.commit()
         db.refresh(db_obj)
         return db_obj
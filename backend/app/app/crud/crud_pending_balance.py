@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+import sqlalchemy as sa
+
+from app.crud.base import CRUDBase
+from app.models.pending_balance import PendingBalance
+
+
+# Ledger is written by CRUDBase.count_in_pending_balance, together with the results, and by reconcile
+class CRUDPendingBalance(CRUDBase[PendingBalance, BaseModel, BaseModel]):
+    def get_by_owner(self, db: Session, *, owner_id: int) -> Optional[PendingBalance]:
+        return db.query(self.model).filter(PendingBalance.owner_id == owner_id).first()
+
+    def get_by_owners(self, db: Session, *, owner_ids: List[int]) -> List[PendingBalance]:
+        if not owner_ids:
+            return []
+        return db.query(self.model).filter(PendingBalance.owner_id.in_(owner_ids)).all()
+
+    @staticmethod
+    def lock(db: Session):
+        # blocks results changes (they update the ledger in the same transaction) until commit,
+        # so the sums read after it can't miss any change
+        db.execute(sa.text("LOCK TABLE pendingbalance IN EXCLUSIVE MODE"))
+
+    def reconcile(self, db: Session, *, actual: Dict[str, Dict[int, float]]) -> List[Tuple[int, str, float, float]]:
+        """
+        Sets the ledger columns to actual sums (column -> owner_id -> amount) and commits.
+        Call after lock() with the sums read after it. Returns fixed (owner_id, column, ledger value, actual value)
+        """
+        now = datetime.utcnow()
+        ledger = {row.owner_id: row for row in db.query(self.model).all()}
+        owner_ids = set(ledger)
+        for sums in actual.values():
+            owner_ids.update(owner_id for owner_id in sums if owner_id is not None)
+
+        fixed = []
+        for owner_id in owner_ids:
+            row = ledger.get(owner_id)
+            if not row:
+                row = PendingBalance(owner_id=owner_id, cascade_pending=0.0, sense_pending=0.0, nft_pending=0.0,
+                                     collection_pending_count=0, updated_at=now)
+                db.add(row)
+            for column, sums in actual.items():
+                expected = sums.get(owner_id) or 0
+                current = getattr(row, column) or 0
+                if abs(current - expected) > 1e-6:
+                    fixed.append((owner_id, column, current, expected))
+                    setattr(row, column, expected)
+                    row.updated_at = now
+            row.reconciled_at = now
+        db.commit()
+        return fixed
+
+
+pending_balance = CRUDPendingBalance(PendingBalance)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.orm import Session
@@ -24,6 +25,13 @@ class CRUDPreBurnTx(CRUDBase[PreBurnTx, PreBurnTxCreate, PreBurnTxUpdate]):
         db.refresh(db_obj)
         return db_obj
 
+    @staticmethod
+    def create_new_many(db: Session, *, height: int, burns: list[tuple[float, str]]) -> list[PreBurnTx]:
+        db_objs = [PreBurnTx(fee=fee, height=height, txid=txid, status=PBTXStatus.NEW) for fee, txid in burns]
+        db.add_all(db_objs)
+        db.commit()
+        return db_objs
+
     @staticmethod
     def create_new_bound(db: Session, *, fee: float, height: int, txid: str, result_id: str) -> PreBurnTx:
         db_obj = PreBurnTx(
@@ -43,7 +51,7 @@ class CRUDPreBurnTx(CRUDBase[PreBurnTx, PreBurnTxCreate, PreBurnTxUpdate]):
             .filter(PreBurnTx.fee == fee)\
             .filter(PreBurnTx.status == PBTXStatus.NEW)\
             .order_by(asc(PreBurnTx.height)) \
-            .with_for_update() \
+            .with_for_update(skip_locked=True) \
             .first()
         if not db_obj:
             return
@@ -53,6 +61,54 @@ class CRUDPreBurnTx(CRUDBase[PreBurnTx, PreBurnTxCreate, PreBurnTxUpdate]):
         db.refresh(db_obj)
         return db_obj
 
+    def claim_validated(self, db: Session, *, fee: float, result_id: str) -> Optional[PreBurnTx]:
+        """
+        Atomically takes the oldest validated NEW tx with the fee from the pool and binds it to the result.
+        Rows locked by other workers are skipped, so concurrent claims never wait for or get the same tx
+        """
+        candidate = (
+            sa.select(PreBurnTx.id)
+            .where(PreBurnTx.fee == fee)
+            .where(PreBurnTx.status == PBTXStatus.NEW)
+            .where(PreBurnTx.validated_at.is_not(None))
+            .order_by(asc(PreBurnTx.height))
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            sa.update(PreBurnTx)
+            .where(PreBurnTx.id == candidate)
+            .values(status=PBTXStatus.PENDING, result_id=result_id)
+            .returning(PreBurnTx.id)
+        )
+        claimed_id = db.execute(stmt).scalar()
+        db.commit()
+        if not claimed_id:
+            return None
+        return self.get(db, id=claimed_id)
+
+    def get_number_not_validated_by_fee(self, db: Session, *, fee: float) -> int:
+        return db.execute(
+            db.query(self.model).filter(PreBurnTx.fee == fee)
+            .filter(PreBurnTx.status == PBTXStatus.NEW)
+            .filter(PreBurnTx.validated_at.is_(None))
+            .statement.with_only_columns(func.count()).order_by(None)
+        ).scalar()
+
+    def get_all_not_validated(self, db: Session, *, max_height: int) -> list[PreBurnTx]:
+        return (
+            db.query(self.model)
+            .filter(PreBurnTx.status == PBTXStatus.NEW)
+            .filter(PreBurnTx.validated_at.is_(None))
+            .filter(PreBurnTx.height <= max_height)
+            .all())
+
+    def mark_validated(self, db: Session, preburn_txid: str):
+        db_obj = db.query(self.model).filter(PreBurnTx.txid == preburn_txid).first()
+        if db_obj and db_obj.status == PBTXStatus.NEW:
+            super().update(db, db_obj=db_obj, obj_in={"validated_at": datetime.utcnow()})
+
     def change_status(self, db: Session, preburn_txid: str, status: PBTXStatus):
         db_obj = db.query(self.model).filter(PreBurnTx.txid == preburn_txid).first()
         if db_obj:
@@ -68,7 +124,8 @@ class CRUDPreBurnTx(CRUDBase[PreBurnTx, PreBurnTxCreate, PreBurnTxUpdate]):
     def mark_non_used(self, db: Session, preburn_txid: str):
         db_obj = db.query(self.model).filter(PreBurnTx.txid == preburn_txid).first()
         if db_obj:
-            update_data = {"status": PBTXStatus.NEW, "result_id": None}
+            # it will be claimed again only after the validator checks it is still not used
+            update_data = {"status": PBTXStatus.NEW, "result_id": None, "validated_at": None}
             super().update(db, db_obj=db_obj, obj_in=update_data)
 
     def mark_pending(self, db: Session, preburn_txid: str):
@@ -103,6 +160,12 @@ class CRUDPreBurnTx(CRUDBase[PreBurnTx, PreBurnTxCreate, PreBurnTxUpdate]):
             .statement.with_only_columns(func.count()).order_by(None)
         ).scalar()
 
+    def get_counts_by_fee_and_status(self, db: Session) -> dict[tuple[float, PBTXStatus], int]:
+        rows = (db.query(PreBurnTx.fee, PreBurnTx.status, func.count())
+                .group_by(PreBurnTx.fee, PreBurnTx.status)
+                .all())
+        return {(fee, status): count for fee, status, count in rows}
+
     def get_all_used(self, db: Session) -> list[PreBurnTx]:
         return db.query(self.model).filter(PreBurnTx.status == PBTXStatus.USED).all()
 
@@ -2,9 +2,11 @@ import base64
 import binascii
 from typing import List
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app.crud.base import CRUDBase
+from app.db.base_class import gen_rand_id
 from app.models.psl_reg_ticket import RegTicket
 from app.schemas.reg_ticket import RegTicketCreate, RegTicketUpdate
 
@@ -35,6 +37,19 @@ class CRUDRegTicket(CRUDBase[RegTicket, RegTicketCreate, RegTicketUpdate]):
         db.refresh(db_obj)
         return db_obj
 
+    @staticmethod
+    def create_bulk(db: Session, rows: List[dict]) -> int:
+        # rows are dicts with the same keys as create_new parameters, already stored txids are skipped
+        inserted = 0
+        # one transaction, but split into statements to stay below the bind parameters limit
+        for i in range(0, len(rows), 1000):
+            stmt = insert(RegTicket) \
+                .values([{"id": gen_rand_id(), **row} for row in rows[i:i+1000]]) \
+                .on_conflict_do_nothing(index_elements=[RegTicket.reg_ticket_txid])
+            inserted += db.execute(stmt).rowcount
+        db.commit()
+        return inserted
+
     @staticmethod
     def get_by_hash(db: Session, *, data_hash_as_hex: str, ticket_type: str) -> List[RegTicket]:
         binary_hash = binascii.unhexlify(data_hash_as_hex)
@@ -55,8 +70,11 @@ class CRUDRegTicket(CRUDBase[RegTicket, RegTicketCreate, RegTicketUpdate]):
                 .first()
                 )
 
-    def get_last_blocknum(self, db: Session) -> int:
-        last = db.query(RegTicket).order_by(RegTicket.blocknum.desc()).first()
+    def get_last_blocknum(self, db: Session, ticket_types: List[str] | None = None) -> int:
+        query = db.query(RegTicket)
+        if ticket_types:
+            query = query.filter(RegTicket.ticket_type.in_(ticket_types))
+        last = query.order_by(RegTicket.blocknum.desc()).first()
         return last.blocknum if last else 0
 
 
@@ -10,9 +10,11 @@ from app.core.status import DbStatus
 
 
 class CRUDSense(CRUDBase[Sense, SenseCreate, SenseUpdate]):
-    @staticmethod
+    tracks_requests = True
+    pending_balance_column = "sense_pending"
+
     def create_with_owner(
-            db: Session, *, obj_in: SenseCreate, owner_id: int
+            self, db: Session, *, obj_in: SenseCreate, owner_id: int
     ) -> Sense:
         # noinspection PyArgumentList
         db_obj = Sense(
@@ -32,6 +34,7 @@ class CRUDSense(CRUDBase[Sense, SenseCreate, SenseUpdate]):
             owner_id=owner_id
         )
         db.add(db_obj)
+        self.track_change(db, db_obj, total=1, new_status=db_obj.process_status, new_fee=db_obj.wn_fee or 0)
         db.commit()
         db.refresh(db_obj)
         return db_obj
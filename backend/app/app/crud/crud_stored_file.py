@@ -0,0 +1,30 @@
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.crud.base import CRUDBase
+from app.db.base_class import gen_rand_id
+from app.models.stored_file import StoredFile
+
+
+class CRUDStoredFile(CRUDBase[StoredFile, BaseModel, BaseModel]):
+    def get_by_file_id(self, db: Session, *, file_id: str) -> Optional[StoredFile]:
+        return db.query(self.model).filter(StoredFile.file_id == file_id).first()
+
+    def get_by_content_hash(self, db: Session, *, content_hash: str) -> Optional[StoredFile]:
+        return db.query(self.model).filter(StoredFile.content_hash == content_hash).first()
+
+    def save(self, db: Session, *, file_id: str, file_name: str, content_type: str,
+             content_hash: str, size: int) -> StoredFile:
+        values = {"file_name": file_name, "content_type": content_type, "content_hash": content_hash, "size": size}
+        stmt = pg_insert(StoredFile).values(
+            id=gen_rand_id(), file_id=file_id, **values
+        ).on_conflict_do_update(index_elements=[StoredFile.file_id], set_=values)
+        db.execute(stmt)
+        db.commit()
+        return self.get_by_file_id(db, file_id=file_id)
+
+
+stored_file = CRUDStoredFile(StoredFile)
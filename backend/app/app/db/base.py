@@ -6,4 +6,7 @@ from app.models.api_key import ApiKey  # noqa
 from app.models.user import User  # noqa
 from app.models.preburn_tx import PreBurnTx  # noqa
 from app.models.cascade import Cascade  # noqa
+from app.models.gateway_request import GatewayRequest  # noqa
+from app.models.pending_balance import PendingBalance  # noqa
+from app.models.stored_file import StoredFile  # noqa
 from app.models.psl_reg_ticket import RegTicket  # noqa
@@ -9,6 +9,10 @@ from starlette.requests import Request
 from app.core.config import settings
 from app.core.celery_utils import create_celery
 from app.api.api_v1.api import api_router
+import app.utils.pasteld as psl
+import app.utils.walletnode as wn
+from app.utils.ipfs_tools import close_ipfs_client
+from app.celery_tasks.task_lock import close_async_rds
 
 
 def create_app() -> FastAPI:
@@ -33,6 +37,15 @@ def create_app() -> FastAPI:
             allow_headers=["*"],
         )
 
+    @current_app.on_event("shutdown")
+    async def close_client_sessions():
+        await psl.close_async_session()
+        psl.close_sync_client()
+        await wn.close_async_session()
+        wn.close_sync_client()
+        await close_ipfs_client()
+        await close_async_rds()
+
     return current_app
 
 
@@ -7,6 +7,9 @@ from .cascade import Cascade
 from .sense import Sense
 from .nft import Nft
 from .collection import Collection
+from .gateway_request import GatewayRequest
+from .pending_balance import PendingBalance
+from .stored_file import StoredFile
 
 from .psl_reg_ticket import RegTicket
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from .base_task import BaseTask
@@ -8,3 +8,6 @@ class Cascade(BaseTask):
     burn_txid = Column(String, index=True)
     owner_id = Column(Integer, ForeignKey("user.id"))
     owner = relationship("User", back_populates="cascade_tasks")
+
+    # keyset pagination of the owner's results
+    __table_args__ = (Index("ix_cascade_owner_id_created_at_id", "owner_id", "created_at", "id"),)
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+
+from app.db.base_class import Base, gen_rand_id
+
+
+# Summary of all results of one gateway_request, maintained by CRUD layer on every change of the results
+class GatewayRequest(Base):
+    id = Column(Integer, primary_key=True, index=True, default=gen_rand_id)
+    request_id = Column(String, index=True, unique=True)
+    service = Column(String, index=True)
+    owner_id = Column(Integer, ForeignKey("user.id"), index=True)
+
+    total_count = Column(Integer, default=0, nullable=False)
+    pending_count = Column(Integer, default=0, nullable=False)
+    success_count = Column(Integer, default=0, nullable=False)
+    failed_count = Column(Integer, default=0, nullable=False)
+    total_fee = Column(Integer, default=0, nullable=False)
+    is_terminal = Column(Boolean, default=False, index=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSON
 
@@ -12,3 +12,6 @@ class Nft(BaseTask):
     nft_dd_file_ipfs_link = Column(String)
     owner_id = Column(Integer, ForeignKey("user.id"))
     owner = relationship("User", back_populates="nft_tasks")
+
+    # keyset pagination of the owner's results
+    __table_args__ = (Index("ix_nft_owner_id_created_at_id", "owner_id", "created_at", "id"),)
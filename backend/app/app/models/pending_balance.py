@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime, Float, ForeignKey
+
+from app.db.base_class import Base, gen_rand_id
+
+
+# Ledger of the user's fees of not finished results, maintained by CRUD layer on every change of the results
+# and periodically reconciled with the results tables
+class PendingBalance(Base):
+    id = Column(Integer, primary_key=True, index=True, default=gen_rand_id)
+    owner_id = Column(Integer, ForeignKey("user.id"), unique=True, index=True)
+
+    cascade_pending = Column(Float, default=0.0, nullable=False)
+    sense_pending = Column(Float, default=0.0, nullable=False)
+    nft_pending = Column(Float, default=0.0, nullable=False)
+    collection_pending_count = Column(Integer, default=0, nullable=False)
+
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    reconciled_at = Column(DateTime)
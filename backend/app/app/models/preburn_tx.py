@@ -1,5 +1,5 @@
 import enum
-from sqlalchemy import Column, Integer, String, Enum, Float
+from sqlalchemy import Column, Integer, String, Enum, Float, DateTime, Index
 
 from app.db.base_class import Base
 
@@ -18,3 +18,9 @@ class PreBurnTx(Base):
     txid = Column(String)
     status = Column(Enum(PBTXStatus), default=PBTXStatus.NEW)
     result_id = Column(String)
+    # set by preburn pool validator when NEW tx is confirmed and not used by any ticket - only such are claimed
+    validated_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_preburntx_fee_status_height', 'fee', 'status', 'height'),
+    )
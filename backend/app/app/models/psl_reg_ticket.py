@@ -10,7 +10,7 @@ if TYPE_CHECKING:
 class RegTicket(Base):
     id = Column(Integer, primary_key=True, index=True, default=gen_rand_id)
     data_hash = Column(String, index=True)
-    reg_ticket_txid = Column(String, index=True)
+    reg_ticket_txid = Column(String, index=True, unique=True)
     ticket_type = Column(String, index=True)
     blocknum = Column(Integer, index=True)
     caller_pastel_id = Column(String, index=True)
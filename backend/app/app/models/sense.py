@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from .base_task import BaseTask
@@ -10,3 +10,6 @@ class Sense(BaseTask):
     open_api_group_id = Column(String)
     owner_id = Column(Integer, ForeignKey("user.id"))
     owner = relationship("User", back_populates="sense_tasks")
+
+    # keyset pagination of the owner's results
+    __table_args__ = (Index("ix_sense_owner_id_created_at_id", "owner_id", "created_at", "id"),)
@@ -0,0 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+
+from app.db.base_class import Base, gen_rand_id
+
+
+# Metadata of the uploaded file. Content is stored once per content_hash, see utils.filestorage.content_path
+class StoredFile(Base):
+    id = Column(Integer, primary_key=True, index=True, default=gen_rand_id)
+    file_id = Column(String, index=True, unique=True)
+    file_name = Column(String)
+    content_type = Column(String)
+    content_hash = Column(String, index=True)
+    size = Column(BigInteger)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -10,5 +10,6 @@ from .cascade import Cascade, CascadeCreate, CascadeInDB, CascadeUpdate
 from .sense import Sense, SenseCreate, SenseInDB, SenseUpdate
 from .nft import Nft, NftCreate, NftInDBBase, NftUpdate, NftPropertiesExternal, NftPropertiesInternal, ThumbnailCoordinate
 from .collection import Collection, CollectionCreate, CollectionInDB, CollectionUpdate
+from .gateway_request import GatewayRequestSummary
 
 from .history_log import HistoryLogCreate, HistoryLogUpdate, HistoryLogInDB
@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+from app.schemas.base_task import Status
+
+
+# Properties to return to client
+class GatewayRequestSummary(BaseModel):
+    request_id: str
+    request_status: Status
+    total_count: int
+    pending_count: int
+    success_count: int
+    failed_count: int
+    total_fee: int
+    is_terminal: bool
+    created_at: Optional[datetime] = None
+    last_updated_at: Optional[datetime] = None
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from app import crud
 from app.schemas.cascade import CascadeCreate   # , CascadeUpdate
 from app.models.cascade import Cascade
+from app.core.status import DbStatus
 from app.tests.utils.user import create_random_user
 from app.tests.utils.utils import random_lower_string, random_mime_type
 
@@ -153,3 +154,89 @@ def test_update_and_get(db: Session) -> None:
 
     crud.cascade.remove(db=db, id=created_job.id)
 
+
+
+# 7
+def test_get_multi_by_owner_keyset(db: Session) -> None:
+    request_id = random_lower_string()
+    new_job, created_job = create_cascade_task(db, request_id=request_id)
+    created_jobs = [created_job]
+    for _ in range(2):
+        created_jobs.append(crud.cascade.create_with_owner(db=db, obj_in=new_job, owner_id=created_job.owner_id))
+
+    first_page = crud.cascade.get_multi_by_owner_and_status(db=db, owner_id=created_job.owner_id,
+                                                            req_status=None, limit=2)
+    assert [job.id for job in first_page] == [job.id for job in sorted(created_jobs,
+                                                                       key=lambda j: (j.created_at, j.id))][:2]
+    last = first_page[-1]
+    second_page = crud.cascade.get_multi_by_owner_and_status(db=db, owner_id=created_job.owner_id, req_status=None,
+                                                             limit=2, after=(last.created_at, last.id))
+    assert len(second_page) == 1
+    assert second_page[0].id not in [job.id for job in first_page]
+
+    assert not crud.cascade.get_multi_by_owner_and_status(db=db, owner_id=created_job.owner_id, req_status=None,
+                                                          request_id=random_lower_string())
+
+    for job in created_jobs:
+        crud.cascade.remove(db=db, id=job.id)
+
+
+# 8
+def test_gateway_request_summary(db: Session) -> None:
+    request_id = random_lower_string()
+    new_job, created_job = create_cascade_task(db, request_id=request_id)
+    summary = crud.gateway_request.get_by_request_id_and_owner(db=db, request_id=request_id,
+                                                               owner_id=created_job.owner_id)
+    assert summary.total_count == 1
+    assert summary.pending_count == 1
+    assert summary.total_fee == new_job.wn_fee
+    assert not summary.is_terminal
+
+    crud.cascade.update(db=db, db_obj=created_job, obj_in={"process_status": DbStatus.DONE.value})
+    db.refresh(summary)
+    assert summary.pending_count == 0
+    assert summary.success_count == 1
+    assert summary.is_terminal
+
+    crud.cascade.remove(db=db, id=created_job.id)
+    db.refresh(summary)
+    assert summary.total_count == 0
+    assert summary.success_count == 0
+    crud.gateway_request.remove(db=db, id=summary.id)
+
+
+# 9
+def test_pending_balance_ledger(db: Session) -> None:
+    new_job, created_job = create_cascade_task(db)
+    ledger = crud.pending_balance.get_by_owner(db=db, owner_id=created_job.owner_id)
+    assert ledger.cascade_pending == new_job.wn_fee
+
+    crud.cascade.update(db=db, db_obj=created_job, obj_in={"process_status": DbStatus.DEAD.value})
+    db.refresh(ledger)
+    assert ledger.cascade_pending == 0
+
+    ledger.cascade_pending = 1
+    db.commit()
+    fixed = crud.pending_balance.reconcile(db=db, actual={"cascade_pending": {}})
+    assert (created_job.owner_id, "cascade_pending", 1, 0) in fixed
+    db.refresh(ledger)
+    assert ledger.cascade_pending == 0
+    crud.cascade.remove(db=db, id=created_job.id)
+
+
+# 10
+def test_update_fee_as_string(db: Session) -> None:
+    # WRONG_FEE correction sets wn_fee to the value parsed from pasteld error message
+    request_id = random_lower_string()
+    new_job, created_job = create_cascade_task(db, request_id=request_id)
+    crud.cascade.update(db=db, db_obj=created_job, obj_in={"wn_fee": "12345"})
+    assert created_job.wn_fee == 12345
+
+    summary = crud.gateway_request.get_by_request_id_and_owner(db=db, request_id=request_id,
+                                                               owner_id=created_job.owner_id)
+    assert summary.total_fee == 12345
+    ledger = crud.pending_balance.get_by_owner(db=db, owner_id=created_job.owner_id)
+    assert ledger.cascade_pending == 12345
+
+    crud.cascade.remove(db=db, id=created_job.id)
+    crud.gateway_request.remove(db=db, id=summary.id)
@@ -36,3 +36,19 @@ def test_create_cascade_job(db: Session) -> None:
     # Delete preburn_tx
     crud.preburn_tx.remove(db, id=free_burn_tx.id)
 
+
+
+def test_claim_validated(db: Session) -> None:
+    burn_txid = random_lower_string()
+    result_id = random_lower_string()
+
+    burn_tx = crud.preburn_tx.create_new(db, fee=22222, height=1000000, txid=burn_txid)
+    assert crud.preburn_tx.claim_validated(db, fee=22222, result_id=result_id) is None
+
+    crud.preburn_tx.mark_validated(db, burn_txid)
+    claimed = crud.preburn_tx.claim_validated(db, fee=22222, result_id=result_id)
+    assert claimed.txid == burn_txid
+    assert claimed.result_id == result_id
+    assert crud.preburn_tx.claim_validated(db, fee=22222, result_id=result_id) is None
+
+    crud.preburn_tx.remove(db, id=burn_tx.id)
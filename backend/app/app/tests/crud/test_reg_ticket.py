@@ -0,0 +1,32 @@
+from sqlalchemy.orm import Session
+from app import crud
+from app.tests.utils.utils import random_lower_string
+
+
+def test_create_bulk_reg_tickets(db: Session) -> None:
+    txids = [random_lower_string() for _ in range(3)]
+    rows = [dict(reg_ticket_txid=txid,
+                 data_hash=random_lower_string(),
+                 blocknum=900000000 + i,
+                 file_name="file.txt",
+                 ticket_type="cascade",
+                 caller_pastel_id=random_lower_string(),
+                 is_public=False) for i, txid in enumerate(txids)]
+
+    # Insert new
+    assert crud.reg_ticket.create_bulk(db, rows[:2]) == 2
+
+    # Already stored txids are skipped
+    assert crud.reg_ticket.create_bulk(db, rows) == 1
+    for row in rows:
+        ticket = crud.reg_ticket.get_by_reg_ticket_txid(db, txid=row["reg_ticket_txid"])
+        assert ticket.data_hash == row["data_hash"]
+        assert ticket.blocknum == row["blocknum"]
+
+    # Checkpoint is per ticket type
+    assert crud.reg_ticket.get_last_blocknum(db, ticket_types=["cascade"]) == 900000002
+
+    # Delete
+    for row in rows:
+        ticket = crud.reg_ticket.get_by_reg_ticket_txid(db, txid=row["reg_ticket_txid"])
+        crud.reg_ticket.remove(db, id=ticket.id)
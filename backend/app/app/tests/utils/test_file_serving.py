@@ -0,0 +1,38 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.common import parse_range, etag_matches
+
+
+def test_parse_range():
+    # 1 test_parse_range_bounded
+    assert parse_range("bytes=0-99", 1000) == (0, 99)
+    assert parse_range("bytes=100-", 1000) == (100, 999)
+    assert parse_range("bytes=900-5000", 1000) == (900, 999)
+
+    # 2 test_parse_range_suffix
+    assert parse_range("bytes=-100", 1000) == (900, 999)
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+
+    # 3 test_parse_range_ignored - whole file is sent
+    assert parse_range("items=0-99", 1000) is None
+    assert parse_range("bytes=0-9,20-29", 1000) is None
+    assert parse_range("bytes=10", 1000) is None
+    assert parse_range("bytes=a-b", 1000) is None
+
+    # 4 test_parse_range_not_satisfiable
+    for range_header in ("bytes=1000-", "bytes=50-10"):
+        with pytest.raises(HTTPException) as e:
+            parse_range(range_header, 1000)
+        assert e.value.status_code == 416
+        assert e.value.headers["Content-Range"] == "bytes */1000"
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"xyz", W/"abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"xyz"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import io
+import os
+from contextlib import contextmanager
+
+import pytest
+from fastapi import UploadFile
+
+from app.core.config import settings
+from app.utils import filestorage
+from app.utils.filestorage import LocalFile, content_path
+
+
+@pytest.fixture
+def stored_files(tmp_path, monkeypatch) -> dict:
+    # StoredFile rows by file_id, instead of the database
+    saved = {}
+
+    @contextmanager
+    def db_context():
+        yield None
+
+    def save(session, *, file_id, **values):
+        saved[file_id] = values
+
+    monkeypatch.setattr(settings, "FILE_STORAGE", str(tmp_path))
+    monkeypatch.setattr(filestorage, "db_context", db_context)
+    monkeypatch.setattr(filestorage.crud.stored_file, "save", save)
+    return saved
+
+
+def save_file(file_id: str, data: bytes) -> LocalFile:
+    lf = LocalFile("image.png", "image/png", file_id)
+    assert asyncio.run(lf.save(UploadFile(file=io.BytesIO(data)))) is None
+    return lf
+
+
+def test_local_file_save(stored_files: dict):
+    data = os.urandom(3 * 1024 * 1024)
+    content_hash = hashlib.sha3_256(data).hexdigest()
+
+    lf = save_file("file1", data)
+    assert lf.content_hash == content_hash
+    assert lf.size == len(data)
+    assert lf.path == content_path(content_hash)
+    assert lf.path == f"{settings.FILE_STORAGE}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+    with lf.read() as f:
+        assert f.read() == data
+    assert stored_files["file1"] == {"file_name": "image.png", "content_type": "image/png",
+                                     "content_hash": content_hash, "size": len(data)}
+    # temporary upload file is removed
+    assert os.listdir(f"{settings.FILE_STORAGE}/tmp") == []
+
+
+def test_local_file_save_dedupe(stored_files: dict):
+    data = b"the same content"
+    first = save_file("file1", data)
+    inode = os.stat(first.path).st_ino
+
+    second = save_file("file2", data)
+    assert second.path == first.path
+    # content is kept once, the existing copy is not replaced
+    assert os.stat(second.path).st_ino == inode
+    assert stored_files["file1"]["content_hash"] == stored_files["file2"]["content_hash"]
+    assert os.listdir(f"{settings.FILE_STORAGE}/tmp") == []
+
+    other = save_file("file3", b"other content")
+    assert other.path != first.path
+    with first.read() as f:
+        assert f.read() == data
@@ -0,0 +1,96 @@
+import os
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.utils.filestorage import ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch) -> ResultCache:
+    # eviction is called explicitly in the tests
+    monkeypatch.setattr(settings, "RESULT_CACHE_MAX_BYTES", 0)
+    monkeypatch.setattr(settings, "RESULT_CACHE_EVICT_TO_RATIO", 0.9)
+    monkeypatch.setattr(settings, "RESULT_CACHE_EVICT_MIN_AGE", 60)
+    result_cache = ResultCache(str(tmp_path / "results"))
+    for name in ("a", "b", "c"):
+        result_cache.put(name, name.encode() * 100)
+    return result_cache
+
+
+def set_access(cache: ResultCache, name: str, last_access: float, hits: int = 0):
+    with cache._index_connection() as conn:
+        conn.execute("UPDATE entries SET last_access = ?, hits = ? WHERE name = ?", (last_access, hits, name))
+
+
+def test_index_totals(cache: ResultCache):
+    assert cache.total_size() == 300
+
+    cache.put("a", b"a" * 150, overwrite=True)
+    assert cache.total_size() == 350
+
+    # put without overwrite keeps the file and doesn't count it twice
+    cache.put("b", b"b" * 10)
+    assert cache.total_size() == 350
+    assert cache.get("b") == b"b" * 100
+
+    # file removed by other worker is dropped from the index on access
+    os.remove(cache.path("c"))
+    cache._forget("c")
+    assert cache.get_path("c") is None
+    assert cache.total_size() == 250
+
+
+def test_evict_lru(cache: ResultCache, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_CACHE_EVICTION_POLICY", "lru")
+    old = time.time() - 3600
+    set_access(cache, "a", old + 1, hits=5)
+    set_access(cache, "b", old + 3)
+    set_access(cache, "c", old + 2)
+
+    # 300 > 250, evicted down to 225
+    assert cache.evict(250) == ["a"]
+    assert not os.path.exists(cache.path("a"))
+    assert cache.get_path("a") is None
+    assert cache.total_size() == 200
+
+    assert cache.evict(250) == []
+
+
+def test_evict_lfu(cache: ResultCache, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_CACHE_EVICTION_POLICY", "lfu")
+    old = time.time() - 3600
+    set_access(cache, "a", old + 1, hits=5)
+    set_access(cache, "b", old + 3, hits=0)
+    set_access(cache, "c", old + 2, hits=1)
+
+    assert cache.evict(250) == ["b"]
+    assert cache.total_size() == 200
+
+
+def test_evict_min_age(cache: ResultCache, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_CACHE_EVICTION_POLICY", "lru")
+    old = time.time() - 3600
+    # "a" was accessed just now - it may be sent right now
+    set_access(cache, "a", time.time())
+    set_access(cache, "b", old + 3)
+    set_access(cache, "c", old + 2)
+
+    assert cache.evict(250) == ["c"]
+    assert os.path.exists(cache.path("a"))
+
+    # nothing old enough is left, the cache stays over the limit
+    assert cache.evict(10) == ["b"]
+    assert cache.total_size() == 100
+
+
+def test_rebuild_index(cache: ResultCache):
+    with cache._index_connection() as conn:
+        conn.execute("DELETE FROM entries WHERE name = 'a'")
+    os.remove(cache.path("b"))
+    assert cache.total_size() == 200
+
+    assert cache.rebuild_index() == (1, 1)
+    assert cache.total_size() == 200
+    assert cache.get_path("a") == cache.path("a")
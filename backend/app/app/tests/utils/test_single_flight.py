@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.utils import single_flight as sf
+
+
+def no_redis(*args, **kwargs):
+    raise ConnectionError("no redis in tests")
+
+
+@pytest.fixture(autouse=True)
+def without_redis(monkeypatch):
+    # without Redis the fetch is coalesced only inside the process
+    monkeypatch.setattr(sf.aioredis, "StrictRedis", no_redis)
+
+
+def test_single_flight_coalesces():
+    calls = 0
+
+    async def run():
+        release = asyncio.Event()
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return b"data"
+
+        callers = [asyncio.create_task(sf.single_flight("key", fetch)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*callers)
+        assert not sf._in_flight
+        return results
+
+    assert asyncio.run(run()) == [b"data"] * 5
+    assert calls == 1
+
+
+def test_single_flight_caller_cancelled():
+    async def run():
+        release = asyncio.Event()
+        fetch_cancelled = False
+
+        async def fetch():
+            nonlocal fetch_cancelled
+            try:
+                await release.wait()
+            except asyncio.CancelledError:
+                fetch_cancelled = True
+                raise
+            return b"data"
+
+        first = asyncio.create_task(sf.single_flight("key", fetch))
+        second = asyncio.create_task(sf.single_flight("key", fetch))
+        await asyncio.sleep(0.01)
+        # client of the first caller disconnected - the fetch goes on for the second one
+        first.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await second == b"data"
+        assert first.cancelled()
+        assert not fetch_cancelled
+
+    asyncio.run(run())
+
+
+def test_single_flight_error():
+    calls = 0
+
+    async def run():
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise FileNotFoundError("not found")
+
+        results = await asyncio.gather(*[sf.single_flight("key", fetch) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, FileNotFoundError) for result in results)
+        assert not sf._in_flight
+
+        # failed fetch is not remembered, next call fetches again
+        with pytest.raises(FileNotFoundError):
+            await sf.single_flight("key", fetch)
+
+    asyncio.run(run())
+    assert calls == 2
@@ -0,0 +1,56 @@
+import asyncio
+import io
+import os
+import zipfile
+from pathlib import Path
+
+from app.utils import zip_stream as zs
+
+
+async def collect(entries) -> bytes:
+    return b"".join([chunk async for chunk in zs.zip_stream(entries)])
+
+
+def test_zip_stream(tmp_path, monkeypatch):
+    # small chunks, so every entry is read and compressed in several pieces
+    monkeypatch.setattr(zs, "ZIP_STREAM_CHUNK_SIZE", 1000)
+    from_disk = os.urandom(5000)
+    (tmp_path / "path.bin").write_bytes(from_disk)
+    (tmp_path / "opened.bin").write_bytes(from_disk[::-1])
+    opened = open(tmp_path / "opened.bin", 'rb')
+
+    async def chunks():
+        for i in range(5):
+            yield bytes([i]) * 1000
+
+    async def entries():
+        yield "bytes.bin", b"x" * 3000
+        yield "text.json", '{"a": "ü"}'
+        yield "path.bin", Path(tmp_path / "path.bin")
+        yield "opened.bin", opened
+        yield "chunks.bin", chunks()
+        yield "empty.bin", b""
+
+    data = asyncio.run(collect(entries()))
+    assert opened.closed
+
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.testzip() is None
+        assert zip_file.namelist() == ["bytes.bin", "text.json", "path.bin", "opened.bin", "chunks.bin",
+                                       "empty.bin"]
+        assert zip_file.read("bytes.bin") == b"x" * 3000
+        assert zip_file.read("text.json") == '{"a": "ü"}'.encode()
+        assert zip_file.read("path.bin") == from_disk
+        assert zip_file.read("opened.bin") == from_disk[::-1]
+        assert zip_file.read("chunks.bin") == b"".join(bytes([i]) * 1000 for i in range(5))
+        assert zip_file.read("empty.bin") == b""
+
+
+def test_zip_stream_no_entries():
+    async def entries():
+        return
+        yield
+
+    data = asyncio.run(collect(entries()))
+    with zipfile.ZipFile(io.BytesIO(data)) as zip_file:
+        assert zip_file.namelist() == []
@@ -11,11 +11,18 @@ def get_total_balance_by_userid(db: Session, *, user_id: int) -> Dict:
 
 
 def get_total_balance(db: Session, *, user: models.User) -> Dict:
+    return make_total_balance(user, crud.pending_balance.get_by_owner(db, owner_id=user.id))
+
+
+def make_total_balance(user: models.User, pending_balance: models.PendingBalance | None) -> Dict:
+    """
+    pending_balance is the user's row of the ledger, None if the user never had results
+    """
     current_balance = user.balance if user.balance else 0.0
-    cascade_pending = crud.cascade.get_pending_fee_sum(db, owner_id=user.id)
-    sense_pending = crud.sense.get_pending_fee_sum(db, owner_id=user.id)
-    nft_pending = crud.nft.get_pending_fee_sum(db, owner_id=user.id)
-    collection_pending = (crud.collection.get_number_of_pending(db, owner_id=user.id)
+    cascade_pending = pending_balance.cascade_pending if pending_balance else 0.0
+    sense_pending = pending_balance.sense_pending if pending_balance else 0.0
+    nft_pending = pending_balance.nft_pending if pending_balance else 0.0
+    collection_pending = ((pending_balance.collection_pending_count if pending_balance else 0)
                           * settings.TICKET_PRICE_COLLECTION_REG)
 
     total_pending = cascade_pending + sense_pending + nft_pending + collection_pending
@@ -0,0 +1,66 @@
+import json
+import logging
+import threading
+
+from app.celery_tasks.task_lock import rds
+from app.core.config import settings
+import app.utils.pasteld as psl
+
+logger = logging.getLogger(__name__)
+
+# Action fees ("storagefee getactionfees <size>") only change with the chain state, so the whole table
+# for sizes 1..MAX_SIZE_FOR_PREBURN is requested in one batch and cached by block height:
+# in-process for the last height, then Redis (shared by all Celery workers)
+_local_schedule = {}
+_local_schedule_lock = threading.Lock()
+
+
+def _cache_key(height: int) -> str:
+    return f"psl_fee_schedule:{height}"
+
+
+def _parse_fee(size, fee) -> tuple[float, float] | None:
+    if not fee or not isinstance(fee, dict) or 'cascadefee' not in fee or 'sensefee' not in fee:
+        logger.error(f"Error while getting fee for size {size}: {fee}")
+        return None
+    return float(fee['cascadefee']), float(fee['sensefee'])
+
+
+def get_fee_schedule(height: int) -> dict[int, tuple[float, float]]:
+    """
+    Returns size (in MB) -> (cascade fee, sense fee) for sizes 1..MAX_SIZE_FOR_PREBURN at the block height.
+    Sizes pasteld failed to return are missing; such schedule is not cached
+    """
+    with _local_schedule_lock:
+        schedule = _local_schedule.get(height)
+    if schedule is not None:
+        return schedule
+    try:
+        value = rds.get(_cache_key(height))
+        if value is not None:
+            schedule = {int(size): tuple(fees) for size, fees in json.loads(value).items()}
+    except Exception as e:
+        logger.warning(f"Can't read fee schedule for height {height} from Redis: {e}")
+    if schedule is None:
+        schedule = _request_fee_schedule()
+        if len(schedule) < settings.MAX_SIZE_FOR_PREBURN:
+            return schedule
+        try:
+            rds.set(_cache_key(height), json.dumps(schedule), ex=settings.FEE_SCHEDULE_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Can't store fee schedule for height {height} in Redis: {e}")
+    with _local_schedule_lock:
+        _local_schedule.clear()
+        _local_schedule[height] = schedule
+    return schedule
+
+
+def _request_fee_schedule() -> dict[int, tuple[float, float]]:
+    sizes = range(1, settings.MAX_SIZE_FOR_PREBURN+1)
+    responses = psl.call_batch([("storagefee", ["getactionfees", size]) for size in sizes], True)  # won't throw
+    schedule = {}
+    for size, response in zip(sizes, responses):
+        fees = _parse_fee(size, response)
+        if fees:
+            schedule[size] = fees
+    return schedule
@@ -1,101 +1,435 @@
-import json
+import asyncio
+import hashlib
 import logging
 import os
-import pathlib
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Awaitable, Callable
 import aiofiles
 from datetime import datetime
 
+from cachetools import LRUCache
+
+from app import crud
 from app.celery_tasks.pastel_tasks import PastelAPIException
 from app.core.config import settings
-from app.utils.ipfs_tools import read_file_from_ipfs, store_file_to_ipfs
+from app.db.session import db_context
+from app.utils.ipfs_tools import read_file_from_ipfs, store_file_to_ipfs, store_stream_to_ipfs
 from app.utils import walletnode as wn
+from app.utils.single_flight import single_flight
 
 logger = logging.getLogger(__name__)
 
 
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+IPFS_FEED_QUEUE_SIZE = 8
+
+
+def shard_path(directory: str, name: str, key: str) -> str:
+    """
+    directory/ab/cd/name, where abcd are the first characters of key - no directory has too many entries
+    """
+    return f"{directory}/{key[:2]}/{key[2:4]}/{name}"
+
+
+def content_path(content_hash: str) -> str:
+    return shard_path(settings.FILE_STORAGE, content_hash, content_hash)
+
+
+class _IPFSFeed:
+    """
+    Passes chunks to IPFS add running concurrently with the caller. If the add fails,
+    the rest of chunks is dropped and finish() returns None
+    """
+    def __init__(self, file_name: str):
+        self._queue = asyncio.Queue(maxsize=IPFS_FEED_QUEUE_SIZE)
+        self._task = asyncio.create_task(store_stream_to_ipfs(self._chunks(), file_name))
+
+    async def _chunks(self):
+        while (chunk := await self._queue.get()) is not None:
+            yield chunk
+
+    async def put(self, chunk: bytes | None):
+        if self._task.done():
+            return
+        put = asyncio.ensure_future(self._queue.put(chunk))
+        await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+
+    async def finish(self) -> str | None:
+        await self.put(None)
+        return await self._task
+
+    def cancel(self):
+        self._task.cancel()
+
+
 class LocalFile:
-    def __init__(self, file_name, content_type, file_id: str):
-        if not os.path.exists(settings.FILE_STORAGE):
-            os.makedirs(settings.FILE_STORAGE)
+    """
+    Uploaded file. Content is stored once per SHA3-256 hash in sharded FILE_STORAGE/ab/cd/<hash>,
+    name and type are kept in StoredFile table by file_id (result_id or file_id of the two-step NFT upload)
+    """
+    def __init__(self, file_name, content_type, file_id: str, content_hash: str = None, size: int = None):
         self.name = file_name
         self.type = content_type
-        file_extension = pathlib.Path(file_name).suffix
-        self.path = f'{settings.FILE_STORAGE}/{file_id}{file_extension}'
-        self.meta_path = f'{settings.FILE_STORAGE}/{file_id}.meta.json'
-
-    async def save(self, in_data):
-        async with aiofiles.open(self.path, 'wb') as out_file:
-            while content := await in_data.read():
-                await out_file.write(content)
-        # Save the metadata
-        meta = {"name": self.name, "type": self.type}
-        with open(self.meta_path, 'w') as f:
-            json.dump(meta, f)
+        self.file_id = file_id
+        self.content_hash = content_hash
+        self.size = size
+        self.path = content_path(content_hash) if content_hash else None
+
+    async def save(self, in_data, add_to_ipfs: bool = False) -> str | None:
+        """
+        Reads in_data once: computes SHA3-256 and size, writes it to the storage and, if add_to_ipfs,
+        sends the same chunks to IPFS add at the same time. Returns IPFS CID if the file was added
+        """
+        tmp_dir = f'{settings.FILE_STORAGE}/tmp'
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = f'{tmp_dir}/{self.file_id}.{uuid.uuid4().hex}'
+        sha3_256_hash = hashlib.sha3_256()
+        size = 0
+        ipfs_feed = _IPFSFeed(self.name) if add_to_ipfs else None
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as out_file:
+                while content := await in_data.read(UPLOAD_CHUNK_SIZE):
+                    sha3_256_hash.update(content)
+                    size += len(content)
+                    if ipfs_feed:
+                        await ipfs_feed.put(content)
+                    await out_file.write(content)
+            self.content_hash = sha3_256_hash.hexdigest()
+            self.size = size
+            self.path = content_path(self.content_hash)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            # if the same content was already uploaded, one copy is kept
+            if not os.path.exists(self.path):
+                os.replace(tmp_path, self.path)
+            with db_context() as session:
+                crud.stored_file.save(session, file_id=self.file_id, file_name=self.name, content_type=self.type,
+                                      content_hash=self.content_hash, size=self.size)
+        except BaseException:
+            if ipfs_feed:
+                ipfs_feed.cancel()
+            raise
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return await ipfs_feed.finish() if ipfs_feed else None
+
+    def discard(self):
+        """
+        Forgets the file that was rejected after saving. Content is left - the same content may be
+        uploaded at the same time under other file_id
+        """
+        with db_context() as session:
+            stored = crud.stored_file.get_by_file_id(session, file_id=self.file_id)
+            if stored:
+                crud.stored_file.remove(session, id=stored.id)
 
     def read(self):
         return open(self.path, 'rb')
 
     @staticmethod
     def load(file_id):
-        path = f'{settings.FILE_STORAGE}/{file_id}'
-        meta_path = path + '.meta.json'
-        if not os.path.exists(meta_path):
-            raise FileNotFoundError("No metadata file found for given file_id")
+        with db_context() as session:
+            stored = crud.stored_file.get_by_file_id(session, file_id=file_id)
+        if not stored:
+            raise FileNotFoundError("No metadata found for given file_id")
+        return LocalFile(stored.file_name, stored.content_type, file_id, stored.content_hash, stored.size)
+
+
+_INDEX_SCHEMA = """
+PRAGMA journal_mode=WAL;
+CREATE TABLE IF NOT EXISTS entries (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS entries_hits_last_access ON entries (hits, last_access);
+CREATE TABLE IF NOT EXISTS stats (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+INSERT OR IGNORE INTO stats (id, total) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+    BEGIN UPDATE stats SET total = total + NEW.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+    BEGIN UPDATE stats SET total = total - OLD.size; END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries
+    BEGIN UPDATE stats SET total = total - OLD.size + NEW.size; END;
+"""
+
+
+class ResultCache:
+    """
+    Size-bounded cache of result files (Cascade files, Sense and NFT dd data) in FILE_STORAGE/results.
+    Small files are also kept in memory. Size, last access and hit count of every file on disk are kept
+    in SQLite index in the same directory, shared by all workers of the host. When the total size goes over
+    RESULT_CACHE_MAX_BYTES, least recently (lru) or least frequently (lfu) used files are removed -
+    they are downloaded again from WalletNode or IPFS when requested
+    """
+    INDEX_FILE_NAME = ".index.sqlite3"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._memory = LRUCache(maxsize=settings.RESULT_CACHE_MEMORY_BYTES, getsizeof=len)
+        self._memory_lock = threading.Lock()
+        self._index_ready = False
+        self._local = threading.local()
+
+    def path(self, name: str) -> str:
+        return shard_path(self.directory, name, hashlib.sha1(name.encode()).hexdigest())
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Index connection of the current thread, opened once and reused. SQLite connection can't be shared
+        by threads, nor survive fork - so it is kept per thread and reopened in a forked worker
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        if not self._index_ready:
+            os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(f"{self.directory}/{self.INDEX_FILE_NAME}", timeout=30, isolation_level=None)
+        if not self._index_ready:
+            conn.executescript(_INDEX_SCHEMA)
+            self._index_ready = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
 
-        with open(meta_path, 'r') as f:
-            meta = json.load(f)
+    @contextmanager
+    def _index_connection(self):
+        conn = self._connect()
+        try:
+            yield conn
+        except sqlite3.Error:
+            # broken connection is not reused
+            self._local.conn = None
+            conn.close()
+            raise
 
-        return LocalFile(meta["name"], meta["type"], file_id)
+    def _index(self, conn, name: str, size: int, hit: bool):
+        conn.execute("INSERT INTO entries (name, size, last_access, hits) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT (name) DO UPDATE SET size = excluded.size, last_access = excluded.last_access, "
+                     "hits = hits + excluded.hits",
+                     (name, size, time.time(), 1 if hit else 0))
+
+    def _remember(self, name: str, data: bytes):
+        if len(data) <= min(settings.RESULT_CACHE_MEMORY_MAX_FILE_SIZE, self._memory.maxsize):
+            with self._memory_lock:
+                self._memory[name] = data
+
+    def _forget(self, name: str):
+        with self._memory_lock:
+            self._memory.pop(name, None)
+
+    def get_path(self, name: str) -> str | None:
+        """
+        Path of the cached file, or None if it is not cached. Counts as a hit
+        """
+        path = self.path(name)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._index_connection() as conn:
+            if not size:
+                # removed by other worker or never cached
+                conn.execute("DELETE FROM entries WHERE name = ?", (name,))
+                self._forget(name)
+                return None
+            self._index(conn, name, size, hit=True)
+        return path
+
+    def get(self, name: str) -> bytes | None:
+        with self._memory_lock:
+            data = self._memory.get(name)
+        if data is not None:
+            with self._index_connection() as conn:
+                self._index(conn, name, len(data), hit=True)
+            return data
+        path = self.get_path(name)
+        if not path:
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        self._remember(name, data)
+        return data
+
+    def put(self, name: str, data: bytes, overwrite: bool = False) -> str:
+        path = self.path(name)
+        with self._index_connection() as conn:
+            if not overwrite and os.path.exists(path):
+                self._index(conn, name, os.path.getsize(path), hit=False)
+                return path
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # other workers never see partially written file
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._index(conn, name, len(data), hit=False)
+        self._remember(name, data)
+        if settings.RESULT_CACHE_MAX_BYTES > 0:
+            self.evict(settings.RESULT_CACHE_MAX_BYTES)
+        return path
+
+    def total_size(self) -> int:
+        with self._index_connection() as conn:
+            return conn.execute("SELECT total FROM stats").fetchone()[0]
+
+    def evict(self, max_bytes: int) -> list[str]:
+        """
+        If the cache is bigger than max_bytes, removes files till it is RESULT_CACHE_EVICT_TO_RATIO of max_bytes.
+        Files accessed in the last RESULT_CACHE_EVICT_MIN_AGE seconds are never removed - they may be sent right now
+        """
+        order = "hits, last_access" if settings.RESULT_CACHE_EVICTION_POLICY == "lfu" else "last_access"
+        evicted = []
+        with self._index_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = conn.execute("SELECT total FROM stats").fetchone()[0]
+                if total > max_bytes:
+                    target = max_bytes * settings.RESULT_CACHE_EVICT_TO_RATIO
+                    rows = conn.execute(f"SELECT name, size FROM entries WHERE last_access < ? ORDER BY {order}",
+                                        (time.time() - settings.RESULT_CACHE_EVICT_MIN_AGE,))
+                    for name, size in rows:
+                        if total <= target:
+                            break
+                        evicted.append(name)
+                        total -= size
+                    rows.close()
+                    conn.executemany("DELETE FROM entries WHERE name = ?", [(name,) for name in evicted])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        for name in evicted:
+            self._forget(name)
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            logger.info(f"{len(evicted)} files evicted from the result cache, {total} bytes left")
+        return evicted
+
+    def rebuild_index(self) -> tuple[int, int]:
+        """
+        Adds files that are not in the index (cached before it existed) and removes entries of missing files.
+        Returns (added, removed)
+        """
+        with self._index_connection() as conn:
+            indexed = {name for name, in conn.execute("SELECT name FROM entries")}
+            on_disk = {}
+            for root, _, files in os.walk(self.directory):
+                if root == self.directory:
+                    # only the index lives at the top, files are in the shards
+                    continue
+                for name in files:
+                    if not name.endswith(".tmp"):
+                        stat_result = os.stat(os.path.join(root, name))
+                        on_disk[name] = (stat_result.st_size, stat_result.st_atime)
+            added = [(name, size, atime) for name, (size, atime) in on_disk.items() if name not in indexed]
+            removed = [(name,) for name in indexed if name not in on_disk]
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("INSERT OR IGNORE INTO entries (name, size, last_access, hits) VALUES (?, ?, ?, 0)",
+                             added)
+            conn.executemany("DELETE FROM entries WHERE name = ?", removed)
+            conn.execute("COMMIT")
+        return len(added), len(removed)
+
+
+result_cache = ResultCache(f"{settings.FILE_STORAGE}/{settings.FILE_STORAGE_FOR_RESULTS_SUFFIX}")
 
 
 async def store_file_into_local_cache(*, reg_ticket_txid, file_bytes,
                                       overwrite: bool = False, extra_suffix: str = "") -> str:
-    cached_result_file = \
-        f"{settings.FILE_STORAGE}/{settings.FILE_STORAGE_FOR_RESULTS_SUFFIX}/{reg_ticket_txid}{extra_suffix}"
+    name = f"{reg_ticket_txid}{extra_suffix}"
     try:
-        if not os.path.exists(f"{settings.FILE_STORAGE}/{settings.FILE_STORAGE_FOR_RESULTS_SUFFIX}"):
-            os.makedirs(f"{settings.FILE_STORAGE}/{settings.FILE_STORAGE_FOR_RESULTS_SUFFIX}")
+        return await asyncio.to_thread(result_cache.put, name, file_bytes, overwrite)
+    except Exception as e:
+        logger.error(f"File not saved in the local storage - {e}")
+    return result_cache.path(name)
 
-        if not overwrite and os.path.exists(cached_result_file):
-            return cached_result_file
 
-        with open(cached_result_file, 'wb') as f:
-            f.write(file_bytes)
+async def get_cached_result_path(*, reg_ticket_txid, extra_suffix: str = "") -> str | None:
+    try:
+        # index may be locked by eviction in other worker - don't block the event loop
+        return await asyncio.to_thread(result_cache.get_path, f"{reg_ticket_txid}{extra_suffix}")
     except Exception as e:
-        logger.error(f"File not saved in the local storage - {e}")
-    return cached_result_file
+        logger.error(f"Error while searching file in the local storage - {e}")
+    return None
 
 
 async def search_file_in_local_cache(*, reg_ticket_txid, extra_suffix: str = "") -> bytes:
-    cached_result_file = \
-        f"{settings.FILE_STORAGE}/{settings.FILE_STORAGE_FOR_RESULTS_SUFFIX}/{reg_ticket_txid}{extra_suffix}"
     try:
-        with open(cached_result_file, 'rb') as f:
-            return f.read()
+        file_bytes = await asyncio.to_thread(result_cache.get, f"{reg_ticket_txid}{extra_suffix}")
+        if file_bytes is None:
+            logger.info(f"File {reg_ticket_txid}{extra_suffix} not found in the local storage")
+        return file_bytes
     except Exception as e:
         logger.error(f"File not found in the local storage - {e}")
 
 
+async def download_into_local_cache(key: str, *, reg_ticket_txid, download: Callable[[], Awaitable[bytes | None]],
+                                    extra_suffix: str = "") -> bytes | None:
+    """
+    Downloads result file and puts it into the local cache; concurrent callers of the same key share one download.
+    key must tell apart everything download depends on (source, PastelID...), and download must not touch DB session
+    """
+    async def fetch() -> bytes | None:
+        file_bytes = await search_file_in_local_cache(reg_ticket_txid=reg_ticket_txid, extra_suffix=extra_suffix)
+        if file_bytes:
+            return file_bytes
+        file_bytes = await download()
+        if file_bytes:
+            await store_file_into_local_cache(reg_ticket_txid=reg_ticket_txid, file_bytes=file_bytes,
+                                              extra_suffix=extra_suffix)
+        return file_bytes
+
+    return await single_flight(f"{key}:{reg_ticket_txid}{extra_suffix}", fetch)
+
+
+async def store_cached_file_to_ipfs(*, reg_ticket_txid, extra_suffix: str = "") -> str | None:
+    """
+    Adds result file from the local cache to IPFS, once for all concurrent callers. Returns cid
+    """
+    async def add() -> str | None:
+        cached_file = await get_cached_result_path(reg_ticket_txid=reg_ticket_txid, extra_suffix=extra_suffix)
+        return await store_file_to_ipfs(cached_file) if cached_file else None
+
+    return await single_flight(f"ipfs_add:{reg_ticket_txid}{extra_suffix}", add)
+
+
 async def search_processed_file(*, db, task_from_db, update_task_in_db_func,
                                 task_done, service: wn.WalletNodeService) -> bytes:
-    file_bytes = await search_file_in_local_cache(reg_ticket_txid=task_from_db.reg_ticket_txid)
+    reg_ticket_txid = task_from_db.reg_ticket_txid
+    pastel_id = task_from_db.pastel_id
+    ipfs_link = task_from_db.stored_file_ipfs_link
+
+    file_bytes = await search_file_in_local_cache(reg_ticket_txid=reg_ticket_txid)
 
     if not file_bytes and task_done:
-        file_bytes = await wn.get_file_from_pastel(reg_ticket_txid=task_from_db.reg_ticket_txid,
-                                                   pastel_id=task_from_db.pastel_id,
-                                                   wn_service=service)
+        file_bytes = await download_into_local_cache(
+            f"wn_file:{service.name}:{pastel_id}", reg_ticket_txid=reg_ticket_txid,
+            download=lambda: wn.get_file_from_pastel(reg_ticket_txid=reg_ticket_txid, pastel_id=pastel_id,
+                                                     wn_service=service))
 
-    if not file_bytes and task_from_db.stored_file_ipfs_link:
-        file_bytes = await read_file_from_ipfs(task_from_db.stored_file_ipfs_link)
+    if not file_bytes and ipfs_link:
+        file_bytes = await download_into_local_cache(
+            f"ipfs_file:{ipfs_link}", reg_ticket_txid=reg_ticket_txid,
+            download=lambda: read_file_from_ipfs(ipfs_link))
 
     if not file_bytes:
         raise PastelAPIException(f"Processed file is not found")
 
-    # cache file in local storage and IPFS
-    cached_result_file = await store_file_into_local_cache(reg_ticket_txid=task_from_db.reg_ticket_txid,
-                                                           file_bytes=file_bytes)
-    if cached_result_file and not task_from_db.stored_file_ipfs_link:
-        stored_file_ipfs_link = await store_file_to_ipfs(cached_result_file)
+    # file is in local cache now, keep its copy in IPFS too
+    if not ipfs_link:
+        stored_file_ipfs_link = await store_cached_file_to_ipfs(reg_ticket_txid=reg_ticket_txid)
         if stored_file_ipfs_link:
             upd = {"stored_file_ipfs_link": stored_file_ipfs_link, "updated_at": datetime.utcnow()}
             update_task_in_db_func(db, db_obj=task_from_db, obj_in=upd)
@@ -103,24 +437,28 @@ async def search_processed_file(*, db, task_from_db, update_task_in_db_func,
 
 
 async def search_nft_dd_result(*, db, task_from_db, update_task_in_db_func) -> bytes:
-    dd_bytes = await search_file_in_local_cache(reg_ticket_txid=task_from_db.reg_ticket_txid, extra_suffix=".dd")
+    reg_ticket_txid = task_from_db.reg_ticket_txid
+    pastel_id = task_from_db.pastel_id
+    ipfs_link = task_from_db.nft_dd_file_ipfs_link
+
+    dd_bytes = await search_file_in_local_cache(reg_ticket_txid=reg_ticket_txid, extra_suffix=".dd")
 
     if not dd_bytes:
-        dd_bytes = await wn.get_nft_dd_result_from_pastel(reg_ticket_txid=task_from_db.reg_ticket_txid,
-                                                          pastel_id=task_from_db.pastel_id)
+        dd_bytes = await download_into_local_cache(
+            f"wn_dd:{pastel_id}", reg_ticket_txid=reg_ticket_txid, extra_suffix=".dd",
+            download=lambda: wn.get_nft_dd_result_from_pastel(reg_ticket_txid=reg_ticket_txid, pastel_id=pastel_id))
 
-    if not dd_bytes and task_from_db.nft_dd_file_ipfs_link:
-        dd_bytes = await read_file_from_ipfs(task_from_db.nft_dd_file_ipfs_link)
+    if not dd_bytes and ipfs_link:
+        dd_bytes = await download_into_local_cache(
+            f"ipfs_file:{ipfs_link}", reg_ticket_txid=reg_ticket_txid, extra_suffix=".dd",
+            download=lambda: read_file_from_ipfs(ipfs_link))
 
     if not dd_bytes:
         raise PastelAPIException(f"Dupe detection data is not found")
 
-    # cache file in local storage and IPFS
-    cached_dd_file = await store_file_into_local_cache(reg_ticket_txid=task_from_db.reg_ticket_txid,
-                                                       file_bytes=dd_bytes,
-                                                       extra_suffix=".dd")
-    if cached_dd_file and not task_from_db.nft_dd_file_ipfs_link:
-        nft_dd_file_ipfs_link = await store_file_to_ipfs(cached_dd_file)
+    # file is in local cache now, keep its copy in IPFS too
+    if not ipfs_link:
+        nft_dd_file_ipfs_link = await store_cached_file_to_ipfs(reg_ticket_txid=reg_ticket_txid, extra_suffix=".dd")
         if nft_dd_file_ipfs_link:
             upd = {"nft_dd_file_ipfs_link": nft_dd_file_ipfs_link, "updated_at": datetime.utcnow()}
             update_task_in_db_func(db, db_obj=task_from_db, obj_in=upd)
@@ -1,7 +1,10 @@
+import asyncio
 import logging
+import weakref
 from pathlib import Path
-from io import BytesIO
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Iterable
 import tarfile
+import tempfile
 import requests
 import aiohttp
 import os
@@ -12,27 +15,84 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+def _ipfs_connector() -> aiohttp.TCPConnector:
+    return aiohttp.TCPConnector(limit=settings.IPFS_MAX_CONNECTIONS,
+                                keepalive_timeout=settings.IPFS_KEEPALIVE_EXPIRY)
+
+
+def _ipfs_timeout() -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(total=settings.IPFS_TIMEOUT, connect=settings.IPFS_CONNECT_TIMEOUT)
+
+
 class IPFSClient:
-    def __init__(self, base_url="http://127.0.0.1:5001/api/v0"):
+    """
+    Client of IPFS node HTTP API. Used as `async with IPFSClient(url)` it opens and closes its own session;
+    get_ipfs_client() returns the shared one, with keep-alive connection pool, that is not closed after use
+    """
+    def __init__(self, base_url="http://127.0.0.1:5001/api/v0", session: aiohttp.ClientSession = None):
         self.base_url = base_url
-        self.session = None  # Initialize session as None
+        self.session = session
+        self._own_session = session is None
 
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=_ipfs_connector(), timeout=_ipfs_timeout())
         return self
 
     async def __aexit__(self, exc_type, exc, traceback):
-        await self.session.close()
-
-    async def add(self, file_path):
+        if self._own_session:
+            await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def add(self, file: str | Path | BinaryIO, file_name: str = None):
+        """
+        Adds file by path or from opened binary file handle. File is streamed by chunks, not read into memory
+        """
+        if isinstance(file, (str, Path)):
+            with open(file, 'rb') as f:
+                return await self.add(f, file_name or Path(file).name)
         url = f"{self.base_url}/add"
+        data = aiohttp.FormData()
+        data.add_field('file', file, filename=file_name or Path(getattr(file, 'name', 'file')).name,
+                       content_type='application/octet-stream')
         try:
-            async with self.session.post(url, data={'file': open(file_path, 'rb')}) as response:
+            async with self.session.post(url, data=data) as response:
                 return await response.json()
         except aiohttp.ClientError as e:
             logger.error(f'Error adding file to IPFS: {e}')
             raise e
 
+    async def add_many(self, files: Iterable[str | Path], concurrency: int = None) -> list:
+        """
+        Adds files in parallel, at most concurrency at once. Returns add result or exception for every file
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.IPFS_ADD_MANY_CONCURRENCY)
+
+        async def add_one(file):
+            async with semaphore:
+                return await self.add(file)
+
+        return await asyncio.gather(*[add_one(file) for file in files], return_exceptions=True)
+
+    async def add_stream(self, chunks: AsyncIterable[bytes], file_name: str):
+        """
+        Adds file produced by chunks, without knowing its size in advance (chunked transfer)
+        """
+        url = f"{self.base_url}/add"
+        with aiohttp.MultipartWriter('form-data') as writer:
+            part = writer.append(chunks)
+            part.set_content_disposition('form-data', name='file', filename=file_name)
+            try:
+                async with self.session.post(url, data=writer) as response:
+                    return await response.json()
+            except aiohttp.ClientError as e:
+                logger.error(f'Error adding file to IPFS: {e}')
+                raise e
+
     async def get(self, cid, save_path):
         url = f"{self.base_url}/get?arg={cid}"
         try:
@@ -41,32 +101,51 @@ class IPFSClient:
                     logger.error(f'Error getting file from IPFS: {response.status}')
                     raise Exception(f"Error getting file from IPFS: {response.status}")
 
-                tar_data = await response.read()
-                tar_stream = BytesIO(tar_data)
-
-                temp_file_path = os.path.join("/tmp", cid)
-
-                with tarfile.open(fileobj=tar_stream) as tar:
-                    tar.extractall(path="/tmp")
-
-                shutil.move(temp_file_path, save_path)
+                # tar is spooled to disk, so big files are never kept in memory
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    tar_path = os.path.join(temp_dir, f"{cid}.tar")
+                    with open(tar_path, 'wb') as tar_file:
+                        async for chunk in response.content.iter_chunked(settings.IPFS_CHUNK_SIZE):
+                            tar_file.write(chunk)
+                    await asyncio.to_thread(_extract_tar, tar_path, temp_dir)
+                    shutil.move(os.path.join(temp_dir, cid), save_path)
         except aiohttp.ClientError as e:
-            logger.error(f'Error getting file from IPFS: {response.status}')
+            logger.error(f'Error getting file from IPFS: {e}')
             raise e
 
-    async def cat(self, cid):
+    async def cat_stream(self, cid, chunk_size: int = None) -> AsyncIterator[bytes]:
+        """
+        Yields file content by chunks, as they come from IPFS node
+        """
         url = f"{self.base_url}/cat?arg={cid}"
         try:
             async with self.session.post(url) as response:
                 if response.status != 200:
                     logger.error(f'Error getting file from IPFS: {response.status}')
                     raise Exception(f"Error getting file from IPFS: {response.status}")
-                data = await response.read()
-                return data
+                async for chunk in response.content.iter_chunked(chunk_size or settings.IPFS_CHUNK_SIZE):
+                    yield chunk
         except aiohttp.ClientError as e:
-            logger.error(f'Error getting file from IPFS: {response.status}')
+            logger.error(f'Error getting file from IPFS: {e}')
             raise e
 
+    async def cat(self, cid) -> bytes:
+        return b"".join([chunk async for chunk in self.cat_stream(cid)])
+
+    async def cat_to_file(self, cid, save_path):
+        """
+        Streams file content into save_path. Partially downloaded file is never left under save_path
+        """
+        tmp_path = f"{save_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                async for chunk in self.cat_stream(cid):
+                    f.write(chunk)
+            os.replace(tmp_path, save_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     async def pin_add(self, cid):
         url = f"{self.base_url}/pin/add?arg={cid}"
         try:
@@ -76,7 +155,7 @@ class IPFSClient:
                     raise Exception(f"Error pinning file to IPFS: {response.status}")
                 return await response.json()
         except aiohttp.ClientError as e:
-            logger.error(f'Error pinning file to IPFS: {response.status}')
+            logger.error(f'Error pinning file to IPFS: {e}')
             raise e
 
     async def remove_pin(self, cid):
@@ -88,25 +167,64 @@ class IPFSClient:
                     raise Exception(f"Error removing pin of file from IPFS: {response.status}")
                 return await response.json()
         except aiohttp.ClientError as e:
-            logger.error(f'Error removing pin of file from IPFS: {response.status}')
+            logger.error(f'Error removing pin of file from IPFS: {e}')
             raise e
 
 
+def _extract_tar(tar_path, path):
+    with tarfile.open(tar_path) as tar:
+        tar.extractall(path=path)
+
+
+# aiohttp.ClientSession is bound to the loop it is created in,
+# so every loop (uvicorn worker, or asyncio.run() inside Celery task) gets its own client
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, IPFSClient]" = weakref.WeakKeyDictionary()
+
+
+def get_ipfs_client() -> IPFSClient:
+    """
+    Shared client of the current event loop. Don't close it - close_ipfs_client() does it on shutdown
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = IPFSClient(settings.IPFS_URL,
+                            session=aiohttp.ClientSession(connector=_ipfs_connector(), timeout=_ipfs_timeout()))
+        _clients[loop] = client
+    return client
+
+
+async def close_ipfs_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client:
+        await client.close()
+
+
+def run_with_ipfs_client(coro):
+    """
+    asyncio.run() for sync code (Celery tasks): shared client of the temporary loop is closed together with it
+    """
+    async def run():
+        try:
+            return await coro
+        finally:
+            await close_ipfs_client()
+    return asyncio.run(run())
+
+
 async def search_file_locally_or_in_ipfs(file_local_path, ipfs_cid, nothrow=False):
     path = Path(file_local_path)
     if not path.is_file():
         if ipfs_cid:
             try:
                 logger.info(f'File not found locally, trying to download from IPFS...')
-                async with IPFSClient(settings.IPFS_URL) as ipfs_client:
-                    await ipfs_client.get(ipfs_cid, path.parent)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                await get_ipfs_client().cat_to_file(ipfs_cid, path)
             except Exception as e:
                 if nothrow:
                     logger.error(f'File not found locally and no IPFS link provided')
                     return None
                 raise IPFSException(f'File not found neither locally nor in IPFS: {e}')
-            new_path = path.parent / ipfs_cid
-            new_path.rename(path)
         else:
             if nothrow:
                 logger.error(f'File not found locally and no IPFS link provided')
@@ -118,8 +236,37 @@ async def search_file_locally_or_in_ipfs(file_local_path, ipfs_cid, nothrow=Fals
 
 async def store_file_to_ipfs(file_local_path):
     try:
-        async with IPFSClient(settings.IPFS_URL) as ipfs_client:
-            res = await ipfs_client.add(file_local_path)
+        res = await get_ipfs_client().add(file_local_path)
+        cid = res["Hash"]
+        if cid:
+            await pin_file_to_scaleway(cid)
+        return cid
+    except Exception as e:
+        logger.info(f'Error while storing file into IPFS... {e}')
+        return None
+
+
+async def store_files_to_ipfs(file_local_paths: list) -> list:
+    """
+    store_file_to_ipfs for many files in parallel; returns cid, or None if file was not stored, for every file
+    """
+    results = await get_ipfs_client().add_many(file_local_paths)
+    cids = []
+    for file_local_path, res in zip(file_local_paths, results):
+        if isinstance(res, Exception):
+            logger.info(f'Error while storing file {file_local_path} into IPFS... {res}')
+            cids.append(None)
+            continue
+        cid = res.get("Hash")
+        if cid:
+            await pin_file_to_scaleway(cid)
+        cids.append(cid)
+    return cids
+
+
+async def store_stream_to_ipfs(chunks: AsyncIterable[bytes], file_name: str):
+    try:
+        res = await get_ipfs_client().add_stream(chunks, file_name)
         cid = res["Hash"]
         if cid:
             await pin_file_to_scaleway(cid)
@@ -131,16 +278,20 @@ async def store_file_to_ipfs(file_local_path):
 
 async def remove_file_from_ipfs(ipfs_cid):
     try:
-        async with IPFSClient(settings.IPFS_URL) as ipfs_client:
-            await ipfs_client.remove_pin(ipfs_cid)
+        await get_ipfs_client().remove_pin(ipfs_cid)
     except Exception as e:
         logger.error(f"Error removing file from IPFS: {e}")
 
 
+async def stream_file_from_ipfs(ipfs_cid) -> AsyncIterator[bytes]:
+    # can throw exception here
+    async for chunk in get_ipfs_client().cat_stream(ipfs_cid):
+        yield chunk
+
+
 async def read_file_from_ipfs(ipfs_cid):
     try:
-        async with IPFSClient(settings.IPFS_URL) as ipfs_client:
-            return await ipfs_client.cat(ipfs_cid)
+        return await get_ipfs_client().cat(ipfs_cid)
     except Exception as e:
         logger.error(f"File not found in the IPFS - {e}")
         return None
@@ -148,8 +299,7 @@ async def read_file_from_ipfs(ipfs_cid):
 
 async def get_file_from_ipfs(ipfs_cid, file_path) -> bool:
     try:
-        async with IPFSClient(settings.IPFS_URL) as ipfs_client:
-            await ipfs_client.get(ipfs_cid, file_path)
+        await get_ipfs_client().get(ipfs_cid, file_path)
         return True
     except Exception as e:
         logger.error(f"File not found in the IPFS - {e}")
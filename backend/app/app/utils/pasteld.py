@@ -1,57 +1,164 @@
-import base64
+import asyncio
 import json
 import logging
 import re
+import threading
 import time
+import weakref
 from typing import Dict
 
-import requests
+import httpx
 from enum import Enum
 
 from fastapi import HTTPException
-from requests.auth import HTTPBasicAuth
 
+from app.celery_tasks.task_lock import rds, get_async_rds
 from app.core.config import settings
 from app.utils.authentication import send_alert_email
+from app.utils import ticket_decoder
 from app.utils.secret_manager import get_pastelid_pwd
 
 logger = logging.getLogger(__name__)
 
 
-def call(method, parameters, nothrow=False):
+# Timeouts (seconds) for the RPCs that are expected to return quickly; everything else
+# (tickets register, sendtoaddress, z_sendmany...) uses settings.PASTEL_RPC_TIMEOUT
+RPC_METHOD_TIMEOUTS = {
+    "getblockcount": 30.0,
+    "getmempoolinfo": 30.0,
+    "getbalance": 60.0,
+    "z_getbalance": 60.0,
+    "getrawtransaction": 60.0,
+    "getnewaddress": 60.0,
+    "listaddressamounts": 120.0,
+    "storagefee": 60.0,
+    "pastelid": 120.0,
+}
+
+
+def _rpc_timeout(method) -> httpx.Timeout:
+    timeout = RPC_METHOD_TIMEOUTS.get(method, settings.PASTEL_RPC_TIMEOUT)
+    return httpx.Timeout(timeout, connect=settings.PASTEL_RPC_CONNECT_TIMEOUT)
+
+
+def _rpc_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=settings.PASTEL_RPC_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.PASTEL_RPC_MAX_CONNECTIONS,
+                        keepalive_expiry=settings.PASTEL_RPC_KEEPALIVE_EXPIRY)
+
+
+def _rpc_auth() -> httpx.BasicAuth:
+    return httpx.BasicAuth(settings.PASTEL_RPC_USER, settings.PASTEL_RPC_PWD)
+
+
+class _AsyncPasteldSession:
+    """
+    Keep-alive connection pool plus concurrency limiter for one event loop.
+    httpx.AsyncClient and asyncio.Semaphore are bound to the loop they are first used in,
+    so every loop (uvicorn worker, or asyncio.run() inside Celery task) gets its own session
+    """
+    def __init__(self):
+        self.client = httpx.AsyncClient(auth=_rpc_auth(), limits=_rpc_limits(),
+                                        timeout=settings.PASTEL_RPC_TIMEOUT)
+        self.semaphore = asyncio.Semaphore(settings.PASTEL_RPC_MAX_CONCURRENCY)
+
+
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncPasteldSession]" = \
+    weakref.WeakKeyDictionary()
+_sync_client: httpx.Client | None = None
+_sync_semaphore = threading.BoundedSemaphore(settings.PASTEL_RPC_MAX_CONCURRENCY)
+_sync_client_lock = threading.Lock()
+
+
+def _get_async_session() -> _AsyncPasteldSession:
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None:
+        session = _AsyncPasteldSession()
+        _async_sessions[loop] = session
+    return session
+
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        with _sync_client_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(auth=_rpc_auth(), limits=_rpc_limits(),
+                                            timeout=settings.PASTEL_RPC_TIMEOUT)
+    return _sync_client
+
+
+async def close_async_session():
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session:
+        await session.client.aclose()
+
+
+def close_sync_client():
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+def run_with_pasteld_client(coro):
+    """
+    asyncio.run() for sync code (Celery tasks): async session of the temporary loop is closed together with it
+    """
+    async def run():
+        try:
+            return await coro
+        finally:
+            await close_async_session()
+    return asyncio.run(run())
+
+
+def _make_payload(method, parameters) -> str:
     payload_getinfo = {"jsonrpc": "1.0", "id": "pastelapi", "method": method, "params": parameters}
-    payload = json.dumps(payload_getinfo)
+    return json.dumps(payload_getinfo)
 
-    logger.info(f"Calling cNode as: {payload}")
 
-    auth = HTTPBasicAuth(settings.PASTEL_RPC_USER, settings.PASTEL_RPC_PWD)
-    try:
-        response = requests.post(settings.PASTEL_RPC_URL, payload, auth=auth, timeout=600)
-    except requests.Timeout as te:
-        logger.error(f"Timeout calling pasteld RPC: {te}")
-        send_alert_email(f"Timeout calling pasteld RPC: {te}")
-        if nothrow:
-            return None
-        raise PasteldException()
-    except Exception as e:
+def _send_alert_in_background(message: str):
+    # SMTP is blocking - in async code don't stall the event loop (and every request on it) while pasteld is down
+    future = asyncio.get_running_loop().run_in_executor(None, send_alert_email, message)
+    future.add_done_callback(_on_alert_sent)
+
+
+def _on_alert_sent(future):
+    if not future.cancelled() and future.exception():
+        logger.error(f"Can't send alert email: {future.exception()}")
+
+
+def _on_transport_error(e: Exception, nothrow, alert=send_alert_email):
+    if isinstance(e, httpx.TimeoutException):
+        logger.error(f"Timeout calling pasteld RPC: {e}")
+        alert(f"Timeout calling pasteld RPC: {e}")
+    else:
         logger.error(f"Exception calling pasteld RPC: {e}")
-        send_alert_email(f"Exception calling pasteld RPC: {e}")
-        if nothrow:
-            return None
-        raise PasteldException()
+        alert(f"Exception calling pasteld RPC: {e}")
+    if nothrow:
+        return None
+    raise PasteldException()
+
+
+def _parse_response(response: httpx.Response, nothrow):
     logger.info(f"Request to cNode was: "
-                f"URL: {response.request.url}\nMethod: {response.request.method}\nHeaders: "
-                f"{response.request.headers}")
+                f"URL: {response.request.url}\nMethod: {response.request.method}")
     if 400 <= response.status_code < 600:
-        logger.info(f"Request to cNode was: Body: {response.request.body}")
+        logger.info(f"Request to cNode was: Body: {response.request.content}")
         logger.info(f"Response from cNode: {response.text}")
         if nothrow:
             return response
-        resp = response.json()
-        if resp and "error" in resp:
-            raise PasteldException(resp["error"]["message"])
+        try:
+            resp = response.json()
+        except ValueError:
+            resp = None
+        if resp and resp.get("error"):
+            raise PasteldException(resp["error"]["message"], response=response)
+        raise PasteldException(f"Call to pasteld failed with HTTP status {response.status_code}", response=response)
 
-    response.raise_for_status()
     resp = response.json()
     if not resp or "result" not in resp:
         if nothrow:
@@ -60,19 +167,221 @@ def call(method, parameters, nothrow=False):
     return resp["result"]
 
 
+async def acall(method, parameters, nothrow=False):
+    """
+    Asyncio-native version of call(), to be used from async code (API endpoints).
+    Reuses the keep-alive pool of the current event loop and never blocks it
+    """
+    payload = _make_payload(method, parameters)
+    logger.info(f"Calling cNode as: {payload}")
+
+    session = _get_async_session()
+    try:
+        async with session.semaphore:
+            response = await session.client.post(settings.PASTEL_RPC_URL, content=payload,
+                                                  timeout=_rpc_timeout(method))
+    except Exception as e:
+        return _on_transport_error(e, nothrow, alert=_send_alert_in_background)
+    return _parse_response(response, nothrow)
+
+
+def call(method, parameters, nothrow=False):
+    """
+    Synchronous facade over the shared pasteld connection pool, used by Celery tasks
+    """
+    payload = _make_payload(method, parameters)
+    logger.info(f"Calling cNode as: {payload}")
+
+    try:
+        with _sync_semaphore:
+            response = _get_sync_client().post(settings.PASTEL_RPC_URL, content=payload,
+                                               timeout=_rpc_timeout(method))
+    except Exception as e:
+        return _on_transport_error(e, nothrow)
+    return _parse_response(response, nothrow)
+
+
+def _batch_timeout(calls) -> httpx.Timeout:
+    timeout = max(RPC_METHOD_TIMEOUTS.get(method, settings.PASTEL_RPC_TIMEOUT) for method, _ in calls)
+    return httpx.Timeout(timeout, connect=settings.PASTEL_RPC_CONNECT_TIMEOUT)
+
+
+def _make_batch_payload(calls) -> str:
+    return json.dumps([{"jsonrpc": "1.0", "id": ind, "method": method, "params": parameters}
+                       for ind, (method, parameters) in enumerate(calls)])
+
+
+def _chunks(calls):
+    size = max(settings.PASTEL_RPC_BATCH_SIZE, 1)
+    return [calls[i:i + size] for i in range(0, len(calls), size)]
+
+
+def _parse_batch_response(response: httpx.Response, count: int) -> list:
+    try:
+        resp = response.json()
+    except ValueError:
+        resp = None
+    if not isinstance(resp, list):
+        logger.info(f"Response from cNode: {response.text}")
+        if resp and isinstance(resp, dict) and resp.get("error"):
+            raise PasteldException(resp["error"]["message"], response=response)
+        raise PasteldException(f"Batch call to pasteld failed with HTTP status {response.status_code}",
+                               response=response)
+
+    results = [PasteldException("No response for the call in the batch") for _ in range(count)]
+    for item in resp:
+        ind = item.get("id") if isinstance(item, dict) else None
+        if not isinstance(ind, int) or not 0 <= ind < count:
+            continue
+        if item.get("error"):
+            results[ind] = PasteldException(item["error"].get("message", "Call to pasteld failed"))
+        elif "result" in item:
+            results[ind] = item["result"]
+    return results
+
+
+def _on_batch_transport_error(e: Exception, count: int, nothrow, alert=send_alert_email) -> list:
+    _on_transport_error(e, True, alert=alert)
+    if nothrow:
+        return [PasteldException() for _ in range(count)]
+    raise PasteldException()
+
+
+async def acall_batch(calls: list[tuple[str, list]], nothrow=False) -> list:
+    """
+    Sends (method, parameters) pairs as JSON-RPC batches of up to settings.PASTEL_RPC_BATCH_SIZE calls.
+    Returns list of the same length as calls; every item is either call result
+    or PasteldException instance for the call that failed.
+    If the whole batch fails, raises PasteldException, or (if nothrow) returns PasteldException for every call
+    """
+    results = []
+    session = _get_async_session()
+    for chunk in _chunks(calls):
+        payload = _make_batch_payload(chunk)
+        logger.info(f"Calling cNode with batch of {len(chunk)} calls")
+        try:
+            async with session.semaphore:
+                response = await session.client.post(settings.PASTEL_RPC_URL, content=payload,
+                                                      timeout=_batch_timeout(chunk))
+        except Exception as e:
+            results.extend(_on_batch_transport_error(e, len(chunk), nothrow, alert=_send_alert_in_background))
+            continue
+        try:
+            results.extend(_parse_batch_response(response, len(chunk)))
+        except PasteldException as pe:
+            if not nothrow:
+                raise
+            results.extend(pe for _ in chunk)
+    return results
+
+
+def call_batch(calls: list[tuple[str, list]], nothrow=False) -> list:
+    """
+    Synchronous version of acall_batch, used by Celery tasks
+    """
+    results = []
+    for chunk in _chunks(calls):
+        payload = _make_batch_payload(chunk)
+        logger.info(f"Calling cNode with batch of {len(chunk)} calls")
+        try:
+            with _sync_semaphore:
+                response = _get_sync_client().post(settings.PASTEL_RPC_URL, content=payload,
+                                                   timeout=_batch_timeout(chunk))
+        except Exception as e:
+            results.extend(_on_batch_transport_error(e, len(chunk), nothrow))
+            continue
+        try:
+            results.extend(_parse_batch_response(response, len(chunk)))
+        except PasteldException as pe:
+            if not nothrow:
+                raise
+            results.extend(pe for _ in chunk)
+    return results
+
+
+BLOCK_HEIGHT_KEY = "pasteld_block_height"
+
+
+def get_block_height(nothrow=False) -> int | None:
+    """
+    Current block height, shared by all API and Celery workers through Redis.
+    Value lives BLOCK_HEIGHT_CACHE_TTL seconds, it is refreshed by scheduled_tools:block_height_poller
+    and by tools/block_notify.py when pasteld is started with -blocknotify
+    """
+    try:
+        height = rds.get(BLOCK_HEIGHT_KEY)
+        if height is not None:
+            return int(height)
+    except Exception as e:
+        logger.warning(f"Can't read block height from Redis: {e}")
+    return refresh_block_height(nothrow)
+
+
+def refresh_block_height(nothrow=False) -> int | None:
+    height = call("getblockcount", [], nothrow)
+    if not isinstance(height, int):
+        if nothrow:
+            return None
+        raise PasteldException(f"Invalid block height returned by pasteld: {height}")
+    try:
+        rds.set(BLOCK_HEIGHT_KEY, height, ex=settings.BLOCK_HEIGHT_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Can't store block height in Redis: {e}")
+    return height
+
+
+async def aget_block_height(nothrow=False) -> int | None:
+    """
+    Async version of get_block_height, for API endpoints
+    """
+    try:
+        height = await get_async_rds().get(BLOCK_HEIGHT_KEY)
+        if height is not None:
+            return int(height)
+    except Exception as e:
+        logger.warning(f"Can't read block height from Redis: {e}")
+    return await arefresh_block_height(nothrow)
+
+
+async def arefresh_block_height(nothrow=False) -> int | None:
+    height = await acall("getblockcount", [], nothrow)
+    if not isinstance(height, int):
+        if nothrow:
+            return None
+        raise PasteldException(f"Invalid block height returned by pasteld: {height}")
+    try:
+        await get_async_rds().set(BLOCK_HEIGHT_KEY, height, ex=settings.BLOCK_HEIGHT_CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Can't store block height in Redis: {e}")
+    return height
+
+
+def invalidate_block_height():
+    try:
+        rds.delete(BLOCK_HEIGHT_KEY)
+    except Exception as e:
+        logger.warning(f"Can't remove block height from Redis: {e}")
+
+
 class PasteldException(Exception):
     """Exception raised for errors in the pasteld call
 
     Attributes:
         message -- explanation of the error
+        response -- HTTP response from pasteld, if it returned an error status
     """
 
-    def __init__(self, message="Call to pasteld failed"):
+    def __init__(self, message="Call to pasteld failed", response=None):
         self.message = message
+        self.response = response
         super().__init__(self.message)
 
 
 async def parse_registration_action_ticket(reg_ticket, expected_ticket_type, expected_action_type: list[str]):
+    return decode_registration_action_ticket(reg_ticket, expected_ticket_type, expected_action_type)
+
+
+def decode_registration_action_ticket(reg_ticket, expected_ticket_type, expected_action_type: list[str]):
     if not reg_ticket or \
             "ticket" not in reg_ticket or \
             "action_ticket" not in reg_ticket["ticket"] or \
@@ -90,92 +399,67 @@ async def parse_registration_action_ticket(reg_ticket, expected_ticket_type, exp
                             detail=f'Invalid {expected_action_type} registration ticket action type - '
                                    f'{reg_ticket["ticket"]["action_type"]}')
 
-    # Base64decode the ticket
-    reg_ticket_action_ticket_str = base64.b64decode(reg_ticket["ticket"]["action_ticket"]).decode('utf-8')
-
-    # Convert to json
-    reg_ticket["ticket"]["action_ticket"] = json.loads(reg_ticket_action_ticket_str)
-
-    if not reg_ticket["ticket"]["action_ticket"] or \
-            "action_ticket_version" not in reg_ticket["ticket"]["action_ticket"] or \
-            "action_type" not in reg_ticket["ticket"]["action_ticket"] or \
-            "api_ticket" not in reg_ticket["ticket"]["action_ticket"]:
-        raise HTTPException(status_code=501, detail=f"Failed to decode action_ticket in the "
-                                                    f"{expected_action_type} registration ticket")
-    if reg_ticket["ticket"]["action_ticket"]["action_type"] not in expected_action_type:
+    parsed_ticket = ticket_decoder.get_decoded_ticket(reg_ticket.get("txid"), "action")
+    if not parsed_ticket:
+        # Base64decode the ticket and convert to json
+        action_ticket = ticket_decoder.decode_ticket_json(reg_ticket["ticket"]["action_ticket"])
+
+        if not action_ticket or \
+                "action_ticket_version" not in action_ticket or \
+                "action_type" not in action_ticket or \
+                "api_ticket" not in action_ticket:
+            raise HTTPException(status_code=501, detail=f"Failed to decode action_ticket in the "
+                                                        f"{expected_action_type} registration ticket")
+
+        # ASCII85 or Base64 decode the api_ticket, keep it as is if neither works
+        api_ticket = ticket_decoder.decode_embedded_ticket(action_ticket["api_ticket"], "action",
+                                                           action_ticket["action_ticket_version"])
+        if api_ticket is not None:
+            action_ticket["api_ticket"] = api_ticket
+
+        parsed_ticket = ticket_decoder.remember_decoded_ticket(
+            reg_ticket.get("txid"), "action",
+            {**reg_ticket, "ticket": {**reg_ticket["ticket"], "action_ticket": action_ticket}})
+
+    if parsed_ticket["ticket"]["action_ticket"]["action_type"] not in expected_action_type:
         raise HTTPException(status_code=501,
                             detail=f'Invalid "app_ticket" in the {expected_action_type} '
                                    f'registration ticket action type - '
                                    f'{reg_ticket["ticket"]["action_type"]}')
 
-    try:
-        # ASCII85decode the api_ticket
-        api_ticket_str = base64.a85decode(reg_ticket["ticket"]["action_ticket"]["api_ticket"])
-        reg_ticket["ticket"]["action_ticket"]["api_ticket"] = json.loads(api_ticket_str)
-    except ValueError as ve:
-        logger.warning(f"Failed to ascii85 decode api_ticket in the {expected_action_type} registration ticket: {ve}")
-        try:
-            # Base64decode the api_ticket
-            api_ticket_str = base64.b64decode(reg_ticket["ticket"]["action_ticket"]["api_ticket"])
-            reg_ticket["ticket"]["action_ticket"]["api_ticket"] = json.loads(api_ticket_str)
-        except ValueError as ve:
-            if str(ve) == "Incorrect padding":
-                try:
-                    api_ticket_str = reg_ticket["ticket"]["action_ticket"]["api_ticket"]
-                    api_ticket_str += '=='
-                    api_ticket_str = base64.b64decode(api_ticket_str)
-                    reg_ticket["ticket"]["action_ticket"]["api_ticket"] = json.loads(api_ticket_str)
-                except ValueError as ve:
-                    logger.warning(f"Failed to base64 decode api_ticket in the {expected_action_type} "
-                                   f"with extra padding registration ticket: {ve}")
-            else:
-                logger.warning(f"Failed to base64 decode api_ticket in the {expected_action_type} "
-                               f"registration ticket: {ve}")
-
-    return reg_ticket
+    return parsed_ticket
 
 
 async def parse_registration_nft_ticket(reg_ticket):
+    return decode_registration_nft_ticket(reg_ticket)
+
+
+def decode_registration_nft_ticket(reg_ticket):
     if not reg_ticket or "ticket" not in reg_ticket or "nft_ticket" not in reg_ticket["ticket"]:
         raise HTTPException(status_code=501, detail=f"Invalid NFT registration ticket")
 
-    # Base64decode the ticket
-    reg_ticket_nft_ticket_str = base64.b64decode(reg_ticket["ticket"]["nft_ticket"]).decode('utf-8')
+    parsed_ticket = ticket_decoder.get_decoded_ticket(reg_ticket.get("txid"), "nft")
+    if parsed_ticket:
+        return parsed_ticket
 
-    # Convert to json
-    reg_ticket["ticket"]["nft_ticket"] = json.loads(reg_ticket_nft_ticket_str)
+    # Base64decode the ticket and convert to json
+    nft_ticket = ticket_decoder.decode_ticket_json(reg_ticket["ticket"]["nft_ticket"])
 
-    if not reg_ticket["ticket"]["nft_ticket"] or \
-            "nft_ticket_version" not in reg_ticket["ticket"]["nft_ticket"] or \
-            "app_ticket" not in reg_ticket["ticket"]["nft_ticket"]:
+    if not nft_ticket or \
+            "nft_ticket_version" not in nft_ticket or \
+            "app_ticket" not in nft_ticket:
         raise HTTPException(status_code=501, detail=f"Failed to decode action_ticket in the "
                                                     f"NFT registration ticket")
 
-    try:
-        # ASCII85decode the app_ticket
-        app_ticket_str = base64.a85decode(reg_ticket["ticket"]["nft_ticket"]["app_ticket"])
-        reg_ticket["ticket"]["nft_ticket"]["app_ticket"] = json.loads(app_ticket_str)
-    except ValueError as ve:
-        logger.warning(f"Failed to ascii85 decode app_ticket in the NFT registration ticket: {ve}")
-        try:
-            # Base64decode the app_ticket
-            app_ticket_str = base64.b64decode(reg_ticket["ticket"]["nft_ticket"]["app_ticket"])
-            reg_ticket["ticket"]["nft_ticket"]["app_ticket"] = json.loads(app_ticket_str)
-        except ValueError as ve:
-            if str(ve) == "Incorrect padding":
-                try:
-                    app_ticket_str = reg_ticket["ticket"]["nft_ticket"]["app_ticket"]
-                    app_ticket_str += '=='
-                    app_ticket_str = base64.b64decode(app_ticket_str)
-                    reg_ticket["ticket"]["nft_ticket"]["app_ticket"] = json.loads(app_ticket_str)
-                except ValueError as ve:
-                    logger.warning(f"Failed to base64 decode api_ticket in the NFT "
-                                   f"with extra padding registration ticket: {ve}")
-            else:
-                logger.warning(f"Failed to base64 decode app_ticket in the NFT "
-                               f"registration ticket: {ve}")
-
-    return reg_ticket
+    # ASCII85 or Base64 decode the app_ticket, keep it as is if neither works
+    app_ticket = ticket_decoder.decode_embedded_ticket(nft_ticket["app_ticket"], "nft",
+                                                       nft_ticket["nft_ticket_version"])
+    if app_ticket is not None:
+        nft_ticket["app_ticket"] = app_ticket
+
+    return ticket_decoder.remember_decoded_ticket(
+        reg_ticket.get("txid"), "nft",
+        {**reg_ticket, "ticket": {**reg_ticket["ticket"], "nft_ticket": nft_ticket}})
 
 
 async def create_offer_ticket(act_ticket_txid: str, price: int, current_pastel_id: str, current_passphrase: str,
@@ -183,26 +467,26 @@ async def create_offer_ticket(act_ticket_txid: str, price: int, current_pastel_i
 
     min_ticket_fee = max(price / 50, settings.TICKET_PRICE_OFFER) + settings.TICKET_PRICE_MIN_BALANCE
     if funding_address:
-        if not check_address_balance(funding_address, min_ticket_fee, f"offer ticket"):
+        if not await acheck_address_balance(funding_address, min_ticket_fee, f"offer ticket"):
             return TicketCreateStatus.ERROR, None
     else:
-        if not check_balance(min_ticket_fee, send_email=False):
+        if not await acheck_balance(min_ticket_fee, send_email=False):
             return TicketCreateStatus.ERROR, None
 
-    offer_ticket = call('tickets', ['register', 'offer',
-                                    act_ticket_txid,
-                                    price,
-                                    current_pastel_id, current_passphrase,
-                                    0, 0, 1, funding_address if funding_address else '',
-                                    rcpt_pastel_id],
-                        nothrow=True)   # won't throw exception here
+    offer_ticket = await acall('tickets', ['register', 'offer',
+                                           act_ticket_txid,
+                                           price,
+                                           current_pastel_id, current_passphrase,
+                                           0, 0, 1, funding_address if funding_address else '',
+                                           rcpt_pastel_id],
+                               nothrow=True)   # won't throw exception here
     if not offer_ticket or not isinstance(offer_ticket, dict):
         raise HTTPException(status_code=500, detail=f"Failed to create offer ticket: {offer_ticket}")
     return offer_ticket
 
 
 async def verify_message(message, signature, pastel_id) -> bool:
-    response = call('pastelid', ['verify', message, signature, pastel_id], nothrow=True)   # won't throw exception here
+    response = await acall('pastelid', ['verify', message, signature, pastel_id], nothrow=True)   # won't throw exception here
     if isinstance(response, dict) and 'verification' in response and response['verification'] == 'OK':
         return True
     return False
@@ -218,6 +502,16 @@ def check_balance(need_amount: float, send_email: bool = True) -> bool:
     return True
 
 
+async def acheck_balance(need_amount: float, send_email: bool = True) -> bool:
+    balance = await acall('getbalance', [])
+    if balance < need_amount:
+        logger.error(f"Insufficient funds: balance {balance}")
+        if send_email:
+            await asyncio.to_thread(send_alert_email, f"Insufficient funds: balance {balance}")
+        return False
+    return True
+
+
 class TicketTransactionStatus(Enum):
     NOT_FOUND = 0
     WAITING = 1
@@ -226,7 +520,30 @@ class TicketTransactionStatus(Enum):
 
 async def check_ticket_transaction(txid, msg, current_block_height, start_waiting_block_height,
                                    max_wait_blocks=100) -> TicketTransactionStatus:
-    response = call('getrawtransaction', [txid, 1], nothrow=True)  # won't throw exception here
+    response = await acall('getrawtransaction', [txid, 1], nothrow=True)  # won't throw exception here
+    return _ticket_transaction_status(response, msg, current_block_height, start_waiting_block_height,
+                                      max_wait_blocks)
+
+
+async def check_ticket_transactions(transactions: list[tuple[str, str, int]], current_block_height,
+                                    max_wait_blocks=100) -> list[TicketTransactionStatus]:
+    """
+    Batched version of check_ticket_transaction.
+    transactions is a list of (txid, msg, start_waiting_block_height), statuses are returned in the same order.
+    Unlike check_ticket_transaction, throws if the whole batch failed, so callers don't treat
+    every transaction as NOT_FOUND because of a single failed request
+    """
+    if not transactions:
+        return []
+    # can throw exception here
+    responses = await acall_batch([('getrawtransaction', [txid, 1]) for txid, _, _ in transactions])
+    return [_ticket_transaction_status(response, msg, current_block_height, start_waiting_block_height,
+                                       max_wait_blocks)
+            for response, (_, msg, start_waiting_block_height) in zip(responses, transactions)]
+
+
+def _ticket_transaction_status(response, msg, current_block_height, start_waiting_block_height,
+                               max_wait_blocks) -> TicketTransactionStatus:
     if response and isinstance(response, dict):
         # ticket transaction is found at least locally
         if "height" in response and response["height"] > 0:
@@ -344,6 +661,22 @@ def check_address_balance(address: str | None, need_amount: float, what: str, se
     return True
 
 
+async def acheck_address_balance(address: str | None, need_amount: float, what: str,
+                                 send_email: bool = True) -> bool:
+    if not address:
+        return await acheck_balance(need_amount, send_email)
+
+    address_balance = await acall("z_getbalance", [address])
+    if address_balance < need_amount:
+        logger.error(f"Not enough funds on {address} to pay for {what}."
+                     f"Need > {need_amount} but has {address_balance}")
+        if send_email:
+            await asyncio.to_thread(send_alert_email, f"No enough funds on {address} to pay for {what}."
+                                                      f"Need > {need_amount} but has {address_balance}")
+        return False
+    return True
+
+
 def send_to_many_z(from_address: str, to_addresses: Dict[str, float], _fee: float = 0.0001) -> str | None:
     to_addresses_upd = [{"address": key, "amount": value} for key, value in to_addresses.items()]
     total_amount = sum(to_addresses.values())
@@ -379,7 +712,7 @@ def get_amount_for_address(address):
 
 
 def check_wallet_balance_and_wait(address: str, need_amount, wait_loops=5, wait_time=120):
-    height_before = call("getblockcount", [])
+    height_before = get_block_height()
     height_now = 0
     wallet_balance = get_amount_for_address(address)
     for ind in range(wait_loops):
@@ -397,7 +730,7 @@ def check_wallet_balance_and_wait(address: str, need_amount, wait_loops=5, wait_
                 logger.error(f"Not enough balance even after next block: "
                              f"wallet_balance={wallet_balance}, need_amount={need_amount}")
                 return False
-            height_now = call("getblockcount", [])
+            height_now = get_block_height()
             logger.info(f"Wallet balance is enough: {wallet_balance} > {need_amount},"
                         f" but there are no UTXOs to spend yet. Waiting for the next block - "
                         f"{height_before + 1}. Now is {height_now}")
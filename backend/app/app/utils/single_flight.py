@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, TypeVar
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Coalesces concurrent identical fetches (the same file from WalletNode, IPFS...).
+# Inside one process the callers of the same key await one future; across API workers the leaders
+# take a Redis lock, so the others wait for the lock and then find the result in the cache instead of fetching.
+# fetch must look into the cache first - it is called again by whoever gets the lock next
+_in_flight: dict[str, asyncio.Task] = {}
+
+
+def _lock_key(key: str) -> str:
+    return f"single_flight:{key}"
+
+
+async def single_flight(key: str, fetch: Callable[[], Awaitable[T]]) -> T:
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_under_lock(key, fetch))
+        _in_flight[key] = task
+        task.add_done_callback(lambda t: _on_done(key, t))
+    # shield - when a caller is cancelled (client disconnected), the fetch goes on for the others
+    return await asyncio.shield(task)
+
+
+def _on_done(key: str, task: asyncio.Task):
+    if _in_flight.get(key) is task:
+        del _in_flight[key]
+    if not task.cancelled() and task.exception():
+        # retrieved here, so it is not logged as never retrieved if all callers are gone
+        logger.info(f"Fetch of {key} failed: {task.exception()}")
+
+
+async def _fetch_under_lock(key: str, fetch: Callable[[], Awaitable[T]]) -> T:
+    client = None
+    lock = None
+    try:
+        client = aioredis.StrictRedis(host=settings.REDIS_HOST)
+        lock = client.lock(_lock_key(key), timeout=settings.SINGLE_FLIGHT_LOCK_TIMEOUT,
+                           blocking_timeout=settings.SINGLE_FLIGHT_WAIT_TIMEOUT)
+        if not await lock.acquire():
+            logger.warning(f"Waited too long for the fetch of {key} in other worker, fetching it here")
+            lock = None
+    except Exception as e:
+        logger.warning(f"Can't lock {key} in Redis, fetching without it: {e}")
+        lock = None
+    try:
+        return await fetch()
+    finally:
+        try:
+            if lock:
+                await lock.release()
+        except Exception as e:
+            logger.warning(f"Can't unlock {key} in Redis: {e}")
+        if client:
+            await client.aclose()
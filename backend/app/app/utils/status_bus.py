@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import re
+from datetime import datetime
+
+import redis.asyncio as aioredis
+
+from app.celery_tasks.task_lock import rds
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Status transitions of gateway results are published to Redis pub/sub, one channel per owner (user).
+# Publishers are Celery tasks and scheduled jobs (via CRUD update), subscribers - API status streams.
+# The same events are also appended to a capped Redis stream per owner, so SSE clients can resume after reconnect
+STATUS_FIELDS = {"process_status", "reg_ticket_txid", "act_ticket_txid"}
+
+_EVENT_ID_RE = re.compile(r"^\d+-\d+$")
+
+
+def status_channel(owner_id) -> str:
+    return f"gateway_status:{owner_id}"
+
+
+def status_stream(owner_id) -> str:
+    return f"gateway_status_stream:{owner_id}"
+
+
+def publish_status_change(task_from_db, service: str = None):
+    owner_id = getattr(task_from_db, "owner_id", None)
+    if not owner_id or not getattr(task_from_db, "result_id", None):
+        return
+    event = {
+        "service": service or task_from_db.__tablename__,
+        "result_id": task_from_db.result_id,
+        "request_id": getattr(task_from_db, "request_id", None),
+        "process_status": task_from_db.process_status,
+        "time": datetime.utcnow().isoformat(),
+    }
+    data = json.dumps(event)
+    try:
+        pipe = rds.pipeline(transaction=False)
+        pipe.publish(status_channel(owner_id), data)
+        pipe.xadd(status_stream(owner_id), {"event": data},
+                  maxlen=settings.STATUS_STREAM_MAXLEN, approximate=True)
+        pipe.expire(status_stream(owner_id), settings.STATUS_STREAM_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Can't publish status change of {task_from_db.result_id}: {e}")
+
+
+class StatusSubscription:
+    """
+    Subscription to status changes of one owner. If Redis is not available, wait() just sleeps
+    for the whole timeout, so callers silently fall back to periodic re-checking
+    """
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self._client = None
+        self._pubsub = None
+
+    async def __aenter__(self):
+        try:
+            self._client = aioredis.StrictRedis(host=settings.REDIS_HOST, decode_responses=True)
+            self._pubsub = self._client.pubsub()
+            await self._pubsub.subscribe(status_channel(self.owner_id))
+        except Exception as e:
+            logger.warning(f"Can't subscribe to status changes, falling back to polling: {e}")
+            await self._close()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self._close()
+
+    async def _close(self):
+        try:
+            if self._pubsub:
+                await self._pubsub.aclose()
+            if self._client:
+                await self._client.aclose()
+        except Exception as e:
+            logger.warning(f"Error while closing status subscription: {e}")
+        self._pubsub = None
+        self._client = None
+
+    async def wait(self, result_ids, timeout: float) -> set:
+        """
+        Waits for changes of any of result_ids; returns changed ones, or empty set if nothing happened in timeout
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        changed = set()
+        while not changed:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            if not self._pubsub:
+                await asyncio.sleep(remaining)
+                break
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+            except Exception as e:
+                logger.warning(f"Status subscription failed, falling back to polling: {e}")
+                await self._close()
+                continue
+            # take everything that is already queued, so bursts of changes are handled at once
+            while message:
+                event = json.loads(message["data"])
+                if event.get("result_id") in result_ids:
+                    changed.add(event["result_id"])
+                try:
+                    message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=0)
+                except Exception:
+                    message = None
+        return changed
+
+
+def _event_id_key(event_id: str) -> tuple[int, int]:
+    ms, seq = event_id.split("-")
+    return int(ms), int(seq)
+
+
+class StatusEventStream:
+    """
+    Reader of the owner's status stream, starting after last_event_id (the SSE Last-Event-ID), or from now.
+    Unlike StatusSubscription it needs Redis - open() throws exception if it is not available.
+    missed is True when last_event_id was already trimmed from the stream, so some events are lost
+    """
+    def __init__(self, owner_id, last_event_id: str = None):
+        self.owner_id = owner_id
+        self.last_id = last_event_id if last_event_id and _EVENT_ID_RE.match(last_event_id) else None
+        self.missed = False
+        self._client = None
+
+    async def open(self):
+        # can throw exception here
+        self._client = aioredis.StrictRedis(host=settings.REDIS_HOST, decode_responses=True)
+        key = status_stream(self.owner_id)
+        if not self.last_id:
+            newest = await self._client.xrevrange(key, count=1)
+            self.last_id = newest[0][0] if newest else "0-0"
+            return
+        oldest = await self._client.xrange(key, count=1)
+        if not oldest:
+            self.missed = True
+        elif _event_id_key(self.last_id) < _event_id_key(oldest[0][0]):
+            self.missed = not await self._client.xrange(key, min=self.last_id, max=self.last_id)
+
+    async def close(self):
+        try:
+            if self._client:
+                await self._client.aclose()
+        except Exception as e:
+            logger.warning(f"Error while closing status stream: {e}")
+        self._client = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def read(self, timeout: float) -> list[tuple[str, dict]]:
+        """
+        Returns (event id, event) that came after the last returned one, or empty list if nothing happened in timeout
+        """
+        # can throw exception here
+        response = await self._client.xread({status_stream(self.owner_id): self.last_id},
+                                            count=1000, block=int(timeout * 1000))
+        events = []
+        for _, entries in response or []:
+            for event_id, fields in entries:
+                self.last_id = event_id
+                try:
+                    events.append((event_id, json.loads(fields["event"])))
+                except (KeyError, ValueError) as e:
+                    logger.warning(f"Invalid status event {event_id}: {e}")
+        return events
@@ -0,0 +1,147 @@
+import json
+import logging
+import threading
+
+from cachetools import LRUCache
+
+from app.celery_tasks.task_lock import rds, get_async_rds
+from app.core.config import settings
+import app.utils.pasteld as psl
+from app.utils.ticket_decoder import freeze
+
+logger = logging.getLogger(__name__)
+
+# Registration and activation tickets can't change once they are confirmed, so they are cached by txid:
+# in-process LRU first, then Redis (shared by all API and Celery workers).
+# "kind" separates raw "tickets get" output from the decoded (parsed) forms of the same ticket
+_local_cache = LRUCache(maxsize=settings.TICKET_CACHE_LOCAL_SIZE)
+_local_cache_lock = threading.Lock()
+
+
+def _cache_key(txid: str, kind: str) -> str:
+    return f"psl_ticket:{kind}:{txid}"
+
+
+def _get_local(key: str) -> dict | None:
+    with _local_cache_lock:
+        return _local_cache.get(key)
+
+
+def _put_local(key: str, ticket: dict):
+    with _local_cache_lock:
+        _local_cache[key] = ticket
+
+
+def get_cached_ticket(txid: str, kind: str = "raw") -> dict | None:
+    if not txid:
+        return None
+    key = _cache_key(txid, kind)
+    ticket = _get_local(key)
+    if ticket is not None:
+        return ticket
+    try:
+        value = rds.get(key)
+    except Exception as e:
+        logger.warning(f"Can't read ticket {txid} from Redis: {e}")
+        return None
+    if value is None:
+        return None
+    ticket = freeze(json.loads(value))
+    _put_local(key, ticket)
+    return ticket
+
+
+async def aget_cached_ticket(txid: str, kind: str = "raw") -> dict | None:
+    """
+    Async version of get_cached_ticket, for API endpoints
+    """
+    if not txid:
+        return None
+    key = _cache_key(txid, kind)
+    ticket = _get_local(key)
+    if ticket is not None:
+        return ticket
+    try:
+        value = await get_async_rds().get(key)
+    except Exception as e:
+        logger.warning(f"Can't read ticket {txid} from Redis: {e}")
+        return None
+    if value is None:
+        return None
+    ticket = freeze(json.loads(value))
+    _put_local(key, ticket)
+    return ticket
+
+
+def cache_ticket(txid: str, kind: str, ticket: dict) -> dict:
+    if not txid or not is_confirmed(ticket):
+        return ticket
+    ticket = freeze(ticket)
+    key = _cache_key(txid, kind)
+    _put_local(key, ticket)
+    try:
+        rds.set(key, json.dumps(ticket), ex=settings.TICKET_CACHE_REDIS_TTL)
+    except Exception as e:
+        logger.warning(f"Can't store ticket {txid} in Redis: {e}")
+    return ticket
+
+
+async def acache_ticket(txid: str, kind: str, ticket: dict) -> dict:
+    """
+    Async version of cache_ticket, for API endpoints
+    """
+    if not txid or not await ais_confirmed(ticket):
+        return ticket
+    ticket = freeze(ticket)
+    key = _cache_key(txid, kind)
+    _put_local(key, ticket)
+    try:
+        await get_async_rds().set(key, json.dumps(ticket), ex=settings.TICKET_CACHE_REDIS_TTL)
+    except Exception as e:
+        logger.warning(f"Can't store ticket {txid} in Redis: {e}")
+    return ticket
+
+
+def _ticket_height(ticket) -> int | None:
+    if not ticket or not isinstance(ticket, dict):
+        return None
+    height = ticket.get("height")
+    if not isinstance(height, int) or height <= 0:
+        return None
+    return height
+
+
+def _enough_confirmations(height: int, current_height: int | None) -> bool:
+    if not current_height:
+        return False
+    return current_height - height + 1 >= settings.TICKET_CACHE_MIN_CONFIRMATIONS
+
+
+def is_confirmed(ticket) -> bool:
+    height = _ticket_height(ticket)
+    if not height:
+        return False
+    return _enough_confirmations(height, psl.get_block_height(nothrow=True))   # won't throw exception
+
+
+async def ais_confirmed(ticket) -> bool:
+    height = _ticket_height(ticket)
+    if not height:
+        return False
+    return _enough_confirmations(height, await psl.aget_block_height(nothrow=True))   # won't throw exception
+
+
+async def aget_ticket(txid: str) -> dict:
+    ticket = await aget_cached_ticket(txid)
+    if ticket is not None:
+        return ticket
+    ticket = await psl.acall("tickets", ['get', txid])   # can throw exception here
+    return await acache_ticket(txid, "raw", ticket)
+
+
+def get_ticket(txid: str) -> dict:
+    ticket = get_cached_ticket(txid)
+    if ticket is not None:
+        return ticket
+    ticket = psl.call("tickets", ['get', txid])   # can throw exception here
+    return cache_ticket(txid, "raw", ticket)
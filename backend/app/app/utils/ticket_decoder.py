@@ -0,0 +1,107 @@
+import base64
+import json
+import logging
+import threading
+
+from cachetools import LRUCache
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict returned for decoded tickets - they are shared between callers via memo and caches.
+    Still a dict, so it serializes to JSON as is
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Decoded ticket is read-only")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+def freeze(obj):
+    if isinstance(obj, FrozenDict):
+        return obj
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def _b64_padded_decode(data):
+    return base64.b64decode(data + '==')
+
+
+# embedded app/api tickets were written with different encodings by different versions of the WalletNode
+_ENCODINGS = {
+    "ascii85": base64.a85decode,
+    "base64": base64.b64decode,
+    "base64_padded": _b64_padded_decode,
+}
+
+# (ticket kind, ticket version) -> encoding that worked last time
+_preferred_encoding: dict[tuple[str, int | str], str] = {}
+
+# (txid, ticket kind) -> decoded registration ticket
+_decoded_tickets = LRUCache(maxsize=settings.TICKET_DECODER_CACHE_SIZE)
+_lock = threading.Lock()
+
+
+def decode_ticket_json(data: str) -> dict:
+    # can throw ValueError
+    return json.loads(base64.b64decode(data).decode('utf-8'))
+
+
+def decode_embedded_ticket(data, kind: str, version) -> dict | None:
+    """
+    Decodes app_ticket/api_ticket, trying encoding that worked for this ticket version first.
+    Returns None if none of the encodings worked
+    """
+    if not isinstance(data, str):
+        return data
+    preferred = _preferred_encoding.get((kind, version))
+    encodings = [preferred] if preferred else []
+    encodings += [name for name in _ENCODINGS if name != preferred]
+    errors = []
+    for name in encodings:
+        try:
+            decoded = json.loads(_ENCODINGS[name](data))
+        except ValueError as ve:
+            errors.append(f"{name}: {ve}")
+            continue
+        if name != preferred:
+            with _lock:
+                _preferred_encoding[(kind, version)] = name
+            logger.info(f"Using {name} to decode {kind} tickets version {version}")
+        return decoded
+    logger.warning(f"Failed to decode embedded ticket in the {kind} registration ticket version {version}: "
+                   f"{'; '.join(errors)}")
+    return None
+
+
+def get_decoded_ticket(txid: str | None, kind: str) -> FrozenDict | None:
+    if not txid:
+        return None
+    with _lock:
+        return _decoded_tickets.get((txid, kind))
+
+
+def remember_decoded_ticket(txid: str | None, kind: str, ticket: dict) -> FrozenDict:
+    ticket = freeze(ticket)
+    if txid:
+        with _lock:
+            _decoded_tickets[(txid, kind)] = ticket
+    return ticket
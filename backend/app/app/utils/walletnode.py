@@ -1,8 +1,12 @@
+import asyncio
 import base64
 import logging
-import requests
+import threading
+import weakref
 from enum import Enum
 
+import httpx
+
 from app.core.config import settings
 from app.utils.authentication import send_alert_email
 from app.utils.secret_manager import get_pastelid_pwd
@@ -31,7 +35,89 @@ class WalletNodeService(Enum):
         return self.value
 
 
-def call(post, service: WalletNodeService, url_cmd, payload, files, headers, return_item1, return_item2, nothrow=False):
+# per-endpoint read timeouts, everything else (upload, start, register, download) uses WN_TIMEOUT
+WN_ENDPOINT_TIMEOUTS = {
+    "history": 30.0,
+    "get_dd_result_file": 120.0,
+}
+
+
+def _wn_timeout(url_cmd) -> httpx.Timeout:
+    timeout = settings.WN_TIMEOUT
+    for segment in (url_cmd or "").split('?')[0].split('/'):
+        if segment in WN_ENDPOINT_TIMEOUTS:
+            timeout = WN_ENDPOINT_TIMEOUTS[segment]
+            break
+    return httpx.Timeout(timeout, connect=settings.WN_CONNECT_TIMEOUT)
+
+
+def _wn_limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=settings.WN_MAX_CONNECTIONS,
+                        max_keepalive_connections=settings.WN_MAX_CONNECTIONS,
+                        keepalive_expiry=settings.WN_KEEPALIVE_EXPIRY)
+
+
+class _AsyncWalletNodeSession:
+    """
+    Keep-alive connection pool plus concurrency limiter for one event loop (same as for pasteld)
+    """
+    def __init__(self):
+        self.client = httpx.AsyncClient(limits=_wn_limits(), timeout=settings.WN_TIMEOUT)
+        self.semaphore = asyncio.Semaphore(settings.WN_MAX_CONCURRENCY)
+
+
+_async_sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncWalletNodeSession]" = \
+    weakref.WeakKeyDictionary()
+_sync_client: httpx.Client | None = None
+_sync_semaphore = threading.BoundedSemaphore(settings.WN_MAX_CONCURRENCY)
+_sync_client_lock = threading.Lock()
+
+
+def _get_async_session() -> _AsyncWalletNodeSession:
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None:
+        session = _AsyncWalletNodeSession()
+        _async_sessions[loop] = session
+    return session
+
+
+def _get_sync_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        with _sync_client_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(limits=_wn_limits(), timeout=settings.WN_TIMEOUT)
+    return _sync_client
+
+
+async def close_async_session():
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session:
+        await session.client.aclose()
+
+
+def close_sync_client():
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+            _sync_client = None
+
+
+def run_with_wn_client(coro):
+    """
+    asyncio.run() for sync code (Celery tasks): async session of the temporary loop is closed together with it
+    """
+    async def run():
+        try:
+            return await coro
+        finally:
+            await close_async_session()
+    return asyncio.run(run())
+
+
+def _make_request(post, service: WalletNodeService, url_cmd, payload, files, headers) -> dict:
     if url_cmd:
         wn_url = f'{settings.WN_BASE_URL}/{service.value}/{url_cmd}'
     else:
@@ -39,32 +125,44 @@ def call(post, service: WalletNodeService, url_cmd, payload, files, headers, ret
 
     logger.info(f"Calling WalletNode with: header: {headers} and payload: {payload}")
 
-    try:
-        if post:
-            response = requests.post(wn_url, headers=headers, data=payload, files=files, timeout=300)
-        else:
-            response = requests.get(wn_url, headers=headers, data=payload, files=files, timeout=300)
-    except requests.Timeout as te:
-        logger.error(f"Timeout calling WalletNode: {te}")
-        send_alert_email(f"Timeout calling WalletNode RPC: {te}")
-        if nothrow:
-            return None
-        raise WalletnodeException()
-    except Exception as e:
+    request = {"method": "POST" if post else "GET", "url": wn_url, "headers": headers, "timeout": _wn_timeout(url_cmd)}
+    if post:
+        if isinstance(payload, (str, bytes)):
+            request["content"] = payload
+        elif payload:
+            request["data"] = payload
+        if files:
+            request["files"] = files
+    return request
+
+
+def _on_transport_error(e: Exception, nothrow):
+    if isinstance(e, httpx.TimeoutException):
+        logger.error(f"Timeout calling WalletNode: {e}")
+        send_alert_email(f"Timeout calling WalletNode RPC: {e}")
+    else:
         logger.error(f"Exception calling WalletNode: {e}")
-        if nothrow:
-            return None
-        raise WalletnodeException()
+    if nothrow:
+        return None
+    raise WalletnodeException()
+
+
+def _parse_response(response: httpx.Response, return_item1, return_item2, nothrow):
     logger.info(f"Request to WalletNode was: URL: {response.request.url}\nMethod: {response.request.method}"
                 f"\nHeaders: {response.request.headers}")
     if 400 <= response.status_code < 600:
-        logger.info(f"Request to WalletNode was: \nBody: {response.request.body}")
         logger.info(f"Response from WalletNode: {response.text}")
         if nothrow:
             return response
-    response.raise_for_status()
+        raise WalletnodeException(f"Call to walletnode failed with HTTP status {response.status_code}",
+                                  response=response)
 
-    upload_resp = response.json()
+    try:
+        upload_resp = response.json()
+    except ValueError as e:
+        # truncated or non-JSON (e.g. HTML error page) reply - retryable, like any other failed call
+        logger.info(f"Response from WalletNode: {response.text}")
+        raise WalletnodeException(f"Invalid response from walletnode: {e}", response=response)
 
     if not return_item1:
         return upload_resp
@@ -81,6 +179,35 @@ def call(post, service: WalletNodeService, url_cmd, payload, files, headers, ret
     return upload_resp[return_item1], upload_resp[return_item2]
 
 
+async def acall(post, service: WalletNodeService, url_cmd, payload, files, headers, return_item1, return_item2,
+                nothrow=False):
+    """
+    Asyncio-native version of call(), to be used from async code (API endpoints).
+    Reuses the keep-alive pool of the current event loop and never blocks it
+    """
+    request = _make_request(post, service, url_cmd, payload, files, headers)
+    session = _get_async_session()
+    try:
+        async with session.semaphore:
+            response = await session.client.request(**request)
+    except Exception as e:
+        return _on_transport_error(e, nothrow)
+    return _parse_response(response, return_item1, return_item2, nothrow)
+
+
+def call(post, service: WalletNodeService, url_cmd, payload, files, headers, return_item1, return_item2, nothrow=False):
+    """
+    Synchronous adapter over the shared WalletNode connection pool, used by Celery tasks
+    """
+    request = _make_request(post, service, url_cmd, payload, files, headers)
+    try:
+        with _sync_semaphore:
+            response = _get_sync_client().request(**request)
+    except Exception as e:
+        return _on_transport_error(e, nothrow)
+    return _parse_response(response, return_item1, return_item2, nothrow)
+
+
 class WalletnodeException(Exception):
     """Exception raised for errors in the walletnode call
 
@@ -88,8 +215,9 @@ class WalletnodeException(Exception):
         message -- explanation of the error
     """
 
-    def __init__(self, message="Call to walletnode failed"):
+    def __init__(self, message="Call to walletnode failed", response=None):
         self.message = message
+        self.response = response
         super().__init__(self.message)
 
 
@@ -103,17 +231,17 @@ async def get_file_from_pastel(*, reg_ticket_txid, pastel_id: str, wn_service: W
         file_key = "file"
     else:
         file_key = "file_id"
-    wn_resp = call(False,
-                   wn_service,
-                   f'download?pid={pastel_id}&txid={reg_ticket_txid}',
-                   {},
-                   [],
-                   {'Authorization': pastel_id_pwd, },
-                   file_key, "", True)    # This call will not throw!
+    wn_resp = await acall(False,
+                          wn_service,
+                          f'download?pid={pastel_id}&txid={reg_ticket_txid}',
+                          {},
+                          [],
+                          {'Authorization': pastel_id_pwd, },
+                          file_key, "", True)    # This call will not throw!
 
     if not wn_resp:
         logger.error(f"Pastel file not found - reg ticket txid = {reg_ticket_txid}")
-    elif not isinstance(wn_resp, requests.models.Response):
+    elif not isinstance(wn_resp, httpx.Response):
         logger.info(f"{wn_service} get_file_from_pastel: WN response = {wn_resp}")
         if wn_service == WalletNodeService.SENSE:
             return await decode_wn_return(wn_resp, reg_ticket_txid)
@@ -130,17 +258,17 @@ async def get_nft_dd_result_from_pastel(*, reg_ticket_txid: str, pastel_id: str)
     if not pastel_id_pwd:
         logger.error(f"Pastel ID {pastel_id} not found in secret manager")
         return None
-    wn_resp = call(False,
-                   WalletNodeService.NFT,
-                   f'get_dd_result_file?pid={pastel_id}&txid={reg_ticket_txid}',
-                   {},
-                   [],
-                   {'Authorization': pastel_id_pwd, },
-                   "file", "", True)    # This call will not throw!
+    wn_resp = await acall(False,
+                          WalletNodeService.NFT,
+                          f'get_dd_result_file?pid={pastel_id}&txid={reg_ticket_txid}',
+                          {},
+                          [],
+                          {'Authorization': pastel_id_pwd, },
+                          "file", "", True)    # This call will not throw!
 
     if not wn_resp:
         logger.error(f"NFT DD result for file not found - reg ticket txid = {reg_ticket_txid}")
-    elif not isinstance(wn_resp, requests.models.Response):
+    elif not isinstance(wn_resp, httpx.Response):
         return await decode_wn_return(wn_resp, reg_ticket_txid)
     return None
 
@@ -153,13 +281,14 @@ async def download_file_from_wn_by_id(file_id, reg_ticket_txid, pastel_id: str):
         return None
     try:
         file_url = f'{settings.WN_BASE_URL}/files/{file_id}?pid={pastel_id}'
-        payload = {}
         headers = {'Authorization': pastel_id_pwd, }
-        file_response = requests.request("GET", file_url, headers=headers, data=payload)
+        session = _get_async_session()
+        async with session.semaphore:
+            file_response = await session.client.get(file_url, headers=headers, timeout=_wn_timeout("files"))
         if file_response.status_code != 200:
             logger.info(f"Calling WN as: "
                         f"URL: {file_response.request.url}\nMethod: {file_response.request.method}"
-                        f"\nHeaders: {file_response.request.headers}\nBody: {file_response.request.body}")
+                        f"\nHeaders: {file_response.request.headers}")
             logger.info(f"Response from WN: {file_response.text}")
             logger.error(f"Pastel file not found - reg ticket txid = {reg_ticket_txid}: error in wn/files response")
         else:
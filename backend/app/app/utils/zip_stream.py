@@ -0,0 +1,82 @@
+import asyncio
+import os
+import zipfile
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Tuple
+
+ZIP_STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Entry content: bytes or str (kept in memory), Path or opened binary file (read from disk by chunks),
+# or async iterable of bytes chunks (size not known in advance)
+ZipEntryContent = bytes | str | Path | BinaryIO | AsyncIterable[bytes]
+
+
+class _ZipOutput:
+    """
+    Write-only sink for ZipFile. It has no tell/seek, so zipfile writes local headers
+    with data descriptors and never goes back - everything written can be sent right away
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _content_size(content: ZipEntryContent) -> int | None:
+    if isinstance(content, (bytes, str)):
+        return len(content)
+    if isinstance(content, Path):
+        return content.stat().st_size
+    if hasattr(content, "fileno"):
+        return os.fstat(content.fileno()).st_size
+    return None
+
+
+async def _content_chunks(content: ZipEntryContent) -> AsyncIterator[bytes]:
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    if isinstance(content, bytes):
+        data = memoryview(content)
+        for i in range(0, len(data), ZIP_STREAM_CHUNK_SIZE):
+            yield data[i:i+ZIP_STREAM_CHUNK_SIZE]
+    elif isinstance(content, Path) or hasattr(content, "read"):
+        f = open(content, 'rb') if isinstance(content, Path) else content
+        with f:
+            while chunk := await asyncio.to_thread(f.read, ZIP_STREAM_CHUNK_SIZE):
+                yield chunk
+    else:
+        async for chunk in content:
+            yield chunk
+
+
+async def zip_stream(entries: AsyncIterator[Tuple[str, ZipEntryContent]]) -> AsyncIterator[bytes]:
+    """
+    Yields zip archive by pieces, while entries (file name, file content) are still being produced.
+    Only one compressed chunk is kept in memory; content from disk or from async iterable is read by chunks too
+    """
+    output = _ZipOutput()
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as zip_file:
+        async for file_name, content in entries:
+            size = _content_size(content)
+            force_zip64 = size is None or size >= zipfile.ZIP64_LIMIT
+            with zip_file.open(file_name, "w", force_zip64=force_zip64) as dest:
+                async for piece in _content_chunks(content):
+                    # compression is CPU bound, don't block the event loop with large files
+                    await asyncio.to_thread(dest.write, piece)
+                    chunk = output.drain()
+                    if chunk:
+                        yield chunk
+            chunk = output.drain()
+            if chunk:
+                yield chunk
+    yield output.drain()
@@ -0,0 +1,13 @@
+# Called by pasteld on every new block, to refresh block height cached in Redis.
+# Add to pastel.conf (PYTHONPATH should point to gateway-api/backend/app):
+#   blocknotify=/path/to/python /path/to/gateway-api/backend/app/tools/block_notify.py %s
+import sys
+
+import app.utils.pasteld as psl
+
+
+if __name__ == "__main__":
+    psl.invalidate_block_height()
+    height = psl.refresh_block_height(nothrow=True)
+    block_hash = sys.argv[1] if len(sys.argv) > 1 else ""
+    print(f"New block {block_hash}, height {height}")
@@ -1,4 +1,3 @@
-import asyncio
 import os
 from pathlib import Path
 from datetime import datetime
@@ -7,8 +6,9 @@ import requests
 from app import crud
 from app.core.status import DbStatus
 from app.db.session import db_context
-from app.utils.filestorage import search_processed_file, search_nft_dd_result
-from app.utils.ipfs_tools import store_file_to_ipfs
+from app.core.config import settings
+from app.utils.filestorage import search_processed_file, search_nft_dd_result, result_cache
+from app.utils.ipfs_tools import store_files_to_ipfs, run_with_ipfs_client
 from app.utils.walletnode import WalletNodeService
 
 
@@ -83,21 +83,22 @@ async def re_add_original_files_to_ipfs(get_all_func, update_func, ticket_type:
     records_to_check = len(tasks_from_db)
     print(f"checking {records_to_check} {ticket_type} links")
 
-    i = 0
-    for task_from_db in tasks_from_db:
-        i += 1
+    # add original files to IPFS, several at once
+    tasks_with_files = [task_from_db for task_from_db in tasks_from_db
+                        if Path(task_from_db.original_file_local_path).is_file()]
+    print(f"{len(tasks_with_files)}/{records_to_check} {ticket_type} local files found, adding them to IPFS...")
+    ipfs_cids = await store_files_to_ipfs([task_from_db.original_file_local_path for task_from_db in tasks_with_files])
 
-        # add original files to IPFS
-        print(f"{i}/{records_to_check} Checking {ticket_type} "
-              f"local file {task_from_db.original_file_ipfs_link}...", end='\r')
-        path = Path(task_from_db.original_file_local_path)
-        if path.is_file():
-            ipfs_cid = store_file_to_ipfs(task_from_db.original_file_local_path)
-            upd = {"original_file_ipfs_link": ipfs_cid, "updated_at": datetime.utcnow()}
-            with db_context() as session:
-                update_func(session, db_obj=task_from_db, obj_in=upd)
-            print(f"{i}/{records_to_check} Checking {ticket_type} "
-                  f"local file {task_from_db.original_file_ipfs_link}... Added", end='\r')
+    added = 0
+    for task_from_db, ipfs_cid in zip(tasks_with_files, ipfs_cids):
+        if not ipfs_cid:
+            print(f"Checking {ticket_type} local file {task_from_db.original_file_local_path}... Failed")
+            continue
+        upd = {"original_file_ipfs_link": ipfs_cid, "updated_at": datetime.utcnow()}
+        with db_context() as session:
+            update_func(session, db_obj=task_from_db, obj_in=upd)
+        added += 1
+    print(f"{added} {ticket_type} original files added to IPFS")
 
 
 async def get_unavailables(processed_unavailable_file, ticket_type):
@@ -109,17 +110,27 @@ async def get_unavailables(processed_unavailable_file, ticket_type):
     return unavailable
 
 
+def trim_result_cache(max_bytes: int = settings.RESULT_CACHE_MAX_BYTES):
+    added, removed = result_cache.rebuild_index()
+    print(f"Result cache index: {added} files added, {removed} missing files removed")
+    evicted = result_cache.evict(max_bytes)
+    print(f"Result cache: {len(evicted)} files evicted, {result_cache.total_size()} bytes in cache")
+
+
 if __name__ == "__main__":
 
+    # index files cached before the result cache index existed and evict over the budget
+    # trim_result_cache()
+
     # re-add original files to IPFS
-    # asyncio.run(re_add_original_files_to_ipfs(crud.sense.get_all_in_done, crud.sense.update, 'sense'))
-    # asyncio.run(re_add_original_files_to_ipfs(crud.nft.get_all_in_done, crud.nft.update, 'nft'))
+    # run_with_ipfs_client(re_add_original_files_to_ipfs(crud.sense.get_all_in_done, crud.sense.update, 'sense'))
+    # run_with_ipfs_client(re_add_original_files_to_ipfs(crud.nft.get_all_in_done, crud.nft.update, 'nft'))
 
 
     # check ipfs accessibility from ipfs.io
-    asyncio.run(check_processed_files_accessibility(crud.nft.get_all_in_done, crud.nft.update,
-                                                         WalletNodeService.NFT, 'nft'))
-    # asyncio.run(check_processed_files_accessibility(crud.sense.get_all_in_done, crud.sense.update,
-    #                                                      WalletNodeService.SENSE, 'sense'))
-    # asyncio.run(check_processed_files_accessibility(crud.cascade.get_all_in_done, crud.cascade.update,
-    #                                                      WalletNodeService.CASCADE, 'cascade'))
+    run_with_ipfs_client(check_processed_files_accessibility(crud.nft.get_all_in_done, crud.nft.update,
+                                                              WalletNodeService.NFT, 'nft'))
+    # run_with_ipfs_client(check_processed_files_accessibility(crud.sense.get_all_in_done, crud.sense.update,
+    #                                                           WalletNodeService.SENSE, 'sense'))
+    # run_with_ipfs_client(check_processed_files_accessibility(crud.cascade.get_all_in_done, crud.cascade.update,
+    #                                                           WalletNodeService.CASCADE, 'cascade'))
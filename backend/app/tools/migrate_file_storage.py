@@ -0,0 +1,116 @@
+# Moves FILE_STORAGE from the flat layout to the sharded one:
+#   uploads  {uuid}{ext} + {uuid}.meta.json  ->  ab/cd/<sha3-256 of content> + StoredFile row
+#   results  results/{txid}                  ->  results/ab/cd/{txid}
+# original_file_local_path of Cascade, Sense and NFT results is updated to the new paths.
+# Safe to run again after interruption. Run with PYTHONPATH pointing to gateway-api/backend/app:
+#   python tools/migrate_file_storage.py [--dry-run]
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from app import crud
+from app.core.config import settings
+from app.db.session import db_context
+from app.models import Cascade, Sense, Nft
+from app.utils.filestorage import content_path, result_cache, UPLOAD_CHUNK_SIZE
+
+META_SUFFIX = ".meta.json"
+
+
+def file_hash(path: str) -> str:
+    sha3_256_hash = hashlib.sha3_256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            sha3_256_hash.update(chunk)
+    return sha3_256_hash.hexdigest()
+
+
+def place_file(old_path: str, new_path: str):
+    """
+    Puts a copy of old_path at new_path, old file stays. Hard link if possible, otherwise copy
+    """
+    try:
+        os.link(old_path, new_path)
+    except OSError:
+        tmp_path = f"{new_path}.tmp"
+        shutil.copyfile(old_path, tmp_path)
+        os.replace(tmp_path, new_path)
+
+
+def migrate_uploads(dry_run: bool):
+    moved = deduplicated = missing = 0
+    for entry in os.scandir(settings.FILE_STORAGE):
+        if not entry.is_file() or not entry.name.endswith(META_SUFFIX):
+            continue
+        file_id = entry.name[:-len(META_SUFFIX)]
+        with open(entry.path, 'r') as f:
+            meta = json.load(f)
+        old_path = f"{settings.FILE_STORAGE}/{file_id}{Path(meta['name']).suffix}"
+        if not os.path.isfile(old_path):
+            with db_context() as session:
+                stored = crud.stored_file.get_by_file_id(session, file_id=file_id)
+            if stored and os.path.isfile(content_path(stored.content_hash)):
+                # migrated already, interrupted before the meta file was removed
+                print(f"{file_id}: already migrated to {content_path(stored.content_hash)}")
+                if not dry_run:
+                    os.remove(entry.path)
+                continue
+            print(f"{file_id}: {old_path} not found, skipping")
+            missing += 1
+            continue
+
+        content_hash = file_hash(old_path)
+        new_path = content_path(content_hash)
+        print(f"{file_id}: {old_path} -> {new_path}")
+        if dry_run:
+            continue
+
+        # old file is removed only after the new one is in place and DB points to it,
+        # so the run can be interrupted at any step and repeated
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        if os.path.exists(new_path):
+            deduplicated += 1
+        else:
+            place_file(old_path, new_path)
+            moved += 1
+        with db_context() as session:
+            crud.stored_file.save(session, file_id=file_id, file_name=meta["name"], content_type=meta["type"],
+                                  content_hash=content_hash, size=os.path.getsize(new_path))
+            for model in (Cascade, Sense, Nft):
+                (session.query(model)
+                 .filter(model.original_file_local_path == old_path)
+                 .update({"original_file_local_path": new_path}, synchronize_session=False))
+            session.commit()
+        os.remove(old_path)
+        os.remove(entry.path)
+    print(f"Uploads: {moved} moved, {deduplicated} removed as duplicates, {missing} missing")
+
+
+def migrate_results(dry_run: bool):
+    moved = 0
+    results_dir = result_cache.directory
+    if not os.path.isdir(results_dir):
+        return
+    for entry in os.scandir(results_dir):
+        if not entry.is_file() or entry.name.startswith(result_cache.INDEX_FILE_NAME):
+            continue
+        new_path = result_cache.path(entry.name)
+        if dry_run:
+            print(f"{entry.path} -> {new_path}")
+            continue
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        os.replace(entry.path, new_path)
+        moved += 1
+    print(f"Results: {moved} moved")
+    if not dry_run:
+        added, removed = result_cache.rebuild_index()
+        print(f"Result cache index: {added} files added, {removed} missing files removed")
+
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv
+    migrate_uploads(dry_run)
+    migrate_results(dry_run)
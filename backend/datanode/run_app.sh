@@ -21,6 +21,7 @@ ipfs daemon --routing=dhtclient &
 env $(cat /scripts/.env_sensitive | xargs) poetry run gunicorn -k 'uvicorn.workers.UvicornWorker' -c gunicorn_conf.py app.main:app &
 env $(cat /scripts/.env_sensitive | xargs) poetry run celery -A app.main.celery worker -Q cascade,sense,nft,collection -n worker1@%h --loglevel=info &
 env $(cat /scripts/.env_sensitive | xargs) poetry run celery -A app.main.celery worker -Q registration_helpers -n worker2@%h --loglevel=info &
+env $(cat /scripts/.env_sensitive | xargs) poetry run celery -A app.main.celery worker -Q ipfs -n worker3@%h --loglevel=info &
 env $(cat /scripts/.env_sensitive | xargs) poetry run celery -A app.main.celery beat -l info &
 
 # Keep the container running